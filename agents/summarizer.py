@@ -1,34 +1,50 @@
+import json
+import hashlib
+import logging
 from typing import Dict, List, Any
 from langgraph.graph import Graph, StateGraph
-from langchain_openai import ChatOpenAI
-from langchain.prompts import ChatPromptTemplate
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
 from pydantic import BaseModel, Field
+from services.llm_client import get_llm_client
+from agents.transcript_preprocessor import preprocess_transcript, PREPROCESS_CONFIG
+from agents.summary_schema import (
+    SUMMARY_TOOL, SUMMARY_TOOL_NAME, SUMMARY_RESPONSE_FORMAT, JSON_REPAIR_INSTRUCTION, parse_summary_output
+)
 
-class SummaryState(BaseModel):
-    """要約処理の状態を管理するクラス"""
-    transcript: List[Dict[str, Any]] = Field(default_factory=list)
-    summary: str = ""
-    needs_refinement: bool = True
+logger = logging.getLogger(__name__)
 
+# 要約に使用するモデル
+SUMMARY_MODEL = "gpt-4.1-nano"
 
-def create_initial_summarizer() -> StateGraph:
-    """
-    初期要約を生成するエージェント (GPT-4.1最適化版)
-    memo: 改良案はreference_docs\\gpt41-prompt-manual-concise.mdを入力したClaude3.7sonnetに提案させたものをベースにしている
-    """
-    llm = ChatOpenAI(model="gpt-4.1-nano", temperature=0)
-    
-    # GPT-4.1向けに最適化された要約プロンプト
-    # 明確な構造と出力フォーマット指定を活用
-    summarize_prompt = ChatPromptTemplate.from_messages([
-        ("system", """あなたはYouTube動画の文字起こしテキストを要約する専門家です。
+# すべてのLLM呼び出し（要約・チャット）で共通のシステムプロンプト
+# プロバイダ側のプレフィックスキャッシュを効かせるため、[ツール定義, 共通システムプロンプト, 動画の内容] を
+# バイト単位で同一の先頭部分とし、タスクごとの指示は最後のメッセージに置く
+SHARED_SYSTEM_PROMPT = """あなたはYouTube動画の内容を扱う専門家です。
+
+最初のユーザーメッセージとして動画の文字起こしテキストまたは要約が与えられます。
+その内容に基づいて、最後のメッセージで指示されたタスク（要約・質問への回答）を実行してください。
+
+【共通ルール】
+- 与えられた内容に含まれない情報を推測で補わないこと
+- 専門用語には必ず説明を加えること
+"""
+
+# 動画の内容を渡すメッセージ（共通プレフィックスの一部のため、動画ごとに同一の文字列になるようにする）
+CONTEXT_TEMPLATES = {
+    "transcript": "以下は動画の文字起こしテキストです。\n\n<transcript>\n{text}\n</transcript>",
+    "summary": "以下は動画の要約です。\n\n<summary>\n{text}\n</summary>",
+}
+
+# GPT-4.1向けに最適化された要約の指示
+# 明確な構造と出力フォーマット指定を活用
+SUMMARY_INSTRUCTION = """上記の文字起こしテキストを要約してください。
 
 【目的】
 視聴者が動画内容を素早く理解し、重要な学びを得られるような要約を作成します。
 
 【出力形式】
 以下のJSONフォーマットで出力してください：
-{{
+{
   "sub_title": "タイトル",
   "overview": "概要",
   "main_topics": [
@@ -37,14 +53,14 @@ def create_initial_summarizer() -> StateGraph:
     "トピック3"
   ],
   "key_points": [
-    {{
+    {
       "title": "ポイント1",
       "description": "説明1"
-    }},
-    {{
+    },
+    {
       "title": "ポイント2",
       "description": "説明2"
-    }}
+    }
   ],
   "keywords": [
     "キーワード1",
@@ -54,7 +70,7 @@ def create_initial_summarizer() -> StateGraph:
     "行動1",
     "行動2"
   ]
-}}
+}
 
 【重要ルール】
 - 常に有効なJSON形式で出力すること
@@ -62,49 +78,139 @@ def create_initial_summarizer() -> StateGraph:
 - key_pointsは3-5項目を含めること（各説明は50字以内）
 - keywordsは5-8個を含めること
 - action_itemsは2-3項目を含めること
-- 専門用語には必ず説明を加えること
-"""),
-        ("user", "以下の文字起こしテキストを要約してください:\n\n{text}")
-    ])
+"""
+
+# チャットの指示（質問部分のみが毎回変わる）
+CHAT_INSTRUCTION = "上記の{label}の内容に関する質問に答えてください:\n\n質問: {question}"
+
+# 共通プレフィックスを持つすべての呼び出しに送るツール定義と、呼び出しの種類ごとのtool_choice
+SHARED_TOOLS = [SUMMARY_TOOL]
+SUMMARY_TOOL_CHOICE = {"type": "function", "function": {"name": SUMMARY_TOOL_NAME}}
+CHAT_TOOL_CHOICE = "none"
+
+
+def build_prompt_messages(context_text: str, instruction: str, context_type: str = "transcript") -> List[BaseMessage]:
+    """
+    概要: 共通プレフィックス（システムプロンプト → 動画の内容）の後にタスクの指示を置いたメッセージを組み立てる
+    用途: 同じ動画に対する要約・チャットで先頭部分を一致させ、プロンプトキャッシュを効かせる（ツール定義はSHARED_TOOLSを送る）
+    """
+    return [
+        SystemMessage(content=SHARED_SYSTEM_PROMPT),
+        HumanMessage(content=CONTEXT_TEMPLATES[context_type].format(text=context_text)),
+        HumanMessage(content=instruction),
+    ]
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# プロンプトテンプレートのハッシュ（プロンプトを変更すると値が変わり、既存の要約が再生成対象になる）
+PROMPT_TEMPLATE_HASH = _sha256("\x00".join([
+    SHARED_SYSTEM_PROMPT, CONTEXT_TEMPLATES["transcript"], SUMMARY_INSTRUCTION,
+    json.dumps(SHARED_TOOLS, sort_keys=True), json.dumps(SUMMARY_RESPONSE_FORMAT, sort_keys=True)
+]))
+
+
+def transcript_to_text(transcript: List[Dict[str, Any]]) -> str:
+    """文字起こしのセグメントをLLMに渡すテキストに結合する"""
+    return " ".join([chunk["text"] for chunk in transcript])
+
+
+def tool_call_arguments(message: Any, name: str = SUMMARY_TOOL_NAME) -> str:
+    """
+    概要: 応答に含まれるツール呼び出しの引数（JSON文字列）を返す
+    用途: 途中で切れた引数も解析前の文字列のまま修復に回す。ツール呼び出しがない場合は本文を返す
+    """
+    for call in message.additional_kwargs.get("tool_calls") or []:
+        function = call.get("function") or {}
+        if function.get("name") == name:
+            return function.get("arguments") or ""
+    return message.content or ""
+
+
+def compute_transcript_hash(transcript: List[Dict[str, Any]]) -> str:
+    """
+    概要: 文字起こしテキストと前処理設定を合わせたハッシュを返す
+    用途: 前処理の設定を変えた場合もLLMへの入力が変わるため、要約を再生成対象にする
+    """
+    return _sha256(transcript_to_text(transcript) + "\x00" + PREPROCESS_CONFIG.fingerprint())
+
+
+def get_summary_version(transcript: List[Dict[str, Any]] = None) -> Dict[str, str]:
+    """
+    概要: 要約のバージョン情報（プロンプトハッシュ・モデル名・文字起こしハッシュ）を返す
+    用途: 保存する要約へのタグ付けと、キャッシュ検索時の一致判定に使用する
+    """
+    version = {"prompt_hash": PROMPT_TEMPLATE_HASH, "model_name": SUMMARY_MODEL}
+    if transcript is not None:
+        version["transcript_hash"] = compute_transcript_hash(transcript)
+    return version
+
+
+class SummaryState(BaseModel):
+    """要約処理の状態を管理するクラス"""
+    transcript: List[Dict[str, Any]] = Field(default_factory=list)
+    summary: str = ""
+    needs_refinement: bool = True
+    preprocess_stats: Dict[str, Any] = Field(default_factory=dict)
+
+
+def create_initial_summarizer() -> StateGraph:
+    """
+    初期要約を生成するエージェント (GPT-4.1最適化版)
+    memo: 改良案はreference_docs\\gpt41-prompt-manual-concise.mdを入力したClaude3.7sonnetに提案させたものをベースにしている
+    """
+    # レート制御・期限・ヘッジは共通のLLMクライアントで適用する
+    llm = get_llm_client(SUMMARY_MODEL)
     
-    # Chain-of-Thoughtアプローチを活用した要約関数
+    # LLMに渡す前に文字起こしを正規化してトークン数を削減する
+    def preprocess(state: SummaryState) -> SummaryState:
+        result = preprocess_transcript(state.transcript)
+        stats = result.stats()
+        logger.info(
+            f"文字起こしを前処理しました: tokens {stats['tokens_before']} -> {stats['tokens_after']} "
+            f"(削減率 {stats['token_reduction_ratio']:.1%}, {stats['elapsed_ms']}ms)"
+        )
+        return SummaryState(
+            transcript=result.transcript,
+            summary=state.summary,
+            needs_refinement=state.needs_refinement,
+            preprocess_stats=stats
+        )
+    
+    # 要約関数（スキーマを指定したツール呼び出しによる構造化出力）
+    # チャットと同じツール定義を送り、同じ動画についてのチャットでは共通プレフィックスがキャッシュ済みの入力として扱われる
     def summarize(state: SummaryState) -> SummaryState:
-        text = " ".join([chunk["text"] for chunk in state.transcript])
-        
-        # GPT-4.1の内部モノローグ/Chain-of-Thoughtの特性を活用
-        cot_prompt = ChatPromptTemplate.from_messages([
-            ("system", """文字起こしテキストを要約する前に、以下のステップで分析してください:
-            
-            [内部思考]
-            1. このテキストの主題は何か
-            2. 話者が伝えようとしている主要なメッセージは何か
-            3. 重要な事実や数字はあるか
-            4. 専門用語とその意味は何か
-            5. 視聴者が実践できる具体的なアクションは何か
-            
-            [要約作成]
-            上記の分析に基づいて、テキスト形式で要約を作成してください。
-            """),
-            ("user", f"以下の文字起こしテキストを分析してください:\n\n{text}")
-        ])
+        text = transcript_to_text(state.transcript)
         
-        # 分析ステップ
-        formatted_cot_prompt = cot_prompt.format_messages()
-        analysis = llm.invoke(formatted_cot_prompt)
+        summary_messages = build_prompt_messages(text, SUMMARY_INSTRUCTION)
+        response = llm.invoke(summary_messages, "summary", tools=SHARED_TOOLS, tool_choice=SUMMARY_TOOL_CHOICE)
+        # 出力トークン上限で途中まで生成された引数も捨てずに修復を試みる
+        content = tool_call_arguments(response)
         
-        # 要約ステップ
-        formatted_summarize_prompt = summarize_prompt.format_messages(text=text)
-        response = llm.invoke(formatted_summarize_prompt)
+        # 壊れた出力はまずローカルで修復し、直らない場合のみ壊れたJSONだけを渡して修正させる（再生成はしない）
+        summary_data = parse_summary_output(
+            content,
+            llm_repair=lambda broken: llm.invoke(
+                [HumanMessage(content=JSON_REPAIR_INSTRUCTION.format(text=broken))],
+                "json_repair",
+                response_format=SUMMARY_RESPONSE_FORMAT
+            ).content
+        )
         
         return SummaryState(
             transcript=state.transcript,
-            summary=response.content,
-            needs_refinement=True
+            summary=json.dumps(summary_data, ensure_ascii=False),
+            needs_refinement=True,
+            preprocess_stats=state.preprocess_stats
         )
     
     workflow = StateGraph(SummaryState)
+    workflow.add_node("preprocess", preprocess)
     workflow.add_node("summarize", summarize)
-    workflow.set_entry_point("summarize")
+    workflow.add_edge("preprocess", "summarize")
+    workflow.set_entry_point("preprocess")
     workflow.set_finish_point("summarize")
     
     return workflow.compile()
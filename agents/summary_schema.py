@@ -0,0 +1,236 @@
+import re
+import json
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from pydantic import BaseModel, Field, ValidationError
+
+logger = logging.getLogger(__name__)
+
+
+class KeyPoint(BaseModel):
+    """重要ポイント"""
+    title: str
+    description: str
+
+
+class VideoSummaryOutput(BaseModel):
+    """
+    概要: LLMが出力する要約のスキーマ
+    用途: 構造化出力（JSON Schema）の指定と、出力の検証に使用する。
+          途中で切れた出力を修復した場合に備え、リスト項目は欠けていても空リストとして受け付ける
+    """
+    sub_title: str
+    overview: str
+    main_topics: List[str] = Field(default_factory=list)
+    key_points: List[KeyPoint] = Field(default_factory=list)
+    keywords: List[str] = Field(default_factory=list)
+    action_items: List[str] = Field(default_factory=list)
+
+
+def _strict_json_schema(model: type) -> Dict[str, Any]:
+    """Structured Outputsのstrictモードの制約（全項目必須・追加項目なし）に合わせたJSON Schemaを生成する"""
+    schema = model.model_json_schema()
+
+    def visit(node: Any):
+        if isinstance(node, dict):
+            # タイトル・説明（docstring）・デフォルト値はスキーマの制約に不要なため送らない
+            for key in ("title", "description", "default"):
+                node.pop(key, None)
+            if node.get("type") == "object" and "properties" in node:
+                node["required"] = list(node["properties"].keys())
+                node["additionalProperties"] = False
+                for value in node["properties"].values():
+                    visit(value)
+            for key, value in node.items():
+                if key != "properties":
+                    visit(value)
+        elif isinstance(node, list):
+            for value in node:
+                visit(value)
+
+    visit(schema)
+    return schema
+
+
+SUMMARY_TOOL_NAME = "video_summary"
+
+# 要約を出力させるツールの定義（strictモードでスキーマに沿った引数を生成させる）。
+# ツール定義はプロンプトの先頭部分に含まれるため、文字起こしを共通プレフィックスとする呼び出し（要約・チャット）には
+# 常に同じ定義を送り、要約ではこのツールの呼び出しを強制し、チャットでは呼び出させない（tool_choiceのみを変える）
+SUMMARY_TOOL = {
+    "type": "function",
+    "function": {
+        "name": SUMMARY_TOOL_NAME,
+        "description": "動画の要約を出力する",
+        "strict": True,
+        "parameters": _strict_json_schema(VideoSummaryOutput),
+    },
+}
+
+# JSON修復の呼び出しで指定するresponse_format（文字起こしを含まず、共通プレフィックスを持たない呼び出しのため）
+SUMMARY_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": SUMMARY_TOOL_NAME, "strict": True, "schema": _strict_json_schema(VideoSummaryOutput)},
+}
+
+# JSON修復をLLMに依頼する際の指示（文字起こしは含めず、壊れたJSONのみを渡す）
+JSON_REPAIR_INSTRUCTION = """以下は動画の要約を表すJSONですが、構文が壊れているか途中で切れています。
+内容を変えずに、指定されたスキーマに沿った有効なJSONに修正して出力してください。
+途中で切れている項目は、切れた部分を削除してください。
+
+{text}"""
+
+REPAIR_VALID = "valid"
+REPAIR_CODE_FENCE = "code_fence"
+REPAIR_LOCAL = "local_repair"
+REPAIR_LLM = "llm_repair"
+REPAIR_FAILED = "failed"
+
+CODE_FENCE_PATTERN = re.compile(r"```(?:json)?\s*(.*?)\s*(?:```|$)", re.DOTALL | re.IGNORECASE)
+TRAILING_COMMA_PATTERN = re.compile(r",\s*([}\]])")
+
+
+class SummaryParseError(ValueError):
+    """要約の出力をJSONとして解釈できなかったことを表す例外"""
+
+    def __init__(self, message: str, raw_text: str):
+        self.raw_text = raw_text
+        super().__init__(message)
+
+
+class SummaryRepairStats:
+    """
+    概要: 要約出力の解析結果（そのまま有効・ローカル修復・LLM修復・失敗）を集計する
+    用途: 修復が必要になった割合を確認し、プロンプトや出力トークン上限の調整に使う
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {key: 0 for key in (REPAIR_VALID, REPAIR_CODE_FENCE, REPAIR_LOCAL, REPAIR_LLM, REPAIR_FAILED)}
+
+    def record(self, outcome: str):
+        with self._lock:
+            self._counts[outcome] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._counts)
+        total = sum(counts.values())
+        repaired = counts[REPAIR_CODE_FENCE] + counts[REPAIR_LOCAL] + counts[REPAIR_LLM]
+        return {
+            "total": total,
+            **counts,
+            "repair_rate": round(repaired / total, 4) if total else 0.0,
+            "failure_rate": round(counts[REPAIR_FAILED] / total, 4) if total else 0.0,
+        }
+
+
+# プロセス共通の修復統計
+summary_repair_stats = SummaryRepairStats()
+
+
+def _strip_code_fences(text: str) -> str:
+    match = CODE_FENCE_PATTERN.search(text)
+    return match.group(1) if match else text
+
+
+def _extract_object(text: str) -> str:
+    """前後の説明文を除き、最初の'{'以降を取り出す"""
+    start = text.find("{")
+    return text[start:] if start >= 0 else text
+
+
+def _close_truncated_json(text: str) -> List[str]:
+    '''
+    概要: 途中で切れたJSONの閉じ括弧を補った候補を返す
+    用途: まず末尾をそのまま閉じた候補、次に要素の区切り（カンマ）単位で末尾の不完全な要素を削った候補を返す
+    '''
+    stack: List[str] = []
+    in_string = False
+    escape = False
+    cut_points: List[Tuple[int, List[str]]] = []
+    for i, char in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack:
+            stack.pop()
+        elif char == ",":
+            cut_points.append((i, list(stack)))
+
+    closing = "".join(reversed(stack))
+    tail = text + ('"' if in_string else "")
+    # 値のないキー（"key": や "key"）と末尾のカンマを取り除く
+    tail = re.sub(r'(,|\{)\s*"[^"]*"\s*:?\s*$', r"\1", tail)
+    tail = re.sub(r"[,:]\s*$", "", tail.rstrip())
+    candidates = [tail + closing]
+    for index, cut_stack in reversed(cut_points[-5:]):
+        candidates.append(text[:index] + "".join(reversed(cut_stack)))
+    return candidates
+
+
+def _validate(data: Any) -> Dict[str, Any]:
+    summary = VideoSummaryOutput.model_validate(data).model_dump()
+    # 途中で切れた文字列を閉じた結果できた空の項目は除く
+    for key in ("main_topics", "keywords", "action_items"):
+        summary[key] = [item for item in summary[key] if item]
+    return summary
+
+
+def repair_summary_json(text: str) -> Tuple[Optional[Dict[str, Any]], str]:
+    '''
+    概要: 要約の出力をローカルで解析・修復する
+    用途: コードフェンスの除去、前後の説明文の除去、末尾カンマの除去、途中で切れた出力の補完を順に試す。
+          修復できない場合は(None, REPAIR_FAILED)を返す
+    '''
+    try:
+        return _validate(json.loads(text)), REPAIR_VALID
+    except (json.JSONDecodeError, ValidationError):
+        pass
+
+    unfenced = _strip_code_fences(text)
+    if unfenced != text:
+        try:
+            return _validate(json.loads(unfenced)), REPAIR_CODE_FENCE
+        except (json.JSONDecodeError, ValidationError):
+            pass
+
+    body = TRAILING_COMMA_PATTERN.sub(r"\1", _extract_object(unfenced).strip())
+    for candidate in [body] + _close_truncated_json(body):
+        try:
+            return _validate(json.loads(candidate)), REPAIR_LOCAL
+        except (json.JSONDecodeError, ValidationError):
+            continue
+    return None, REPAIR_FAILED
+
+
+def parse_summary_output(text: str, llm_repair: Optional[Callable[[str], str]] = None) -> Dict[str, Any]:
+    '''
+    概要: 要約の出力を検証済みの辞書に変換する
+    用途: ローカル修復で直らない場合のみ、llm_repair（壊れたJSONだけを渡す軽量な修正呼び出し）を最後の手段として使う。
+          それでも解析できない場合はSummaryParseErrorを送出する
+    '''
+    data, outcome = repair_summary_json(text)
+    if data is None and llm_repair is not None:
+        try:
+            data, _ = repair_summary_json(llm_repair(text))
+            outcome = REPAIR_LLM if data is not None else REPAIR_FAILED
+        except Exception as e:
+            logger.warning(f"LLMによるJSON修復に失敗しました: {str(e)}")
+    summary_repair_stats.record(outcome)
+    if data is None:
+        logger.warning("要約の出力を修復できませんでした")
+        raise SummaryParseError("要約のJSON解析に失敗しました", text)
+    if outcome != REPAIR_VALID:
+        logger.info(f"要約の出力を修復しました: method={outcome}")
+    return data
@@ -0,0 +1,211 @@
+import os
+import re
+import json
+import time
+import hashlib
+from typing import Any, Dict, List, Tuple
+from pydantic import BaseModel, Field
+from services.token_counter import count_tokens
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() == "true"
+
+
+# 前処理の処理内容のバージョン（設定項目にない処理を変えた場合に上げ、要約のバージョンを変える）
+PREPROCESS_VERSION = 2
+
+# 自動生成字幕に含まれる非発話タグ。括弧内が既知のタグと一致し、括弧が対応している場合のみ除去する
+# （「f(x)」や話者の補足などの括弧書きは残す）
+DEFAULT_NON_SPEECH_TAGS = ["音楽", "拍手", "笑", "笑い", "歓声", "Music", "Applause", "Laughter"]
+BRACKET_PAIRS = [("[", "]"), ("［", "］"), ("【", "】"), ("(", ")"), ("（", "）")]
+# 文末とみなす文字
+SENTENCE_END_PATTERN = re.compile(r"[。！？!?.]$")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+DEFAULT_FILLERS = [
+    "えーっと", "えーと", "えっと", "えー", "あのー", "そのー", "うーん", "んー", "まぁ",
+    "um", "uh", "erm", "uhm",
+]
+
+
+class PreprocessConfig(BaseModel):
+    """文字起こし前処理の設定"""
+    enabled: bool = True
+    strip_non_speech: bool = True
+    collapse_overlaps: bool = True
+    remove_fillers: bool = True
+    merge_windows: bool = True
+    window_max_chars: int = 300
+    min_overlap_chars: int = 3
+    fillers: List[str] = Field(default_factory=lambda: list(DEFAULT_FILLERS))
+    non_speech_tags: List[str] = Field(default_factory=lambda: list(DEFAULT_NON_SPEECH_TAGS))
+
+    @classmethod
+    def from_env(cls) -> "PreprocessConfig":
+        return cls(
+            enabled=_env_flag("TRANSCRIPT_PREPROCESS_ENABLED", "true"),
+            remove_fillers=_env_flag("TRANSCRIPT_REMOVE_FILLERS", "true"),
+            window_max_chars=int(os.getenv("TRANSCRIPT_WINDOW_MAX_CHARS", "300")),
+        )
+
+    def fingerprint(self) -> str:
+        """設定内容のハッシュ（前処理の設定が変わった場合に要約のバージョンを変えるために使用）"""
+        payload = {"version": PREPROCESS_VERSION, **self.model_dump()}
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+# プロセス共通の前処理設定
+PREPROCESS_CONFIG = PreprocessConfig.from_env()
+
+
+class PreprocessResult(BaseModel):
+    """前処理の結果と効果測定値"""
+    transcript: List[Dict[str, Any]] = Field(default_factory=list)
+    segments_before: int = 0
+    segments_after: int = 0
+    tokens_before: int = 0
+    tokens_after: int = 0
+    elapsed_ms: float = 0.0
+
+    @property
+    def token_reduction_ratio(self) -> float:
+        return 1 - self.tokens_after / self.tokens_before if self.tokens_before else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "segments_before": self.segments_before,
+            "segments_after": self.segments_after,
+            "tokens_before": self.tokens_before,
+            "tokens_after": self.tokens_after,
+            "token_reduction_ratio": round(self.token_reduction_ratio, 4),
+            "elapsed_ms": round(self.elapsed_ms, 2),
+        }
+
+
+def _build_non_speech_pattern(tags: List[str]) -> re.Pattern:
+    names = "|".join(re.escape(tag) for tag in sorted(tags, key=len, reverse=True))
+    bracketed = [rf"{re.escape(opening)}\s*(?:{names})\s*{re.escape(closing)}" for opening, closing in BRACKET_PAIRS]
+    return re.compile("|".join(bracketed + [r"♪+", r"♫+"]), re.IGNORECASE)
+
+
+def _build_filler_pattern(fillers: List[str]) -> re.Pattern:
+    # 長いものから照合し、直前が区切り（文頭・空白・句読点）の場合のみ除去する。
+    # 英語のフィラーは単語の一部を消さないよう直後にも区切りを要求する（日本語は分かち書きされないため要求しない）。
+    # 日本語のフィラーの直後に同じ語が続く場合（「まぁまぁ」など）は畳語として残す
+    ordered = sorted(fillers, key=len, reverse=True)
+    japanese = "|".join(re.escape(f) for f in ordered if not f.isascii())
+    english = "|".join(re.escape(f) for f in ordered if f.isascii())
+    alternatives = []
+    if japanese:
+        alternatives.append(rf"(?P<ja>{japanese})(?!(?P=ja))[ー〜~]*[、,]?\s*")
+    if english:
+        alternatives.append(rf"(?:{english})\b[,]?\s*")
+    return re.compile(rf"(?:(?<=^)|(?<=[\s、,。]))(?:{'|'.join(alternatives)})", re.IGNORECASE)
+
+
+def _clean_text(text: str, config: PreprocessConfig, non_speech_pattern: re.Pattern, filler_pattern: re.Pattern) -> str:
+    if config.strip_non_speech and non_speech_pattern is not None:
+        text = non_speech_pattern.sub(" ", text)
+    text = WHITESPACE_PATTERN.sub(" ", text).strip()
+    if config.remove_fillers and filler_pattern is not None:
+        text = filler_pattern.sub("", text).strip()
+    return text
+
+
+def _is_word_boundary(text: str, index: int) -> bool:
+    """text[index]の直前が語の区切りか（英数字同士の間でなければ区切りとみなす）"""
+    if index <= 0 or index >= len(text):
+        return True
+    left, right = text[index - 1], text[index]
+    return not (left.isascii() and left.isalnum() and right.isascii() and right.isalnum())
+
+
+def _strip_overlap(previous: str, current: str, min_overlap: int) -> str:
+    """
+    概要: 直前の字幕の末尾と重複する現在の字幕の先頭部分を取り除く
+    用途: 自動生成字幕のローリング表示で同じ語句が次のセグメントに繰り返される問題に対応する。
+          重複の後に新しい語句が続く場合のみ取り除き、同じ内容の繰り返し（2回目の「はい」など）は発話として残す。
+          英数字は語の途中で切らない
+    """
+    if not previous or not current:
+        return current
+    max_overlap = min(len(previous), len(current) - 1)
+    for size in range(max_overlap, min_overlap - 1, -1):
+        if (
+            previous.endswith(current[:size])
+            and _is_word_boundary(previous, len(previous) - size)
+            and _is_word_boundary(current, size)
+        ):
+            return current[size:].lstrip()
+    return current
+
+
+def _join(left: str, right: str) -> str:
+    if not left:
+        return right
+    # 日本語同士は空白なしで連結し、英数字を含む境界は空白で区切る
+    if left[-1].isascii() or right[:1].isascii():
+        return f"{left} {right}"
+    return left + right
+
+
+def preprocess_transcript(transcript: List[Dict[str, Any]], config: PreprocessConfig = None) -> PreprocessResult:
+    """
+    概要: 文字起こしを正規化してLLMに渡すトークン数を削減する
+    用途: 非発話タグ・フィラー・余分な空白を除去し、ローリング字幕の重複を畳み込み、
+          タイムスタンプを保ったまま文単位のウィンドウに結合する。
+          重複の畳み込みは表示時間が直前のセグメントと重なる（ローリング表示の）セグメントに限る
+    """
+    config = config or PREPROCESS_CONFIG
+    started = time.perf_counter()
+    tokens_before = count_tokens(" ".join(segment.get("text", "") for segment in transcript))
+    if not config.enabled:
+        return PreprocessResult(
+            transcript=transcript, segments_before=len(transcript), segments_after=len(transcript),
+            tokens_before=tokens_before, tokens_after=tokens_before,
+            elapsed_ms=(time.perf_counter() - started) * 1000
+        )
+
+    non_speech_pattern = _build_non_speech_pattern(config.non_speech_tags) if config.non_speech_tags else None
+    filler_pattern = _build_filler_pattern(config.fillers) if config.fillers else None
+    cleaned: List[Tuple[str, float, float]] = []
+    previous_text, previous_end = "", 0.0
+    for segment in transcript:
+        text = _clean_text(segment.get("text", ""), config, non_speech_pattern, filler_pattern)
+        start = float(segment.get("start", 0.0))
+        end = start + float(segment.get("duration", 0.0))
+        raw_text = text
+        if config.collapse_overlaps and start < previous_end:
+            # ローリング字幕が繰り返すのは直前のセグメントのみなので、比較対象は直前の1件に限定する
+            text = _strip_overlap(previous_text, text, config.min_overlap_chars)
+        if raw_text:
+            previous_text, previous_end = raw_text, end
+        if not text:
+            continue
+        cleaned.append((text, start, end))
+
+    merged: List[Dict[str, Any]] = []
+    window_text, window_start, window_end = "", None, 0.0
+    for text, start, end in cleaned:
+        if not config.merge_windows:
+            merged.append({"text": text, "start": start, "duration": round(end - start, 3)})
+            continue
+        if window_start is None:
+            window_start = start
+        window_text = _join(window_text, text)
+        window_end = max(window_end, end)
+        if SENTENCE_END_PATTERN.search(window_text) or len(window_text) >= config.window_max_chars:
+            merged.append({"text": window_text, "start": window_start, "duration": round(window_end - window_start, 3)})
+            window_text, window_start, window_end = "", None, 0.0
+    if window_text:
+        merged.append({"text": window_text, "start": window_start, "duration": round(window_end - window_start, 3)})
+
+    return PreprocessResult(
+        transcript=merged,
+        segments_before=len(transcript),
+        segments_after=len(merged),
+        tokens_before=tokens_before,
+        tokens_after=count_tokens(" ".join(segment["text"] for segment in merged)),
+        elapsed_ms=(time.perf_counter() - started) * 1000,
+    )
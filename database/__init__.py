@@ -1,5 +1,8 @@
 # データベースパッケージの初期化
-from .db_models import create_tables, VideoSummary
+from .db_models import create_tables, VideoSummary, SummaryJob, SummaryTerm, SummaryTermStat, IngestionSource, IngestionRun
 from .db_service import DatabaseService
+from .job_service import JobQueueService
+from .ingestion_service import IngestionService
+from .search_service import SearchService
 
-__all__ = ['create_tables', 'VideoSummary', 'DatabaseService']
\ No newline at end of file
+__all__ = ['create_tables', 'VideoSummary', 'SummaryJob', 'SummaryTerm', 'SummaryTermStat', 'IngestionSource', 'IngestionRun', 'DatabaseService', 'JobQueueService', 'IngestionService', 'SearchService']
\ No newline at end of file
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, String, Text, DateTime, Integer, create_engine, JSON
+from sqlalchemy import Column, String, Text, DateTime, Integer, Float, Boolean, create_engine, JSON, UniqueConstraint, Index, event, inspect, text
+from sqlalchemy.dialects import mysql
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
@@ -15,9 +16,15 @@ DB_NAME = os.getenv("DB_NAME")
 DB_HOST = os.getenv("DB_HOST")
 DB_PORT = os.getenv("DB_PORT", "3306")  # MySQLのデフォルトポート
 INSTANCE_CONNECTION_NAME = os.getenv("INSTANCE_CONNECTION_NAME")
+DATABASE_URL = os.getenv("DATABASE_URL")  # 明示的な接続URL（例: sqlite:///./local.db）
+LOCAL_SQLITE_URL = "sqlite:///./local.db"
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))  # コネクションプールの空きを待つ上限
 
 # App EngineではなくCloud Run環境の検出方法を修正
-if os.getenv("K_SERVICE") or os.getenv("GAE_ENV", "").startswith("standard"):
+if DATABASE_URL:
+    db_url = DATABASE_URL
+    print(f"DB接続URL: {db_url.split('@')[-1]}")
+elif os.getenv("K_SERVICE") or os.getenv("GAE_ENV", "").startswith("standard"):
     # Cloud RunまたはApp Engineの場合、Unix socketを使用
     db_socket_dir = os.getenv("DB_SOCKET_DIR", "/cloudsql")
     cloud_sql_connection_name = INSTANCE_CONNECTION_NAME
@@ -30,18 +37,38 @@ if os.getenv("K_SERVICE") or os.getenv("GAE_ENV", "").startswith("standard"):
     
     # 接続情報をログ出力（パスワードは除く）
     print(f"DB接続URL: mysql+pymysql://{DB_USER}:***@/{DB_NAME}?unix_socket={socket_path}")
-else:
+elif DB_HOST:
     # ローカル開発環境では直接接続
     db_url = f"mysql+pymysql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
     print(f"DB接続URL: mysql+pymysql://{DB_USER}:***@{DB_HOST}:{DB_PORT}/{DB_NAME}")
+else:
+    # DB設定がないローカル環境ではSQLiteを使用
+    db_url = LOCAL_SQLITE_URL
+    print(f"DB接続URL: {db_url}")
+
+IS_SQLITE = db_url.startswith("sqlite")
 
 # データベースエンジンの作成
-engine = create_engine(
-    db_url, 
-    pool_recycle=90, 
-    pool_timeout=30,
-    pool_pre_ping=True
-)
+if IS_SQLITE:
+    engine = create_engine(
+        db_url,
+        connect_args={"check_same_thread": False, "timeout": 30}
+    )
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragma(dbapi_connection, connection_record):
+        # ワーカースレッドとAPIスレッドの同時アクセスに備えてWALモードを使用
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+else:
+    engine = create_engine(
+        db_url, 
+        pool_recycle=90, 
+        pool_timeout=DB_POOL_TIMEOUT_SECONDS,
+        pool_pre_ping=True
+    )
 
 # セッションの作成
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -52,6 +79,11 @@ Base = declarative_base()
 # 要約データモデル
 class VideoSummary(Base):
     __tablename__ = "video_summaries"
+    __table_args__ = (
+        Index("ix_video_summaries_version", "video_id", "prompt_hash", "model_name", "transcript_hash"),
+        # エクスポートのウォーターマーク（created_at, id）による範囲指定と並び替え用
+        Index("ix_video_summaries_created_at", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     video_id = Column(String(255), nullable=False, index=True)
@@ -66,12 +98,159 @@ class VideoSummary(Base):
     action_items = Column(JSON) # MySQLではARRAYタイプがないためJSONを使用
     key_points = Column(JSON)   # 構造化データは保持
     gcs_path = Column(String(500))
-    created_at = Column(DateTime, default=datetime.utcnow)
+    # 要約のバージョン情報（どのプロンプト・モデル・文字起こしから生成されたか）
+    prompt_hash = Column(String(64))
+    model_name = Column(String(100))
+    transcript_hash = Column(String(64))
+    # GET /summaries/{video_id} が返す内容のハッシュ（ETagとして使用）
+    content_hash = Column(String(64))
+    # MySQLのDATETIMEは秒未満を保持しないため、エクスポートのウォーターマークの順序が保存順とずれないようDATETIME(6)とする
+    created_at = Column(DateTime().with_variant(mysql.DATETIME(fsp=6), "mysql"), default=datetime.utcnow)
     
     def __repr__(self):
         return f"<VideoSummary(video_id='{self.video_id}', title='{self.video_title}')>"
 
+# 要約の検索用転置インデックスモデル（動画ごとに最新の要約の語とその重みを保持）
+class SummaryTerm(Base):
+    __tablename__ = "summary_terms"
+    __table_args__ = (
+        # 1語の検索で重みの上位を取得する（video_idを含めると候補の照合でも主キーより優先されるため含めない）
+        Index("ix_summary_terms_term", "term", "weight"),
+        # 要約の再保存時に同じ動画の語を置き換える
+        Index("ix_summary_terms_video_id", "video_id"),
+        # SQLiteでもMySQL（InnoDB）と同様に主キー順に行を格納し、主キーでの照合で重みまで取得できるようにする
+        {"sqlite_with_rowid": False},
+    )
+
+    # 主キーは(term, video_id)の順とし、語ごとの走査と候補の動画の照合をどちらも主キーで行う
+    term = Column(String(64), primary_key=True)
+    video_id = Column(String(255), primary_key=True)
+    summary_id = Column(Integer, nullable=False)  # 索引を作成した要約（video_summaries.id）
+    weight = Column(Float, nullable=False)
+
+    def __repr__(self):
+        return f"<SummaryTerm(video_id='{self.video_id}', term='{self.term}', weight={self.weight})>"
+
+# 検索用の語ごとの出現動画数モデル（IDFの計算と、検索時に出現数の少ない語から照合するために使用）
+class SummaryTermStat(Base):
+    __tablename__ = "summary_term_stats"
+
+    term = Column(String(64), primary_key=True)
+    document_count = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<SummaryTermStat(term='{self.term}', document_count={self.document_count})>"
+
+# 要約ジョブキューモデル
+class SummaryJob(Base):
+    __tablename__ = "summary_jobs"
+    __table_args__ = (
+        # (video_id, strategy)ごとに1ジョブとすることで冪等性を保証する
+        UniqueConstraint("video_id", "strategy", name="uq_summary_jobs_video_strategy"),
+        Index("ix_summary_jobs_claim", "status", "priority", "created_at"),
+    )
+    
+    id = Column(String(36), primary_key=True)
+    video_id = Column(String(255), nullable=False)
+    strategy = Column(String(64), nullable=False, default="default")
+    priority = Column(Integer, nullable=False, default=0)  # 大きいほど優先
+    status = Column(String(20), nullable=False, default="queued")  # queued / running / succeeded / failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    visible_at = Column(DateTime, default=datetime.utcnow)  # この時刻まで他ワーカーから不可視
+    worker_id = Column(String(100))
+    result = Column(JSON)
+    error = Column(Text)
+    error_code = Column(Integer)  # 失敗時のHTTPステータス相当のコード
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    
+    def __repr__(self):
+        return f"<SummaryJob(id='{self.id}', video_id='{self.video_id}', status='{self.status}')>"
+
+# 事前要約（プリウォーム）対象のチャンネル・プレイリストモデル
+class IngestionSource(Base):
+    __tablename__ = "ingestion_sources"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    source_id = Column(String(255), nullable=False, unique=True)  # チャンネルIDまたはプレイリストID
+    source_type = Column(String(20), nullable=False)  # channel / playlist
+    uploads_playlist_id = Column(String(255))  # チャンネルのアップロード動画プレイリストID
+    last_published_at = Column(DateTime)  # 取り込み済みの最新公開日時（次回はこれより新しい動画のみ走査）
+    last_run_at = Column(DateTime)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<IngestionSource(source_id='{self.source_id}', type='{self.source_type}')>"
+
+# 事前要約の実行履歴（進捗）モデル
+class IngestionRun(Base):
+    __tablename__ = "ingestion_runs"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    source_id = Column(String(255), nullable=False, index=True)
+    status = Column(String(20), nullable=False, default="running")  # running / completed / stopped / failed
+    dry_run = Column(Boolean, nullable=False, default=False)
+    pages_fetched = Column(Integer, nullable=False, default=0)
+    videos_seen = Column(Integer, nullable=False, default=0)
+    videos_enqueued = Column(Integer, nullable=False, default=0)
+    videos_skipped = Column(Integer, nullable=False, default=0)
+    quota_units_used = Column(Integer, nullable=False, default=0)
+    error = Column(Text)
+    started_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime)
+    
+    def __repr__(self):
+        return f"<IngestionRun(source_id='{self.source_id}', status='{self.status}')>"
+
+# 複数のワーカーのうち1プロセスだけが実行する処理の担当（リース）モデル
+class SchedulerLease(Base):
+    __tablename__ = "scheduler_leases"
+    
+    name = Column(String(64), primary_key=True)  # 処理名（例: ingestion）
+    holder = Column(String(100), nullable=False)  # 担当しているプロセスの識別子
+    expires_at = Column(DateTime, nullable=False)  # この時刻を過ぎたら他のプロセスが引き継げる
+    
+    def __repr__(self):
+        return f"<SchedulerLease(name='{self.name}', holder='{self.holder}')>"
+
+# 既存テーブルに不足しているNULL許容カラムとインデックスを追加する（簡易マイグレーション）
+def add_missing_columns():
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+                print(f"カラムを追加しました: {table.name}.{column.name}")
+            # カラムの追加がなくても、後から定義に加えたインデックスは作成する
+            existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(bind=conn)
+                    print(f"インデックスを追加しました: {table.name}.{index.name}")
+
+# 秒単位で作成済みのMySQLのvideo_summaries.created_atを秒未満まで保持する型に変更する（既存の値は変わらない）
+def widen_created_at_precision():
+    if engine.dialect.name != "mysql" or not inspect(engine).has_table(VideoSummary.__tablename__):
+        return
+    column = next(c for c in inspect(engine).get_columns(VideoSummary.__tablename__) if c["name"] == "created_at")
+    if getattr(column["type"], "fsp", None):
+        return
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {VideoSummary.__tablename__} MODIFY COLUMN created_at DATETIME(6) NULL"))
+    print(f"カラムの型を変更しました: {VideoSummary.__tablename__}.created_at DATETIME(6)")
+
 # データベーステーブルの作成
 def create_tables():
     Base.metadata.create_all(bind=engine)
+    add_missing_columns()
+    widen_created_at_precision()
     print("データベーステーブル作成成功")
@@ -1,12 +1,53 @@
 import json
-from sqlalchemy.exc import SQLAlchemyError
-from .db_models import SessionLocal, VideoSummary
+import hashlib
+from datetime import datetime
+from sqlalchemy import func, or_, and_, select
+from sqlalchemy.exc import SQLAlchemyError, OperationalError, InterfaceError, DisconnectionError, TimeoutError as PoolTimeoutError
+from services.circuit_breaker import circuit_breakers, CircuitBreakerRegistry, CircuitOpen
+from .db_models import SessionLocal, VideoSummary, SummaryJob
+from .search_service import SearchService
 import traceback
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+def summary_to_document(summary):
+    """
+    概要: 要約レコードをAPIで返す要約ドキュメント（辞書）に変換する
+    用途: GET /summaries/{video_id} のレスポンスと、その内容ハッシュの計算に使用する
+    """
+    return {
+        "video_id": summary.video_id,
+        "title": summary.video_title,
+        "description": summary.video_description,
+        "channel_title": summary.channel_title,
+        "channel_id": summary.channel_id,
+        "summary": {
+            "sub_title": summary.sub_title,
+            "overview": summary.overview,
+            "main_topics": summary.main_topics or [],
+            "key_points": summary.key_points or [],
+            "keywords": summary.keywords or [],
+            "action_items": summary.action_items or [],
+        },
+        "model_name": summary.model_name,
+        "prompt_hash": summary.prompt_hash,
+        "created_at": summary.created_at.isoformat() if summary.created_at else None,
+    }
+
+
+def is_database_unavailable(exc):
+    """DBに接続できない・応答がないことを示す例外か判定する（制約違反などの応答はDBの障害として扱わない）"""
+    return isinstance(exc, (OperationalError, InterfaceError, DisconnectionError, PoolTimeoutError))
+
+
+def compute_content_hash(document):
+    """要約ドキュメントを正規化したJSONのハッシュを返す（内容が同じなら同じ値になる）"""
+    canonical = json.dumps(document, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
 class DatabaseService:
     """
     概要: データベース操作を行うサービスクラス
@@ -14,11 +55,13 @@ class DatabaseService:
     """
     
     @staticmethod
-    def save_summary_to_db(video_id, summary_data, video_info, gcs_path=None):
+    def save_summary_to_db(video_id, summary_data, video_info, gcs_path=None, version=None):
         """
         概要: 要約データをデータベースに保存
-        用途: 生成された要約データをCloud SQLに格納
+        用途: 生成された要約データを、生成元のプロンプト・モデル・文字起こしのハッシュとともにCloud SQLに格納し、検索インデックスを更新する。
+              検索インデックスは要約のコミット後に別のトランザクションで更新し、失敗しても要約の保存は取り消さない
         """
+        version = version or {}
         # セッションの開始
         db = SessionLocal()
         try:
@@ -45,15 +88,26 @@ class DatabaseService:
                 keywords=summary_json.get("keywords", []),
                 action_items=summary_json.get("action_items", []),
                 key_points=summary_json.get("key_points", []),
-                gcs_path=gcs_path
+                gcs_path=gcs_path,
+                prompt_hash=version.get("prompt_hash"),
+                model_name=version.get("model_name"),
+                transcript_hash=version.get("transcript_hash"),
+                # 秒未満まで保持する（MySQLではDATETIME(6)）。エクスポートのウォーターマークの順序が保存順とずれないようにする
+                created_at=datetime.utcnow()
             )
+            db_summary.content_hash = compute_content_hash(summary_to_document(db_summary))
             
-            # データベースに追加とコミット
-            db.add(db_summary)
-            db.commit()
-            db.refresh(db_summary)
+            # データベースに追加してコミット（DBの障害中は接続を待たずに保存を省略する）
+            with circuit_breakers.get(CircuitBreakerRegistry.DATABASE).guard(is_database_unavailable):
+                db.add(db_summary)
+                db.commit()
+                db.refresh(db_summary)
             logger.info(f"データベースに要約を保存しました: video_id={video_id}, id={db_summary.id}")
+            SearchService.index_saved_summary(db_summary.id, video_id)
             return db_summary.id
+        except CircuitOpen as co:
+            logger.warning(f"データベースへの要約の保存を省略しました: video_id={video_id}, {str(co)}")
+            return None
         except SQLAlchemyError as e:
             db.rollback()
             error_trace = traceback.format_exc()
@@ -68,14 +122,23 @@ class DatabaseService:
             db.close()
     
     @staticmethod
-    def get_summary_by_video_id(video_id):
+    def get_summary_by_video_id(video_id, prompt_hash=None, model_name=None, transcript_hash=None):
         """
         概要: ビデオIDから要約データを取得
-        用途: 過去に保存した要約データの取得
+        用途: 過去に保存した要約データの取得。バージョン情報を指定した場合はそれに一致する要約のみを対象とする
         """
         db = SessionLocal()
         try:
-            summary = db.query(VideoSummary).filter(VideoSummary.video_id == video_id).order_by(VideoSummary.created_at.desc()).first()
+            query = db.query(VideoSummary).filter(VideoSummary.video_id == video_id)
+            if prompt_hash is not None:
+                query = query.filter(VideoSummary.prompt_hash == prompt_hash)
+            if model_name is not None:
+                query = query.filter(VideoSummary.model_name == model_name)
+            if transcript_hash is not None:
+                query = query.filter(VideoSummary.transcript_hash == transcript_hash)
+            # DBの障害中は接続を待たずに「要約なし」として扱う（呼び出し側は共有キャッシュのみを使う）
+            with circuit_breakers.get(CircuitBreakerRegistry.DATABASE).guard(is_database_unavailable):
+                summary = query.order_by(VideoSummary.created_at.desc(), VideoSummary.id.desc()).first()
             if summary:
                 # データベースのフィールドからJSONオブジェクトを再構築
                 summary_data = {
@@ -88,9 +151,146 @@ class DatabaseService:
                 }
                 # summary_dataプロパティを追加
                 summary.summary_data = summary_data
+                summary.version = {
+                    "prompt_hash": summary.prompt_hash,
+                    "model_name": summary.model_name,
+                    "transcript_hash": summary.transcript_hash
+                }
+                if summary.content_hash is None:
+                    # 内容ハッシュを導入する前に保存された要約はその場で計算する
+                    summary.content_hash = compute_content_hash(summary_to_document(summary))
             return summary
+        except CircuitOpen as co:
+            logger.warning(f"データベースからの要約の取得を省略しました: video_id={video_id}, {str(co)}")
+            return None
         except Exception as e:
             logger.error(f"要約取得エラー: {str(e)}")
             return None
+        finally:
+            db.close()
+
+    @staticmethod
+    def find_stale_video_ids(prompt_hash, model_name, limit=100):
+        """
+        概要: 最新の要約が現在のプロンプト・モデルで生成されていない動画IDを取得
+        用途: バックグラウンドの再要約対象の抽出（処理待ち・処理中のジョブがある動画は除外）
+        """
+        db = SessionLocal()
+        try:
+            latest_ids = db.query(func.max(VideoSummary.id)).group_by(VideoSummary.video_id).subquery()
+            active_jobs = db.query(SummaryJob.video_id).filter(SummaryJob.status.in_(["queued", "running"]))
+            rows = db.query(VideoSummary.video_id).filter(
+                VideoSummary.id.in_(db.query(latest_ids)),
+                or_(
+                    VideoSummary.prompt_hash.is_(None),
+                    VideoSummary.prompt_hash != prompt_hash,
+                    VideoSummary.model_name.is_(None),
+                    VideoSummary.model_name != model_name
+                ),
+                VideoSummary.video_id.notin_(active_jobs)
+            ).order_by(VideoSummary.id.desc()).limit(limit).all()
+            return [row[0] for row in rows]
+        except Exception as e:
+            logger.error(f"再要約対象の取得エラー: {str(e)}")
+            return []
+        finally:
+            db.close()
+
+    @staticmethod
+    def _after_watermark(watermark):
+        """(created_at, id)の組がウォーターマークより後である条件（created_atが同じ行はidで順序づける）"""
+        created_at, row_id = watermark
+        return or_(
+            VideoSummary.created_at > created_at,
+            and_(VideoSummary.created_at == created_at, VideoSummary.id > row_id)
+        )
+
+    @staticmethod
+    def get_export_watermark(since=None, before=None):
+        """
+        概要: ウォーターマークより後に保存された要約のうち、最新の(created_at, id)を取得
+        用途: エクスポート開始時点の上限として使用し、エクスポート中に追加された行は次回に回す。対象がなければNone。
+              beforeを指定した場合はその日時より前に作成された行のみを対象とする（created_atはコミット前に決まるため、
+              作成直後の行はまだコミットされていない行より後の値になることがある）
+        """
+        db = SessionLocal()
+        try:
+            query = db.query(VideoSummary.created_at, VideoSummary.id).filter(VideoSummary.created_at.isnot(None))
+            if since is not None:
+                query = query.filter(DatabaseService._after_watermark(since))
+            if before is not None:
+                query = query.filter(VideoSummary.created_at < before)
+            row = query.order_by(VideoSummary.created_at.desc(), VideoSummary.id.desc()).first()
+            return (row[0], row[1]) if row else None
+        finally:
+            db.close()
+
+    @staticmethod
+    def iter_summaries_for_export(since=None, until=None, batch_size=500):
+        """
+        概要: 要約レコードを(created_at, id)順に1件ずつ返すジェネレーター
+        用途: サーバーサイドカーソル（stream_results）でbatch_size件ずつ取得するため、テーブルの大きさによらずメモリ使用量が一定。
+              ORMオブジェクトではなく行（Row）を返し、セッションのIDマップに蓄積させない
+        """
+        table = VideoSummary.__table__
+        statement = select(table).where(VideoSummary.created_at.isnot(None))
+        if since is not None:
+            statement = statement.where(DatabaseService._after_watermark(since))
+        if until is not None:
+            created_at, row_id = until
+            statement = statement.where(or_(
+                VideoSummary.created_at < created_at,
+                and_(VideoSummary.created_at == created_at, VideoSummary.id <= row_id)
+            ))
+        statement = statement.order_by(VideoSummary.created_at, VideoSummary.id)
+        db = SessionLocal()
+        try:
+            # MySQL（PyMySQL）ではSSCursorで逐次取得する。SQLiteではfetchmanyでbatch_size件ずつ取得される
+            connection = db.connection(execution_options={"stream_results": True, "yield_per": batch_size})
+            result = connection.execute(statement)
+            for row in result:
+                yield row
+        finally:
+            db.close()
+
+    @staticmethod
+    def iter_summaries_for_related_index(after_id=0, latest_only=False, batch_size=500):
+        """
+        概要: 関連動画インデックスの作成に必要な項目だけを、要約IDの順に1件ずつ返すジェネレーター
+        用途: latest_only=Trueの場合は動画ごとに最新の要約のみを対象とする（初回の一括作成用）。
+              after_idより後の要約のみを返すため、前回以降に保存された要約の差分取得にも使う
+        """
+        statement = select(
+            VideoSummary.id, VideoSummary.video_id, VideoSummary.sub_title, VideoSummary.overview,
+            VideoSummary.keywords, VideoSummary.main_topics
+        ).where(VideoSummary.id > after_id)
+        if latest_only:
+            latest_ids = select(func.max(VideoSummary.id)).group_by(VideoSummary.video_id)
+            statement = statement.where(VideoSummary.id.in_(latest_ids))
+        db = SessionLocal()
+        try:
+            connection = db.connection(execution_options={"stream_results": True, "yield_per": batch_size})
+            for row in connection.execute(statement.order_by(VideoSummary.id)):
+                yield row
+        finally:
+            db.close()
+
+    @staticmethod
+    def get_latest_summaries(video_ids):
+        """
+        概要: 複数の動画の最新の要約を取得
+        用途: 関連動画の一覧表示用。video_idをキーとする辞書を返す
+        """
+        if not video_ids:
+            return {}
+        db = SessionLocal()
+        try:
+            latest_ids = (
+                select(func.max(VideoSummary.id))
+                .where(VideoSummary.video_id.in_(video_ids))
+                .group_by(VideoSummary.video_id)
+            )
+            summaries = db.query(VideoSummary).filter(VideoSummary.id.in_(latest_ids)).all()
+            return {summary.video_id: summary for summary in summaries}
         finally:
             db.close()
\ No newline at end of file
@@ -0,0 +1,200 @@
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from .db_models import SessionLocal, IngestionSource, IngestionRun, VideoSummary, SummaryJob, SchedulerLease
+
+logger = logging.getLogger(__name__)
+
+
+def source_to_dict(source: IngestionSource) -> dict:
+    return {
+        "source_id": source.source_id,
+        "source_type": source.source_type,
+        "uploads_playlist_id": source.uploads_playlist_id,
+        "last_published_at": source.last_published_at,
+        "last_run_at": source.last_run_at,
+    }
+
+
+def run_to_dict(run: IngestionRun) -> dict:
+    return {
+        "run_id": run.id,
+        "source_id": run.source_id,
+        "status": run.status,
+        "dry_run": run.dry_run,
+        "pages_fetched": run.pages_fetched,
+        "videos_seen": run.videos_seen,
+        "videos_enqueued": run.videos_enqueued,
+        "videos_skipped": run.videos_skipped,
+        "quota_units_used": run.quota_units_used,
+        "error": run.error,
+        "started_at": run.started_at.isoformat() if run.started_at else None,
+        "finished_at": run.finished_at.isoformat() if run.finished_at else None,
+    }
+
+
+class IngestionService:
+    """
+    概要: チャンネル・プレイリストの事前要約（プリウォーム）に関するDB操作を行うサービスクラス
+    用途: 取り込み対象の管理、実行進捗の記録、未処理動画の判定
+    """
+
+    @staticmethod
+    def get_or_create_source(source_id, source_type):
+        """取り込み対象を取得し、存在しなければ登録する"""
+        db = SessionLocal()
+        try:
+            source = db.query(IngestionSource).filter(IngestionSource.source_id == source_id).first()
+            if source is None:
+                source = IngestionSource(source_id=source_id, source_type=source_type)
+                db.add(source)
+                db.commit()
+                db.refresh(source)
+            return source_to_dict(source)
+        finally:
+            db.close()
+
+    @staticmethod
+    def update_source(source_id, **fields):
+        """取り込み対象の情報（アップロードプレイリストID、最新公開日時など）を更新する"""
+        db = SessionLocal()
+        try:
+            db.query(IngestionSource).filter(IngestionSource.source_id == source_id).update(
+                fields, synchronize_session=False
+            )
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error(f"取り込み対象の更新エラー: source_id={source_id}, {str(e)}")
+        finally:
+            db.close()
+
+    @staticmethod
+    def start_run(source_id, dry_run=False):
+        """実行履歴を作成し、実行IDを返す"""
+        db = SessionLocal()
+        try:
+            run = IngestionRun(source_id=source_id, status="running", dry_run=dry_run)
+            db.add(run)
+            db.commit()
+            return run.id
+        finally:
+            db.close()
+
+    @staticmethod
+    def record_progress(run_id, **increments):
+        """
+        概要: 実行中の進捗カウンターを加算する
+        用途: ページ取得ごとに進捗を記録し、実行途中でも状況を確認できるようにする
+        """
+        db = SessionLocal()
+        try:
+            db.query(IngestionRun).filter(IngestionRun.id == run_id).update(
+                {getattr(IngestionRun, name): getattr(IngestionRun, name) + value for name, value in increments.items()},
+                synchronize_session=False
+            )
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error(f"取り込み進捗の記録エラー: run_id={run_id}, {str(e)}")
+        finally:
+            db.close()
+
+    @staticmethod
+    def finish_run(run_id, status, error=None):
+        """実行を終了状態にする"""
+        db = SessionLocal()
+        try:
+            run = db.query(IngestionRun).filter(IngestionRun.id == run_id).first()
+            if run is None:
+                return None
+            run.status = status
+            run.error = error
+            run.finished_at = datetime.utcnow()
+            db.commit()
+            db.refresh(run)
+            return run_to_dict(run)
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error(f"取り込み終了の記録エラー: run_id={run_id}, {str(e)}")
+            return None
+        finally:
+            db.close()
+
+    @staticmethod
+    def list_runs(limit=50, source_id=None):
+        """最近の実行履歴を新しい順に返す"""
+        db = SessionLocal()
+        try:
+            query = db.query(IngestionRun)
+            if source_id:
+                query = query.filter(IngestionRun.source_id == source_id)
+            return [run_to_dict(run) for run in query.order_by(IngestionRun.id.desc()).limit(limit).all()]
+        finally:
+            db.close()
+
+    @staticmethod
+    def acquire_lease(name, holder, ttl_seconds):
+        """
+        概要: 処理の担当（リース）を取得・延長する。取得できた場合はTrueを返す
+        用途: 担当者がいないか期限切れの場合のみ取得でき、担当中のプロセスは期限を延長する。
+              複数のワーカー（ホスト）のうち1プロセスだけが定期処理を実行するために使う
+        """
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=ttl_seconds)
+        db = SessionLocal()
+        try:
+            updated = db.query(SchedulerLease).filter(
+                SchedulerLease.name == name,
+                or_(SchedulerLease.holder == holder, SchedulerLease.expires_at < now)
+            ).update({SchedulerLease.holder: holder, SchedulerLease.expires_at: expires_at}, synchronize_session=False)
+            if not updated:
+                db.add(SchedulerLease(name=name, holder=holder, expires_at=expires_at))
+            db.commit()
+            return True
+        except IntegrityError:
+            # 他のプロセスが担当中（または同時に取得した）
+            db.rollback()
+            return False
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error(f"担当の取得エラー: name={name}, {str(e)}")
+            return False
+        finally:
+            db.close()
+
+    @staticmethod
+    def release_lease(name, holder):
+        """担当を手放し、他のプロセスがすぐに引き継げるようにする（終了時用）"""
+        db = SessionLocal()
+        try:
+            db.query(SchedulerLease).filter(SchedulerLease.name == name, SchedulerLease.holder == holder).delete(
+                synchronize_session=False
+            )
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error(f"担当の解放エラー: name={name}, {str(e)}")
+        finally:
+            db.close()
+
+    @staticmethod
+    def filter_unseen_video_ids(video_ids):
+        """
+        概要: 要約済み・ジョブ登録済みでない動画IDだけを返す
+        用途: 1ページ分（最大50件）の動画IDをまとめて問い合わせ、既知の動画を除外する
+        """
+        if not video_ids:
+            return []
+        db = SessionLocal()
+        try:
+            summarized = {
+                row[0] for row in db.query(VideoSummary.video_id).filter(VideoSummary.video_id.in_(video_ids)).all()
+            }
+            queued = {
+                row[0] for row in db.query(SummaryJob.video_id).filter(SummaryJob.video_id.in_(video_ids)).all()
+            }
+            return [video_id for video_id in video_ids if video_id not in summarized and video_id not in queued]
+        finally:
+            db.close()
@@ -0,0 +1,257 @@
+import os
+import time
+import uuid
+import traceback
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import or_, and_, func
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from .db_models import SessionLocal, SummaryJob
+
+logger = logging.getLogger(__name__)
+
+# ジョブキュー設定
+JOB_VISIBILITY_TIMEOUT_SECONDS = int(os.getenv("JOB_VISIBILITY_TIMEOUT_SECONDS", "600"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+JOB_STATUS_QUEUED = "queued"
+JOB_STATUS_RUNNING = "running"
+JOB_STATUS_SUCCEEDED = "succeeded"
+JOB_STATUS_FAILED = "failed"
+
+
+def job_to_dict(job: SummaryJob) -> dict:
+    """ジョブをAPIレスポンス用の辞書に変換する"""
+    return {
+        "job_id": job.id,
+        "video_id": job.video_id,
+        "strategy": job.strategy,
+        "priority": job.priority,
+        "status": job.status,
+        "attempts": job.attempts,
+        "result": job.result,
+        "error": job.error,
+        "error_code": job.error_code,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "updated_at": job.updated_at.isoformat() if job.updated_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+class JobQueueService:
+    """
+    概要: DBテーブルを用いた永続ジョブキューの操作を行うサービスクラス
+    用途: 要約ジョブの登録・取得（クレーム）・完了・失敗の記録
+    """
+
+    @staticmethod
+    def enqueue(video_id, strategy="default", priority=0, refresh=False):
+        """
+        概要: ジョブを登録する
+        用途: 同じ(video_id, strategy)のジョブが既にあればそれを返す（失敗済みの場合は再登録する）。
+              refresh=Trueの場合は成功済みのジョブも再実行する（プロンプト変更後の再要約など）
+        """
+        db = SessionLocal()
+        try:
+            job = db.query(SummaryJob).filter(
+                SummaryJob.video_id == video_id, SummaryJob.strategy == strategy
+            ).first()
+            if job is None:
+                job = SummaryJob(
+                    id=str(uuid.uuid4()),
+                    video_id=video_id,
+                    strategy=strategy,
+                    priority=priority,
+                    status=JOB_STATUS_QUEUED,
+                    attempts=0,
+                    max_attempts=JOB_MAX_ATTEMPTS,
+                    visible_at=datetime.utcnow(),
+                )
+                db.add(job)
+                try:
+                    db.commit()
+                except IntegrityError:
+                    # 同時登録された場合は先に登録されたジョブを返す
+                    db.rollback()
+                    job = db.query(SummaryJob).filter(
+                        SummaryJob.video_id == video_id, SummaryJob.strategy == strategy
+                    ).first()
+                    return job_to_dict(job)
+                logger.info(f"ジョブを登録しました: job_id={job.id}, video_id={video_id}, strategy={strategy}")
+            elif job.status == JOB_STATUS_FAILED or (refresh and job.status == JOB_STATUS_SUCCEEDED):
+                job.status = JOB_STATUS_QUEUED
+                job.attempts = 0
+                job.error = None
+                job.error_code = None
+                job.priority = priority
+                job.visible_at = datetime.utcnow()
+                db.commit()
+                logger.info(f"終了済みジョブを再登録しました: job_id={job.id}, refresh={refresh}")
+            elif job.status == JOB_STATUS_QUEUED and priority > job.priority:
+                # より高い優先度で要求された場合は優先度を引き上げる
+                job.priority = priority
+                db.commit()
+            db.refresh(job)
+            return job_to_dict(job)
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error(f"ジョブ登録エラー: {str(e)}\n{traceback.format_exc()}")
+            raise
+        finally:
+            db.close()
+
+    @staticmethod
+    def claim_next(worker_id, visibility_timeout=JOB_VISIBILITY_TIMEOUT_SECONDS):
+        """
+        概要: 実行可能なジョブを1件取得してクレームする
+        用途: 優先度の高い順に取得し、可視性タイムアウトの間は他ワーカーから見えなくする。
+              タイムアウトした実行中ジョブ（ワーカー停止など）も再取得の対象とする
+        """
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            claimable = or_(
+                and_(SummaryJob.status == JOB_STATUS_QUEUED, SummaryJob.visible_at <= now),
+                and_(SummaryJob.status == JOB_STATUS_RUNNING, SummaryJob.visible_at <= now),
+            )
+            candidates = db.query(SummaryJob.id).filter(claimable).order_by(
+                SummaryJob.priority.desc(), SummaryJob.created_at.asc()
+            ).limit(5).all()
+            for (job_id,) in candidates:
+                # 楽観的ロック: 条件付きUPDATEの更新件数で他ワーカーとの競合を判定する
+                updated = db.query(SummaryJob).filter(SummaryJob.id == job_id, claimable).update({
+                    SummaryJob.status: JOB_STATUS_RUNNING,
+                    SummaryJob.worker_id: worker_id,
+                    SummaryJob.attempts: SummaryJob.attempts + 1,
+                    SummaryJob.visible_at: now + timedelta(seconds=visibility_timeout),
+                    SummaryJob.started_at: now,
+                    SummaryJob.updated_at: now,
+                }, synchronize_session=False)
+                db.commit()
+                if updated != 1:
+                    continue
+                job = db.query(SummaryJob).filter(SummaryJob.id == job_id).first()
+                if job.attempts > job.max_attempts:
+                    # 可視性タイムアウトを繰り返したジョブは失敗として扱う
+                    job.status = JOB_STATUS_FAILED
+                    job.error = job.error or "可視性タイムアウト内に処理が完了しませんでした"
+                    job.error_code = job.error_code or 504
+                    job.finished_at = now
+                    db.commit()
+                    continue
+                return job_to_dict(job)
+            return None
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error(f"ジョブ取得エラー: {str(e)}")
+            return None
+        finally:
+            db.close()
+
+    @staticmethod
+    def complete(job_id, worker_id, result):
+        """ジョブを成功として記録する"""
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            db.query(SummaryJob).filter(
+                SummaryJob.id == job_id, SummaryJob.worker_id == worker_id
+            ).update({
+                SummaryJob.status: JOB_STATUS_SUCCEEDED,
+                SummaryJob.result: result,
+                SummaryJob.error: None,
+                SummaryJob.error_code: None,
+                SummaryJob.finished_at: now,
+                SummaryJob.updated_at: now,
+            }, synchronize_session=False)
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error(f"ジョブ完了記録エラー: job_id={job_id}, {str(e)}")
+        finally:
+            db.close()
+
+    @staticmethod
+    def fail(job_id, worker_id, error, retryable=True, retry_delay=0.0, error_code=500):
+        """
+        概要: ジョブの失敗を記録する
+        用途: 再試行可能かつ試行回数が上限未満の場合は遅延を付けて再キューイングする
+        """
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            job = db.query(SummaryJob).filter(
+                SummaryJob.id == job_id, SummaryJob.worker_id == worker_id
+            ).first()
+            if job is None:
+                return
+            job.error = error
+            job.error_code = error_code
+            job.updated_at = now
+            if retryable and job.attempts < job.max_attempts:
+                job.status = JOB_STATUS_QUEUED
+                job.visible_at = now + timedelta(seconds=retry_delay)
+                logger.warning(f"ジョブを再キューイングします: job_id={job_id}, attempts={job.attempts}, error={error}")
+            else:
+                job.status = JOB_STATUS_FAILED
+                job.finished_at = now
+                logger.error(f"ジョブが失敗しました: job_id={job_id}, error={error}")
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error(f"ジョブ失敗記録エラー: job_id={job_id}, {str(e)}")
+        finally:
+            db.close()
+
+    @staticmethod
+    def backlog(min_priority=None):
+        """
+        概要: 待機中のジョブの件数と、実行可能になってから最も長く待っているジョブの待ち時間（秒）を返す
+        用途: 流入制御の判定に使う。min_priorityを指定した場合はその優先度以上のジョブのみを数える
+              （先に取得されるジョブだけが新しいジョブの待ち時間に影響するため）
+        """
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            query = db.query(func.count(SummaryJob.id), func.min(SummaryJob.visible_at)).filter(
+                SummaryJob.status == JOB_STATUS_QUEUED
+            )
+            if min_priority is not None:
+                query = query.filter(SummaryJob.priority >= min_priority)
+            count, oldest_visible_at = query.one()
+            oldest = max(0.0, (now - oldest_visible_at).total_seconds()) if oldest_visible_at else 0.0
+            return count, oldest
+        finally:
+            db.close()
+
+    @staticmethod
+    def get_job(job_id):
+        """ジョブIDからジョブを取得する"""
+        db = SessionLocal()
+        try:
+            job = db.query(SummaryJob).filter(SummaryJob.id == job_id).first()
+            return job_to_dict(job) if job else None
+        finally:
+            db.close()
+
+    @staticmethod
+    def wait_for_job(job_id, timeout, poll_interval=0.5):
+        """
+        概要: ジョブが終了（成功または失敗）するまで待機する
+        用途: 同期APIからジョブの完了を待つ場合に使用。タイムアウト時は最新の状態を返す。
+              ジョブが見つからない場合やDBの一時的な障害で状態を取得できない場合はNoneを返す（ジョブは登録済みのため、
+              呼び出し側はジョブIDを返してポーリングに切り替える）
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                job = JobQueueService.get_job(job_id)
+            except SQLAlchemyError as e:
+                logger.warning(f"ジョブの状態を取得できないため待機を中断します: job_id={job_id}, {str(e)}")
+                return None
+            if job is None or job["status"] in (JOB_STATUS_SUCCEEDED, JOB_STATUS_FAILED):
+                return job
+            if time.monotonic() >= deadline:
+                return job
+            time.sleep(poll_interval)
@@ -0,0 +1,314 @@
+import os
+import math
+import heapq
+import time
+import logging
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import select, delete, insert, update, func
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.exc import SQLAlchemyError
+from services.text_tokenizer import tokenize
+from services.circuit_breaker import circuit_breakers, CircuitBreakerRegistry, CircuitOpen
+from .db_models import SessionLocal, VideoSummary, SummaryTerm, SummaryTermStat
+
+logger = logging.getLogger(__name__)
+
+# 検索設定
+SEARCH_MAX_QUERY_TERMS = int(os.getenv("SEARCH_MAX_QUERY_TERMS", "8"))  # 絞り込みに使う語の上限（出現数の少ない語を優先）
+SEARCH_DOC_COUNT_TTL_SECONDS = float(os.getenv("SEARCH_DOC_COUNT_TTL_SECONDS", "300"))
+SEARCH_INDEX_ATTEMPTS = int(os.getenv("SEARCH_INDEX_ATTEMPTS", "3"))  # 保存時の索引更新の試行回数（同時保存による競合・ロック待ちの再試行）
+
+# 項目ごとの重み（キーワード・トピックに一致した要約を上位にする）
+FIELD_WEIGHTS = {
+    "keywords": 3.0,
+    "main_topics": 2.5,
+    "video_title": 2.0,
+    "sub_title": 2.0,
+    "overview": 1.0,
+}
+# 語の出現回数に対する重みの飽和係数（BM25のk1）
+TERM_SATURATION = 1.2
+
+
+def _field_text(value: Any) -> str:
+    if isinstance(value, list):
+        return " ".join(str(item) for item in value if item)
+    return value or ""
+
+
+def build_terms(summary: Any) -> Dict[str, float]:
+    '''
+    概要: 要約から索引に登録する語と重みを計算する
+    用途: 項目ごとの重みを掛けた出現回数を、BM25と同様に飽和させて語の重みとする（長い概要で特定の語が過大にならないようにする）
+    '''
+    counts: Counter = Counter()
+    for field, field_weight in FIELD_WEIGHTS.items():
+        for term in tokenize(_field_text(getattr(summary, field, None))):
+            counts[term] += field_weight
+    return {
+        term: round(count * (TERM_SATURATION + 1) / (count + TERM_SATURATION), 4)
+        for term, count in counts.items()
+    }
+
+
+def _increment_statement(db, terms: List[str]):
+    """語の出現動画数を1増やす（未登録の語は1で登録する）upsert文をDBの方言に合わせて作成する"""
+    rows = [{"term": term, "document_count": 1} for term in terms]
+    incremented = SummaryTermStat.document_count + 1
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        return mysql.insert(SummaryTermStat).values(rows).on_duplicate_key_update(document_count=incremented)
+    dialect_module = postgresql if dialect == "postgresql" else sqlite
+    return dialect_module.insert(SummaryTermStat).values(rows).on_conflict_do_update(
+        index_elements=["term"], set_={"document_count": incremented}
+    )
+
+
+def _idf(document_count: int, document_frequency: int) -> float:
+    return math.log(1 + (document_count - document_frequency + 0.5) / (document_frequency + 0.5))
+
+
+class SearchService:
+    """
+    概要: 要約の検索用転置インデックス（summary_termsテーブル）の更新と検索を行うサービスクラス
+    用途: キーワード・トピック・タイトル・概要による要約の全文検索。JSONカラムの全件走査を避ける
+    """
+
+    _document_count = 0
+    _document_count_expires_at = 0.0
+    _document_count_lock = threading.Lock()
+
+    @staticmethod
+    def index_summary(db, summary):
+        """
+        概要: 要約の語を索引に登録する（同じ動画の以前の要約の語は置き換える）
+        用途: 渡されたセッションに索引の語を追加する。コミットは呼び出し側で行う。要約の保存をコミットした後にindex_saved_summaryが別トランザクションで（再試行付きで）呼び出すほか、backfillからも呼び出す
+        """
+        previous = set(db.scalars(select(SummaryTerm.term).where(SummaryTerm.video_id == summary.video_id)))
+        db.execute(delete(SummaryTerm).where(SummaryTerm.video_id == summary.video_id))
+        terms = build_terms(summary)
+        if terms:
+            db.execute(insert(SummaryTerm), [
+                {"video_id": summary.video_id, "term": term, "summary_id": summary.id, "weight": weight}
+                for term, weight in terms.items()
+            ])
+        # 語ごとの出現動画数は増減した語のみ更新する（同時更新時のデッドロックを避けるため語の順に更新）
+        added = sorted(set(terms) - previous)
+        removed = sorted(previous - set(terms))
+        if added:
+            db.execute(_increment_statement(db, added))
+        if removed:
+            db.execute(
+                update(SummaryTermStat)
+                .where(SummaryTermStat.term.in_(removed))
+                .values(document_count=SummaryTermStat.document_count - 1)
+            )
+        return len(terms)
+
+    @staticmethod
+    def index_saved_summary(summary_id, video_id, attempts=SEARCH_INDEX_ATTEMPTS):
+        """
+        概要: コミット済みの要約を、要約の保存とは別のトランザクションで索引に登録する
+        用途: 索引の更新に失敗しても要約の保存は取り消さない。同じ動画の同時保存による主キーの競合やロック待ちのタイムアウトは
+              再試行し、それでも失敗した場合はログに残してFalseを返す（services.search_indexerのbackfillで修復できる）。
+              同じ動画のより新しい要約が保存済みの場合は、そちらの保存で登録されるため何もしない
+        """
+        from .db_service import is_database_unavailable
+
+        for attempt in range(1, attempts + 1):
+            db = SessionLocal()
+            try:
+                with circuit_breakers.get(CircuitBreakerRegistry.DATABASE).guard(is_database_unavailable):
+                    latest_id = db.query(func.max(VideoSummary.id)).filter(VideoSummary.video_id == video_id).scalar()
+                    if latest_id != summary_id:
+                        return True
+                    SearchService.index_summary(db, db.get(VideoSummary, summary_id))
+                    db.commit()
+                return True
+            except CircuitOpen as co:
+                logger.warning(f"データベースの障害中のため検索インデックスの更新を省略しました: video_id={video_id}, {str(co)}")
+                break
+            except SQLAlchemyError as e:
+                db.rollback()
+                logger.warning(
+                    f"検索インデックスの更新に失敗しました（{attempt}/{attempts}回目）: video_id={video_id}, "
+                    f"{type(e).__name__}: {str(e)[:200]}"
+                )
+            finally:
+                db.close()
+        logger.error(
+            f"検索インデックスを更新できませんでした（python -m services.search_indexer で修復できます）: "
+            f"video_id={video_id}, summary_id={summary_id}"
+        )
+        return False
+
+    @staticmethod
+    def rebuild_term_stats():
+        """語ごとの出現動画数を索引から数え直す（索引を一括で登録した後や、件数がずれた場合に使用）"""
+        db = SessionLocal()
+        try:
+            db.execute(delete(SummaryTermStat))
+            db.execute(insert(SummaryTermStat).from_select(
+                ["term", "document_count"],
+                select(SummaryTerm.term, func.count()).group_by(SummaryTerm.term)
+            ))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    @staticmethod
+    def _get_document_count(db) -> int:
+        """索引対象の動画数（IDFの計算用）。件数の取得は重いため一定時間キャッシュする"""
+        with SearchService._document_count_lock:
+            if time.monotonic() < SearchService._document_count_expires_at:
+                return SearchService._document_count
+        count = db.query(func.count(func.distinct(VideoSummary.video_id))).scalar() or 0
+        with SearchService._document_count_lock:
+            SearchService._document_count = count
+            SearchService._document_count_expires_at = time.monotonic() + SEARCH_DOC_COUNT_TTL_SECONDS
+        return count
+
+    @staticmethod
+    def _top_single_term(db, term: str, idf: float, limit: int, offset: int) -> Tuple[int, List[Tuple[str, float]]]:
+        """
+        1語の検索。インデックス（term, weight）の並びのまま件数と上位を取得する（IDFは全件共通のため順位は重みの順）。
+        同じ重みの要約は多数あり、video_idで並べ替えると一時的なソートが必要になるため、重みが同じ場合はインデックスの順とする
+        """
+        total = db.execute(select(func.count()).select_from(SummaryTerm).where(SummaryTerm.term == term)).scalar()
+        rows = db.execute(
+            select(SummaryTerm.video_id, SummaryTerm.weight)
+            .where(SummaryTerm.term == term)
+            .order_by(SummaryTerm.weight.desc())
+            .limit(limit)
+            .offset(offset)
+        ).all()
+        return total, [(video_id, weight * idf) for video_id, weight in rows]
+
+    @staticmethod
+    def _top_intersection(db, terms: List[str], idfs: List[float], limit: int, offset: int) -> Tuple[int, List[Tuple[str, float]]]:
+        """
+        概要: 複数語の検索。出現数が最も少ない語の索引を起点に、他の語を含むかどうかと重みを主キー（term, video_id）で照合する
+        用途: 照合はDB内で行い、一致した動画とスコアだけを受け取って件数と上位を求める。
+              処理量は起点の語の出現数に比例し、要約の総件数には比例しない
+        """
+        base = SummaryTerm.__table__.alias("base")
+        score = base.c.weight * idfs[0]
+        conditions = [base.c.term == terms[0]]
+        for i, (term, idf) in enumerate(zip(terms[1:], idfs[1:])):
+            other = SummaryTerm.__table__.alias(f"t{i}")
+            matched = (other.c.term == term) & (other.c.video_id == base.c.video_id)
+            # 結合にするとDBの実行計画によっては出現数の多い語から走査されるため、相関サブクエリで起点を固定する
+            score = score + select(other.c.weight).where(matched).scalar_subquery() * idf
+            conditions.append(select(other.c.video_id).where(matched).exists())
+        rows = db.connection().execute(select(base.c.video_id, score).where(*conditions)).all()
+        top = heapq.nsmallest(offset + limit, rows, key=lambda row: (-row[1], row[0]))
+        return len(rows), [(video_id, score) for video_id, score in top[offset:]]
+
+    @staticmethod
+    def search(query: str, limit: int = 20, offset: int = 0) -> Dict[str, Any]:
+        """
+        概要: 検索語をすべて含む要約をスコア順に返す
+        用途: スコアは語の重みとIDFの積の合計。各語の出現数はsummary_term_statsから取得し（索引の件数を数えない）、
+              出現数の少ない語から照合するため、検索時間は総件数ではなく語の出現数に依存する
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        response = {"query": query, "total": 0, "limit": limit, "offset": offset, "results": []}
+        if not terms:
+            return response
+        db = SessionLocal()
+        try:
+            frequencies = dict(
+                db.query(SummaryTermStat.term, SummaryTermStat.document_count)
+                .filter(SummaryTermStat.term.in_(terms), SummaryTermStat.document_count > 0)
+                .all()
+            )
+            if len(frequencies) < len(terms):
+                # すべての語を含む要約はない
+                return response
+            terms = sorted(terms, key=lambda term: frequencies[term])[:SEARCH_MAX_QUERY_TERMS]
+            document_count = max(SearchService._get_document_count(db), max(frequencies.values()))
+            idfs = [_idf(document_count, frequencies[term]) for term in terms]
+
+            if len(terms) == 1:
+                total, page = SearchService._top_single_term(db, terms[0], idfs[0], limit, offset)
+            else:
+                total, page = SearchService._top_intersection(db, terms, idfs, limit, offset)
+            response["total"] = total
+            if not page:
+                return response
+
+            page_ids = [video_id for video_id, _ in page]
+            summary_ids = dict(
+                db.query(SummaryTerm.video_id, SummaryTerm.summary_id)
+                .filter(SummaryTerm.video_id.in_(page_ids), SummaryTerm.term == terms[0])
+                .all()
+            )
+            summaries = {
+                summary.video_id: summary
+                for summary in db.query(VideoSummary).filter(VideoSummary.id.in_(list(summary_ids.values())))
+            }
+            for video_id, score in page:
+                summary = summaries.get(video_id)
+                if summary is None:
+                    continue
+                response["results"].append({
+                    "video_id": summary.video_id,
+                    "title": summary.video_title,
+                    "channel_title": summary.channel_title,
+                    "sub_title": summary.sub_title,
+                    "overview": summary.overview,
+                    "main_topics": summary.main_topics or [],
+                    "keywords": summary.keywords or [],
+                    "created_at": summary.created_at.isoformat() if summary.created_at else None,
+                    "score": round(float(score), 4),
+                })
+            return response
+        finally:
+            db.close()
+
+    @staticmethod
+    def backfill(batch_size: int = 500, reindex: bool = False) -> int:
+        """
+        概要: 索引に登録されていない動画の最新の要約を索引に登録する
+        用途: 検索機能の導入前に保存された要約の移行。reindex=Trueの場合は登録済みの動画も再計算する（重みの変更時など）。
+              batch_size件ごとにコミットするため、途中で中断しても再実行で続きから処理される
+        """
+        indexed = 0
+        last_id = 0
+        latest_ids = select(func.max(VideoSummary.id)).group_by(VideoSummary.video_id).scalar_subquery()
+        while True:
+            db = SessionLocal()
+            try:
+                summaries = (
+                    db.query(VideoSummary)
+                    .filter(VideoSummary.id.in_(latest_ids), VideoSummary.id > last_id)
+                    .order_by(VideoSummary.id)
+                    .limit(batch_size)
+                    .all()
+                )
+                if not summaries:
+                    return indexed
+                last_id = summaries[-1].id
+                if not reindex:
+                    current = dict(
+                        db.query(SummaryTerm.video_id, func.max(SummaryTerm.summary_id))
+                        .filter(SummaryTerm.video_id.in_([summary.video_id for summary in summaries]))
+                        .group_by(SummaryTerm.video_id)
+                        .all()
+                    )
+                    summaries = [summary for summary in summaries if current.get(summary.video_id) != summary.id]
+                for summary in summaries:
+                    SearchService.index_summary(db, summary)
+                db.commit()
+                indexed += len(summaries)
+                logger.info(f"検索インデックスを作成しました: {indexed}件（id<={last_id}）")
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
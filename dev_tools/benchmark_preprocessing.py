@@ -0,0 +1,117 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from dotenv import load_dotenv
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.transcript_preprocessor import preprocess_transcript, PreprocessConfig
+
+
+JA_SENTENCES = [
+    "今日は機械学習の基本について話します。",
+    "まずデータの前処理がとても重要です。",
+    "次にモデルの評価方法を見ていきましょう。",
+    "過学習を防ぐためには検証データを分けておく必要があります。",
+    "最後に実際のプロジェクトでの使い方を紹介します。",
+]
+EN_SENTENCES = [
+    "today we are going to talk about caching strategies.",
+    "the first thing to understand is the difference between latency and throughput.",
+    "a cache hit avoids the expensive call entirely.",
+    "you should always measure before you optimize.",
+    "let's look at a real example from production.",
+]
+JA_FILLERS = ["えーと", "あのー", "えー", "まぁ"]
+EN_FILLERS = ["um", "uh"]
+TAGS = ["[音楽]", "[拍手]", "[笑い]", "[Music]", "[Applause]"]
+
+
+def generate_auto_caption(sentences, fillers, segments=400, joiner="", seed=0):
+    '''
+    概要: 自動生成字幕を模したサンプル文字起こしを生成する
+    用途: ローリング表示による重複・非発話タグ・フィラーを含む入力で前処理の効果を測る
+    '''
+    rng = random.Random(seed)
+    words = []
+    for _ in range(segments):
+        sentence = rng.choice(sentences)
+        if rng.random() < 0.3:
+            words.append(rng.choice(fillers))
+        words.extend(sentence.split(" ") if joiner else [sentence[i:i + 6] for i in range(0, len(sentence), 6)])
+        if rng.random() < 0.05:
+            words.append(rng.choice(TAGS))
+    transcript = []
+    start = 0.0
+    # 1セグメントに前のセグメントの後半を含めて表示する（ローリング字幕）
+    for i in range(0, len(words) - 4, 2):
+        transcript.append({"text": joiner.join(words[i:i + 4]), "start": round(start, 2), "duration": 3.0})
+        start += 1.5
+    return transcript
+
+
+def generate_manual_caption(sentences, segments=400):
+    '''手動字幕を模した、重複やフィラーのないサンプル文字起こしを生成する（削減が小さいことの確認用）'''
+    return [
+        {"text": sentences[i % len(sentences)], "start": i * 3.0, "duration": 3.0}
+        for i in range(segments)
+    ]
+
+
+def measure_llm_latency(transcript):
+    '''要約プロンプトを1回実行し、応答までの時間を秒で返す（OPENAI_API_KEYが必要）'''
+    from langchain_openai import ChatOpenAI
+    from agents.summarizer import SUMMARY_MODEL, SUMMARY_INSTRUCTION, build_prompt_messages, transcript_to_text
+
+    llm = ChatOpenAI(model=SUMMARY_MODEL, temperature=0)
+    started = time.perf_counter()
+    llm.invoke(build_prompt_messages(transcript_to_text(transcript), SUMMARY_INSTRUCTION))
+    return time.perf_counter() - started
+
+
+def run_benchmark(samples, with_llm=False):
+    config = PreprocessConfig.from_env()
+    print(f"{'サンプル':<24}{'セグメント':>14}{'トークン':>16}{'削減率':>9}{'処理時間':>11}")
+    total_before = total_after = 0
+    for name, transcript in samples.items():
+        result = preprocess_transcript(transcript, config)
+        total_before += result.tokens_before
+        total_after += result.tokens_after
+        print(
+            f"{name:<24}{result.segments_before:>6} -> {result.segments_after:<6}"
+            f"{result.tokens_before:>7} -> {result.tokens_after:<7}"
+            f"{result.token_reduction_ratio:>8.1%}{result.elapsed_ms:>9.1f}ms"
+        )
+        if with_llm:
+            raw_latency = measure_llm_latency(transcript)
+            processed_latency = measure_llm_latency(result.transcript)
+            print(f"  LLM応答時間: {raw_latency:.2f}s -> {processed_latency:.2f}s")
+    if total_before:
+        print(f"\n合計トークン: {total_before} -> {total_after} (削減率 {1 - total_after / total_before:.1%})")
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="文字起こし前処理によるトークン削減量を計測します")
+    parser.add_argument("files", nargs="*", help="文字起こしのJSONファイル（/transcript/ のレスポンスまたはセグメントの配列）")
+    parser.add_argument("--with-llm", action="store_true", help="前処理前後でLLMの応答時間も計測する（API呼び出しが発生します）")
+    args = parser.parse_args()
+
+    samples = {
+        "ja_auto_caption": generate_auto_caption(JA_SENTENCES, JA_FILLERS, seed=1),
+        "en_auto_caption": generate_auto_caption(EN_SENTENCES, EN_FILLERS, joiner=" ", seed=2),
+        "ja_manual_caption": generate_manual_caption(JA_SENTENCES),
+    }
+    for path in args.files:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        samples[os.path.basename(path)] = data["transcript"] if isinstance(data, dict) else data
+
+    run_benchmark(samples, with_llm=args.with_llm)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import os
+import sys
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+JA_PREFIXES = ["機械", "深層", "強化", "統計", "量子", "分散", "画像", "音声", "自然", "言語", "金融", "医療", "教育", "物流", "農業"]
+JA_SUFFIXES = ["学習", "処理", "認識", "推論", "計算", "設計", "解析", "最適化", "予測", "制御"]
+KATAKANA_WORDS = [
+    "データ", "モデル", "クラウド", "セキュリティ", "ネットワーク", "アルゴリズム", "インフラ", "コンテナ",
+    "マーケティング", "デザイン", "プログラミング", "エージェント", "ブロックチェーン", "ロボット",
+]
+EN_WORDS = ["python", "rust", "kubernetes", "llm", "gpu", "sql", "react", "docker", "terraform", "pytorch", "golang", "kafka"]
+QUERIES = [
+    "機械学習",            # 頻出する複合語
+    "データ",              # 頻出するカタカナ語（1語）
+    "量子計算 python",     # 複合語と英単語の組み合わせ
+    "農業制御",            # 出現数の少ない複合語
+    "kubernetes docker",   # 英単語2語
+    "ブロックチェーン 金融予測",
+]
+
+
+def build_vocabulary():
+    words = [prefix + suffix for prefix in JA_PREFIXES for suffix in JA_SUFFIXES] + KATAKANA_WORDS + EN_WORDS
+    random.Random(0).shuffle(words)
+    # Zipf分布に近い出現頻度（先頭の語ほど多くの要約に出現する）
+    weights = [1 / (rank + 1) for rank in range(len(words))]
+    return words, weights
+
+
+def seed(count, batch_size=2000, seed_value=42):
+    '''
+    概要: 固定シードで合成した要約と検索インデックスを登録する
+    用途: save_summary_to_dbと同じ重み計算（build_terms）で索引を作成し、1件ずつの保存より高速に大量の要約を用意する
+    '''
+    from sqlalchemy import insert
+    from database.db_models import SessionLocal, VideoSummary, SummaryTerm
+    from database.search_service import SearchService, build_terms
+
+    rng = random.Random(seed_value)
+    words, weights = build_vocabulary()
+    base = datetime(2024, 1, 1)
+    started = time.perf_counter()
+    for offset in range(0, count, batch_size):
+        summaries, terms = [], []
+        for i in range(offset, min(offset + batch_size, count)):
+            topics = list(dict.fromkeys(rng.choices(words, weights, k=4)))
+            keywords = list(dict.fromkeys(rng.choices(words, weights, k=6)))
+            summary = VideoSummary(
+                id=i + 1,
+                video_id=f"bench{i:08d}",
+                video_title=f"{topics[0]}と{topics[-1]}の解説",
+                sub_title=f"{keywords[0]}入門",
+                overview="この動画では" + "、".join(topics) + "について説明し、" + "や".join(keywords[:3]) + "の実例を紹介します。",
+                main_topics=topics,
+                keywords=keywords,
+                action_items=[],
+                key_points=[],
+                created_at=base + timedelta(seconds=i),
+            )
+            summaries.append({column.name: getattr(summary, column.name) for column in VideoSummary.__table__.columns})
+            terms.extend(
+                {"video_id": summary.video_id, "term": term, "summary_id": summary.id, "weight": weight}
+                for term, weight in build_terms(summary).items()
+            )
+        db = SessionLocal()
+        try:
+            db.execute(insert(VideoSummary), summaries)
+            db.execute(insert(SummaryTerm), terms)
+            db.commit()
+        finally:
+            db.close()
+        print(f"\r登録中: {min(offset + batch_size, count)}/{count}", end="", flush=True)
+    SearchService.rebuild_term_stats()
+    print(f"\n登録完了: {count}件 ({time.perf_counter() - started:.1f}s)")
+
+
+def run_benchmark(repeat, limit):
+    from database.search_service import SearchService
+
+    print(f"{'検索語':<28}{'件数':>9}{'p50':>10}{'p95':>10}{'max':>10}{'2ページ目':>12}")
+    for query in QUERIES:
+        SearchService.search(query, limit=limit)  # 件数キャッシュの作成とDBページのウォームアップ
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = SearchService.search(query, limit=limit)
+            timings.append((time.perf_counter() - started) * 1000)
+        started = time.perf_counter()
+        SearchService.search(query, limit=limit, offset=limit)
+        next_page = (time.perf_counter() - started) * 1000
+        timings.sort()
+        p50 = timings[len(timings) // 2]
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        print(f"{query:<28}{result['total']:>9}{p50:>8.1f}ms{p95:>8.1f}ms{timings[-1]:>8.1f}ms{next_page:>10.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="要約検索（/search）の応答時間を合成データで計測します")
+    parser.add_argument("--summaries", type=int, default=300000, help="登録する要約の件数")
+    parser.add_argument("--db-path", default="/tmp/benchmark_search.sqlite3", help="計測用のSQLiteファイル（本番DBには接続しません）")
+    parser.add_argument("--reseed", action="store_true", help="既存の計測用DBを削除して登録し直す")
+    parser.add_argument("--repeat", type=int, default=50, help="検索語ごとの計測回数")
+    parser.add_argument("--limit", type=int, default=20, help="1ページの件数")
+    args = parser.parse_args()
+
+    if args.reseed and os.path.exists(args.db_path):
+        os.remove(args.db_path)
+    # データベース接続はインポート時に確定するため、モジュールを読み込む前に計測用DBを指定する
+    os.environ["DATABASE_URL"] = f"sqlite:///{args.db_path}"
+    from database.db_models import SessionLocal, VideoSummary, create_tables
+
+    create_tables()
+    db = SessionLocal()
+    try:
+        existing = db.query(VideoSummary).count()
+    finally:
+        db.close()
+    if existing == 0:
+        seed(args.summaries)
+    else:
+        print(f"既存の計測用DBを使用します: {existing}件（登録し直す場合は--reseed）")
+    run_benchmark(args.repeat, args.limit)
+
+
+if __name__ == "__main__":
+    main()
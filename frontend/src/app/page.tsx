@@ -12,6 +12,25 @@ interface ChatMessage {
   content: string;
 }
 
+interface SearchResult {
+  video_id: string;
+  title: string | null;
+  channel_title: string | null;
+  sub_title: string | null;
+  keywords: string[];
+  score: number;
+}
+
+interface RelatedVideo {
+  video_id: string;
+  title: string | null;
+  channel_title: string | null;
+  sub_title: string | null;
+  score: number;
+}
+
+const SEARCH_PAGE_SIZE = 10;
+
 export default function Home() {
   const backendUrl = process.env.NEXT_PUBLIC_BACKEND_URL || 'https://youtube-content-processor2-backend-667890125929.asia-northeast1.run.app';
   const [videoUrl, setVideoUrl] = useState('');
@@ -33,9 +52,20 @@ export default function Home() {
   const [summaryChatMessages, setSummaryChatMessages] = useState<ChatMessage[]>([]);
   const [isChatLoading, setIsChatLoading] = useState(false);
 
+  const [searchQuery, setSearchQuery] = useState('');
+  const [searchResults, setSearchResults] = useState<SearchResult[]>([]);
+  const [searchTotal, setSearchTotal] = useState(0);
+  const [searchOffset, setSearchOffset] = useState(0);
+  const [hasSearched, setHasSearched] = useState(false);
+  const [isSearching, setIsSearching] = useState(false);
+  const [relatedVideos, setRelatedVideos] = useState<RelatedVideo[]>([]);
+  // /transcript/が返すハンドル（有効期間内は要約・チャットでサーバー側の文字起こしを再利用する）
+  const [transcriptHandle, setTranscriptHandle] = useState('');
+
   const handleSubmit = async (e: React.FormEvent<HTMLFormElement>) => {
     e.preventDefault();
     setTranscript([]);
+    setTranscriptHandle('');
     setSummary(''); // 要約をリセット
     setError('');
     setVideoTitle('');
@@ -63,6 +93,7 @@ export default function Home() {
 
       const data = await response.json();
       setTranscript(data.transcript);
+      setTranscriptHandle(data.transcript_handle || '');
       setVideoTitle(data.title);
       setVideoDescription(data.description);
       setChannelTitle(data.channelTitle);
@@ -74,21 +105,63 @@ export default function Home() {
     }
   };
 
+  // 要約ジョブが完了するまでポーリングし、要約結果を返す
+  const waitForSummaryJob = async (jobId: string) => {
+    while (true) {
+      await new Promise(resolve => setTimeout(resolve, 2000));
+      const response = await fetch(`${backendUrl}/jobs/${jobId}`);
+      if (!response.ok) {
+        const errorData = await response.json();
+        throw new Error(errorData.detail || '要約ジョブの状態取得に失敗しました');
+      }
+      const job = await response.json();
+      if (job.status === 'succeeded') {
+        return job.result;
+      }
+      if (job.status === 'failed') {
+        throw new Error(job.error || '要約の生成に失敗しました');
+      }
+    }
+  };
+
+  // 関連動画の取得処理（インデックスの準備中などで取得できない場合は表示しない）
+  const fetchRelatedVideos = async (videoId: string) => {
+    try {
+      const response = await fetch(`${backendUrl}/summaries/${encodeURIComponent(videoId)}/related`);
+      if (!response.ok) return;
+      const data = await response.json();
+      setRelatedVideos(data.results);
+    } catch {
+      // 関連動画は補助的な表示のため、エラーは表示しない
+    }
+  };
+
   const handleSummarize = async () => {
     setError('');
     setIsSummarizing(true);
+    setRelatedVideos([]);
 
     try {
       const videoId = videoUrl.includes('youtube.com/watch?v=')
         ? videoUrl.split('v=')[1].split('&')[0]
         : videoUrl;
 
+      // 保存済みの要約があればキャッシュ可能なGETで取得する（CDN・ブラウザのキャッシュが効く）
+      const cachedResponse = await fetch(`${backendUrl}/summaries/${encodeURIComponent(videoId)}`);
+      if (cachedResponse.ok) {
+        const summaryDocument = await cachedResponse.json();
+        setSummary(JSON.stringify(summaryDocument.summary));
+        setIsTranscriptExpanded(false);
+        fetchRelatedVideos(videoId);
+        return;
+      }
+
         const response = await fetch(`${backendUrl}/summarize/`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
         },
-        body: JSON.stringify({ video_id: videoId }),
+        body: JSON.stringify({ video_id: videoId, transcript_handle: transcriptHandle || undefined }),
       });
 
       if (!response.ok) {
@@ -96,9 +169,14 @@ export default function Home() {
         throw new Error(errorData.detail || '要約の生成に失敗しました');
       }
 
-      const data = await response.json();
+      let data = await response.json();
+      // 待機時間内に要約が完了しなかった場合はジョブの完了をポーリングする
+      if (response.status === 202) {
+        data = await waitForSummaryJob(data.job_id);
+      }
       setSummary(data.summary);
       setIsTranscriptExpanded(false); // 要約完了時に文字起こしを折りたたむ
+      fetchRelatedVideos(videoId);
     } catch (err) {
       setError(err instanceof Error ? err.message : '予期せぬエラーが発生しました');
     } finally {
@@ -106,6 +184,35 @@ export default function Home() {
     }
   };
 
+  // 保存済み要約の検索処理
+  const handleSearch = async (offset: number) => {
+    if (!searchQuery.trim()) return;
+    setError('');
+    setIsSearching(true);
+
+    try {
+      const params = new URLSearchParams({
+        q: searchQuery,
+        limit: String(SEARCH_PAGE_SIZE),
+        offset: String(offset),
+      });
+      const response = await fetch(`${backendUrl}/search?${params.toString()}`);
+      if (!response.ok) {
+        const errorData = await response.json();
+        throw new Error(errorData.detail || '要約の検索に失敗しました');
+      }
+      const data = await response.json();
+      setSearchResults(data.results);
+      setSearchTotal(data.total);
+      setSearchOffset(offset);
+      setHasSearched(true);
+    } catch (err) {
+      setError(err instanceof Error ? err.message : '予期せぬエラーが発生しました');
+    } finally {
+      setIsSearching(false);
+    }
+  };
+
   // チャットメッセージ送信処理
   const handleSendMessage = async () => {
     if (!chatMessage.trim() || isChatLoading) return;
@@ -120,9 +227,14 @@ export default function Home() {
     setIsChatLoading(true);
 
     try {
-      const contentText = chatType === 'transcript' 
-        ? transcript.map(item => item.text).join(' ')
+      // 文字起こしについての質問では、ハンドルがあれば全文を送らずサーバー側の文字起こしを使う
+      // （要約時と同じ文字起こしを使えるようにビデオIDも送る。ハンドルの期限切れ時はサーバー側で再取得される）
+      const contentText = chatType === 'transcript'
+        ? (transcriptHandle ? '' : transcript.map(item => item.text).join(' '))
         : summary;
+      const videoId = videoUrl.includes('youtube.com/watch?v=')
+        ? videoUrl.split('v=')[1].split('&')[0]
+        : videoUrl;
 
         const response = await fetch(`${backendUrl}/chat/`, {
         method: 'POST',
@@ -133,6 +245,8 @@ export default function Home() {
           content: chatMessage,
           type: chatType,
           contentText: contentText,
+          video_id: videoId,
+          transcript_handle: chatType === 'transcript' && transcriptHandle ? transcriptHandle : undefined,
         }),
       });
 
@@ -219,6 +333,82 @@ export default function Home() {
             </form>
           </div>
 
+          <div className="bg-white shadow rounded-lg p-6 mb-8">
+            <form
+              onSubmit={(e) => {
+                e.preventDefault();
+                handleSearch(0);
+              }}
+            >
+              <label htmlFor="searchQuery" className="block text-sm font-medium text-gray-700 mb-1">
+                保存済みの要約を検索
+              </label>
+              <div className="flex">
+                <input
+                  type="text"
+                  id="searchQuery"
+                  className="flex-1 rounded-l-md border-gray-300 shadow-sm focus:border-blue-500 focus:ring-blue-500 p-2 border text-black"
+                  placeholder="キーワード・トピック（例: 機械学習 python）"
+                  value={searchQuery}
+                  onChange={(e) => setSearchQuery(e.target.value)}
+                />
+                <button
+                  type="submit"
+                  disabled={isSearching || !searchQuery.trim()}
+                  className="bg-gray-700 hover:bg-gray-800 text-white font-bold py-2 px-4 rounded-r-md disabled:opacity-50"
+                >
+                  {isSearching ? '検索中...' : '検索'}
+                </button>
+              </div>
+            </form>
+
+            {hasSearched && (
+              <div className="mt-4">
+                <p className="text-xs text-gray-500 mb-2">{searchTotal}件</p>
+                <ul className="divide-y divide-gray-200">
+                  {searchResults.map((result) => (
+                    <li key={result.video_id} className="py-2">
+                      <button
+                        type="button"
+                        className="text-left w-full hover:bg-gray-50 p-1 rounded"
+                        onClick={() => setVideoUrl(result.video_id)}
+                      >
+                        <p className="text-sm font-medium text-gray-900">{result.title || result.video_id}</p>
+                        <p className="text-xs text-gray-600">
+                          {result.channel_title}
+                          {result.sub_title && ` ・ ${result.sub_title}`}
+                        </p>
+                        {result.keywords.length > 0 && (
+                          <p className="text-xs text-gray-500">{result.keywords.join('、')}</p>
+                        )}
+                      </button>
+                    </li>
+                  ))}
+                </ul>
+                {searchTotal > SEARCH_PAGE_SIZE && (
+                  <div className="flex justify-between mt-2">
+                    <button
+                      type="button"
+                      disabled={isSearching || searchOffset === 0}
+                      onClick={() => handleSearch(Math.max(0, searchOffset - SEARCH_PAGE_SIZE))}
+                      className="text-sm text-blue-600 disabled:opacity-50"
+                    >
+                      前へ
+                    </button>
+                    <button
+                      type="button"
+                      disabled={isSearching || searchOffset + SEARCH_PAGE_SIZE >= searchTotal}
+                      onClick={() => handleSearch(searchOffset + SEARCH_PAGE_SIZE)}
+                      className="text-sm text-blue-600 disabled:opacity-50"
+                    >
+                      次へ
+                    </button>
+                  </div>
+                )}
+              </div>
+            )}
+          </div>
+
           {error && (
             <div className="bg-red-50 border-l-4 border-red-500 p-4 mb-8 rounded shadow">
               <div className="flex">
@@ -346,6 +536,29 @@ export default function Home() {
                     </div>
                   </div>
 
+                  {relatedVideos.length > 0 && (
+                    <div className="bg-white shadow overflow-hidden sm:rounded-lg p-4">
+                      <h2 className="text-lg font-medium text-gray-900 mb-2">関連動画</h2>
+                      <ul className="divide-y divide-gray-200">
+                        {relatedVideos.map((video) => (
+                          <li key={video.video_id} className="py-2">
+                            <button
+                              type="button"
+                              className="text-left w-full hover:bg-gray-50 p-1 rounded"
+                              onClick={() => setVideoUrl(video.video_id)}
+                            >
+                              <p className="text-sm font-medium text-gray-900">{video.title || video.video_id}</p>
+                              <p className="text-xs text-gray-600">
+                                {video.channel_title}
+                                {video.sub_title && ` ・ ${video.sub_title}`}
+                              </p>
+                            </button>
+                          </li>
+                        ))}
+                      </ul>
+                    </div>
+                  )}
+
                   {/* JSON生データ表示セクション */}
                   <div className="bg-white shadow overflow-hidden sm:rounded-lg p-4">
                     <div className="flex justify-between items-start mb-4">
@@ -3,17 +3,23 @@ import traceback
 import uvicorn
 import json
 import uuid
+import orjson
 import requests
+from contextlib import asynccontextmanager
 from datetime import datetime
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 from youtube_transcript_api import YouTubeTranscriptApi
-from youtube_transcript_api._errors import NoTranscriptAvailable, TranscriptsDisabled
-from agents.summarizer import create_initial_summarizer, SummaryState
-from langchain_openai import ChatOpenAI
-from langchain.prompts import ChatPromptTemplate
+from youtube_transcript_api._errors import NoTranscriptAvailable, TranscriptsDisabled, CouldNotRetrieveTranscript, YouTubeRequestFailed
+from agents.summarizer import (
+    create_initial_summarizer, SummaryState, get_summary_version, compute_transcript_hash,
+    build_prompt_messages, transcript_to_text, CHAT_INSTRUCTION, SUMMARY_MODEL, SHARED_TOOLS, CHAT_TOOL_CHOICE
+)
+from agents.transcript_preprocessor import preprocess_transcript
+from agents.summary_schema import SummaryParseError, VideoSummaryOutput, summary_repair_stats
 import os
 from dotenv import load_dotenv
 from googleapiclient.discovery import build
@@ -21,7 +27,27 @@ from googleapiclient.errors import HttpError
 from google.cloud import storage
 from google.api_core import exceptions as google_exceptions
 from database.db_models import create_tables
-from database.db_service import DatabaseService
+from database.db_service import DatabaseService, summary_to_document
+from database.job_service import JobQueueService, JOB_STATUS_SUCCEEDED, JOB_STATUS_FAILED
+from services.rate_limiter import scheduler, OutboundScheduler, UpstreamThrottled
+from services.circuit_breaker import circuit_breakers, CircuitBreakerRegistry, CircuitOpen
+from services.admission_control import admission_controller, Overloaded
+from services.job_worker import SummaryWorkerPool, PermanentJobError
+from services.channel_ingester import IngestionScheduler, configured_sources, is_youtube_api_outage
+from services.resummarizer import ResummarizeScheduler, RESUMMARIZE_ENABLED
+from database.ingestion_service import IngestionService
+from database.search_service import SearchService
+from services.llm_usage import llm_usage
+from services.llm_client import get_llm_client, llm_clients_snapshot, LLMTimeout
+from services.related_index import related_index, RelatedIndexNotReady, RELATED_INDEX_ENABLED
+from services.summary_exporter import (
+    SummaryExport, EXPORT_FORMAT_NDJSON, EXPORT_API_TOKEN, parse_watermark, format_watermark, is_authorized_export,
+    export_stream_slots
+)
+from services.cache import (
+    cache, TRANSCRIPT_CACHE_TTL_SECONDS, VIDEO_INFO_CACHE_TTL_SECONDS, SUMMARY_CACHE_TTL_SECONDS, TRANSCRIPT_HANDLE_TTL_SECONDS
+)
+from sqlalchemy.exc import SQLAlchemyError
 import logging
 from logging.handlers import RotatingFileHandler
 
@@ -40,6 +66,20 @@ YOUTUBE_URL_PREFIX = "https://www.youtube.com/watch?v="
 GCS_BUCKET_NAME = os.getenv('GCS_BUCKET_NAME')
 GCS_SUMMARY_PREFIX = "summaries/"  # GCSのフォルダプレフィックス
 
+# 要約ジョブ設定
+DEFAULT_SUMMARY_STRATEGY = "default"
+SUMMARY_STRATEGIES = {DEFAULT_SUMMARY_STRATEGY}
+SUMMARY_INTERACTIVE_PRIORITY = 10  # /summarize/経由のジョブはバックグラウンドジョブより優先
+SUMMARY_WAIT_TIMEOUT_SECONDS = float(os.getenv("SUMMARY_WAIT_TIMEOUT_SECONDS", "60"))
+
+# GET /summaries/{video_id} のHTTPキャッシュ設定（ブラウザはmax-age、Cloud CDNはs-maxageの間キャッシュする）
+SUMMARY_HTTP_MAX_AGE_SECONDS = int(os.getenv("SUMMARY_HTTP_MAX_AGE_SECONDS", "300"))
+SUMMARY_CDN_MAX_AGE_SECONDS = int(os.getenv("SUMMARY_CDN_MAX_AGE_SECONDS", "3600"))
+SUMMARY_CACHE_CONTROL = (
+    f"public, max-age={SUMMARY_HTTP_MAX_AGE_SECONDS}, s-maxage={SUMMARY_CDN_MAX_AGE_SECONDS}, "
+    f"stale-while-revalidate={SUMMARY_HTTP_MAX_AGE_SECONDS}"
+)
+
 # ロギング設定
 def setup_logger():
     log_level = os.getenv('LOG_LEVEL', 'INFO')
@@ -95,12 +135,21 @@ def get_exception_trace(e=None):
     return trace_info
 
 
+def is_transcript_outage(exc):
+    '''文字起こし取得の例外がYouTube側の障害によるものか判定する（文字起こしがない動画やレート制限は障害として扱わない）'''
+    if isinstance(exc, UpstreamThrottled):
+        return False
+    return isinstance(exc, YouTubeRequestFailed) or not isinstance(exc, CouldNotRetrieveTranscript)
+
+
 class TranscriptRequest(BaseModel):
     '''
     概要: 文字起こしリクエストのデータモデル \n
-    用途: APIリクエストのボディを定義する
+    用途: APIリクエストのボディを定義する。transcript_handleは/transcript/が返したハンドルで、
+          有効期間内であれば取得済みの文字起こし・ビデオ情報を使いYouTubeへの再取得を省略する
     '''
     video_id: str
+    transcript_handle: Optional[str] = None
 
 
 class TranscriptResponse(BaseModel):
@@ -114,6 +163,8 @@ class TranscriptResponse(BaseModel):
     description: str = ""
     channelTitle: str = ""
     channelId: str = ""
+    transcript_handle: Optional[str] = None
+    transcript_handle_expires_in: int = TRANSCRIPT_HANDLE_TTL_SECONDS
 
 
 class SummaryResponse(BaseModel):
@@ -122,6 +173,101 @@ class SummaryResponse(BaseModel):
     gcs_path: Optional[str] = None
 
 
+class SummaryDocument(BaseModel):
+    '''
+    概要: 要約ドキュメントのデータモデル \n
+    用途: GET /summaries/{video_id} のレスポンスを定義する（要約はJSON文字列ではなくオブジェクトとして返す）
+    '''
+    video_id: str
+    title: Optional[str] = None
+    description: Optional[str] = None
+    channel_title: Optional[str] = None
+    channel_id: Optional[str] = None
+    summary: VideoSummaryOutput
+    model_name: Optional[str] = None
+    prompt_hash: Optional[str] = None
+    created_at: Optional[str] = None
+
+
+class SearchResult(BaseModel):
+    '''
+    概要: 要約の検索結果1件のデータモデル \n
+    用途: GET /search のレスポンスの各要素を定義する
+    '''
+    video_id: str
+    title: Optional[str] = None
+    channel_title: Optional[str] = None
+    sub_title: Optional[str] = None
+    overview: Optional[str] = None
+    main_topics: List[str] = []
+    keywords: List[str] = []
+    created_at: Optional[str] = None
+    score: float
+
+
+class SearchResponse(BaseModel):
+    '''
+    概要: 要約の検索レスポンスのデータモデル \n
+    用途: GET /search のレスポンスを定義する（totalは条件に一致した全件数）
+    '''
+    query: str
+    total: int
+    limit: int
+    offset: int
+    results: List[SearchResult]
+
+
+class RelatedVideo(BaseModel):
+    '''
+    概要: 関連動画1件のデータモデル \n
+    用途: GET /summaries/{video_id}/related のレスポンスの各要素を定義する（scoreは要約のTF-IDFベクトルのコサイン類似度）
+    '''
+    video_id: str
+    title: Optional[str] = None
+    channel_title: Optional[str] = None
+    sub_title: Optional[str] = None
+    score: float
+
+
+class RelatedVideosResponse(BaseModel):
+    '''
+    概要: 関連動画レスポンスのデータモデル \n
+    用途: GET /summaries/{video_id}/related のレスポンスを定義する
+    '''
+    video_id: str
+    results: List[RelatedVideo]
+
+
+class SummarizeJobRequest(BaseModel):
+    '''
+    概要: 要約ジョブ登録リクエストのデータモデル \n
+    用途: POST /jobs/summarize のリクエストボディを定義する
+    '''
+    video_id: str
+    strategy: str = DEFAULT_SUMMARY_STRATEGY
+    priority: int = 0
+
+
+class JobResponse(BaseModel):
+    '''
+    概要: ジョブ状態レスポンスのデータモデル \n
+    用途: ジョブの状態と、完了時は要約結果を返す
+    '''
+    job_id: str
+    video_id: str
+    strategy: str
+    priority: int
+    status: str
+    attempts: int
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    error_code: Optional[int] = None
+    created_at: Optional[str] = None
+    updated_at: Optional[str] = None
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+
+
 class GoogleCloudStorageService:
     '''
     概要: Google Cloud Storageとの連携を行うサービス \n
@@ -139,7 +285,7 @@ class GoogleCloudStorageService:
             return None
 
     @staticmethod
-    def save_summary_to_gcs(video_id: str, summary_data: dict, video_info: dict) -> Optional[str]:
+    def save_summary_to_gcs(video_id: str, summary_data: dict, video_info: dict, version: Optional[dict] = None) -> Optional[str]:
         '''
         概要: 要約データをGCSに保存する \n
         用途: 生成された要約データとビデオ情報をJSONとしてGCSに保存
@@ -168,6 +314,7 @@ class GoogleCloudStorageService:
                 "channel_title": video_info.get("channelTitle", ""),
                 "channel_id": video_info.get("channelId", ""),
                 "summary_data": summary_data,
+                "summary_version": version or {},
                 "timestamp": datetime.now().isoformat(),
             }
             
@@ -175,9 +322,12 @@ class GoogleCloudStorageService:
             json_data = json.dumps(storage_data, ensure_ascii=False, indent=2)
             
             try:
-                # GCSにアップロード
-                blob = bucket.blob(filename)
-                blob.upload_from_string(json_data, content_type="application/json")
+                # GCSにアップロード（GCSの障害中はタイムアウトを待たずに保存を省略する）
+                with circuit_breakers.get(CircuitBreakerRegistry.GCS).guard(
+                    lambda e: not isinstance(e, google_exceptions.Forbidden)
+                ):
+                    blob = bucket.blob(filename)
+                    blob.upload_from_string(json_data, content_type="application/json")
                 
                 # 公開URLを返す（バケットが公開設定の場合）
                 gcs_path = f"gs://{GCS_BUCKET_NAME}/{filename}"
@@ -189,6 +339,9 @@ class GoogleCloudStorageService:
                 print(f"{error_message}\nエラー詳細: {str(e)}")
                 return None
                 
+        except CircuitOpen as co:
+            logger.warning(f"GCSへの保存を省略しました: video_id={video_id}, {str(co)}")
+            return None
         except Exception as e:
             error_trace = traceback.format_exc()
             print(f"GCSへの保存中にエラーが発生しました: {str(e)}\n{error_trace}")
@@ -216,6 +369,40 @@ class YouTubeTranscriptService:
         # すでにビデオIDの場合
         return url_or_id
 
+    @staticmethod
+    def create_transcript_handle(video_id: str, transcript: List[Dict[str, Any]], video_info: Dict[str, str]) -> str:
+        '''
+        概要: 取得済みの文字起こしとビデオ情報を短期間キャッシュし、参照用のハンドル（内容ハッシュ）を返す \n
+        用途: /summarize/・/chat/にハンドルを渡してもらい、YouTubeへの再取得と文字起こし全文の再送信を省略する
+        '''
+        handle = compute_transcript_hash(transcript)[:32]
+        cache.set(
+            "transcript_handle", handle,
+            {"video_id": video_id, "transcript": transcript, "video_info": video_info},
+            ttl=TRANSCRIPT_HANDLE_TTL_SECONDS
+        )
+        return handle
+
+    @staticmethod
+    def resolve_transcript_handle(handle: Optional[str], video_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        '''
+        概要: ハンドルから文字起こしとビデオ情報を取得する \n
+        用途: 期限切れや別の動画のハンドルの場合はNoneを返す（呼び出し側は通常どおりYouTubeから取得する）。
+              取得できた場合は動画IDごとのキャッシュにも格納し、get_transcript・get_video_info（ジョブワーカーを含む）が再取得しないようにする
+        '''
+        if not handle:
+            return None
+        entry = cache.get("transcript_handle", handle)
+        if entry is None or (video_id and entry["video_id"] != video_id):
+            logger.info(f"文字起こしハンドルが無効または期限切れのため再取得します: video_id={video_id}")
+            return None
+        if cache.get("transcript", entry["video_id"]) != entry["transcript"]:
+            cache.set("transcript", entry["video_id"], entry["transcript"], ttl=TRANSCRIPT_CACHE_TTL_SECONDS)
+        # 取得に失敗した空のビデオ情報はget_video_infoと同様にキャッシュしない
+        if entry["video_info"].get("title") and cache.get("video_info", entry["video_id"]) is None:
+            cache.set("video_info", entry["video_id"], entry["video_info"], ttl=VIDEO_INFO_CACHE_TTL_SECONDS)
+        return entry
+
     @staticmethod
     def test_youtube_transcript_api_connectivity():
         try:
@@ -225,7 +412,12 @@ class YouTubeTranscriptService:
             logger.info("YouTubeTranscriptApiの接続テストを実行中...")
             
             # 実際のAPIメソッドを使用してテスト
-            transcript_list = YouTubeTranscriptApi.list_transcripts(test_video_id)
+            transcript_list = circuit_breakers.get(CircuitBreakerRegistry.YOUTUBE_TRANSCRIPT).call(
+                lambda: scheduler.get(OutboundScheduler.YOUTUBE_TRANSCRIPT).call(
+                    lambda: YouTubeTranscriptApi.list_transcripts(test_video_id)
+                ),
+                is_failure=is_transcript_outage
+            )
             
             logger.info("YouTubeサーバーとの通信に成功しました！")
             return True
@@ -244,6 +436,16 @@ class YouTubeTranscriptService:
         用途: 指定されたビデオIDの文字起こしをリストとして返す
         '''
         try:
+            # 共有キャッシュにあればYouTubeへの問い合わせを省略する
+            cached_transcript = cache.get("transcript", YouTubeTranscriptService.extract_video_id(video_id))
+            if cached_transcript is not None:
+                logger.info(f"キャッシュされた文字起こしを返却: video_id={video_id}")
+                return cached_transcript
+            
+            # YouTubeの障害中は接続テストを含む複数回の呼び出しを行わずに即座に失敗させる
+            transcript_breaker = circuit_breakers.get(CircuitBreakerRegistry.YOUTUBE_TRANSCRIPT)
+            transcript_breaker.check()
+            
             # 環境情報のログ出力
             import platform
             import sys
@@ -278,7 +480,12 @@ class YouTubeTranscriptService:
                 
                 # 利用可能な言語リストを確認
                 try:
-                    transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
+                    transcript_list = transcript_breaker.call(
+                        lambda: scheduler.get(OutboundScheduler.YOUTUBE_TRANSCRIPT).call(
+                            lambda: YouTubeTranscriptApi.list_transcripts(video_id)
+                        ),
+                        is_failure=is_transcript_outage
+                    )
                     available_languages = [t.language_code for t in transcript_list]
                     logger.info(f"利用可能な言語: {available_languages}")
                 except Exception as lang_err:
@@ -288,10 +495,16 @@ class YouTubeTranscriptService:
             
             # 実際の文字起こし取得処理
             logger.info(f"文字起こし取得試行: video_id={video_id}, 言語=['ja', 'en']")
-            transcript = YouTubeTranscriptApi.get_transcript(video_id, languages=['ja', 'en'])
+            transcript = transcript_breaker.call(
+                lambda: scheduler.get(OutboundScheduler.YOUTUBE_TRANSCRIPT).call(
+                    lambda: YouTubeTranscriptApi.get_transcript(video_id, languages=['ja', 'en'])
+                ),
+                is_failure=is_transcript_outage
+            )
             
             # 成功時の情報
             logger.info(f"文字起こし取得成功: video_id={video_id}, エントリ数={len(transcript)}")
+            cache.set("transcript", video_id, transcript, ttl=TRANSCRIPT_CACHE_TTL_SECONDS)
             return transcript
             
         except NoTranscriptAvailable as e:
@@ -316,6 +529,19 @@ class YouTubeTranscriptService:
             )
             raise HTTPException(status_code=404, detail="この動画では文字起こしが無効になっています")
             
+        except CircuitOpen as co:
+            logger.warning(f"文字起こしの取得を省略しました: video_id={video_id}, {str(co)}")
+            raise HTTPException(status_code=503, detail=str(co), headers={"Retry-After": str(int(co.retry_after))})
+            
+        except UpstreamThrottled as ut:
+            log_structured_error(
+                "transcript_rate_limited",
+                str(ut),
+                video_id=video_id,
+                retry_after=ut.retry_after
+            )
+            raise HTTPException(status_code=503, detail=str(ut), headers={"Retry-After": str(int(ut.retry_after))})
+            
         except Exception as e:
             error_trace = traceback.format_exc()
             log_structured_error(
@@ -338,6 +564,10 @@ class YouTubeTranscriptService:
             logger.info(f"ビデオ情報取得開始: video_id={video_id}")
             video_id = YouTubeTranscriptService.extract_video_id(video_id)
             
+            cached_info = cache.get("video_info", video_id)
+            if cached_info is not None:
+                return cached_info
+            
             api_key = os.getenv('YouTube_API_KEY')
             if not api_key:
                 logger.warning("YouTube APIキーが設定されていません")
@@ -353,7 +583,11 @@ class YouTubeTranscriptService:
             )
             
             logger.info(f"YouTube API実行: {request.uri}")
-            response = request.execute()
+            # videos.listは1クォータユニットを消費する
+            response = circuit_breakers.get(CircuitBreakerRegistry.YOUTUBE_DATA_API).call(
+                lambda: scheduler.get(OutboundScheduler.YOUTUBE_DATA_API).call(request.execute, costs={"quota_units": 1}),
+                is_failure=is_youtube_api_outage
+            )
             logger.debug(f"YouTube APIレスポンス: status=success, items_count={len(response.get('items', []))}")
 
             if not response.get('items'):
@@ -362,12 +596,15 @@ class YouTubeTranscriptService:
 
             snippet = response['items'][0]['snippet']
             logger.info(f"ビデオ情報取得成功: title='{snippet['title'][:30]}...', channel='{snippet['channelTitle']}'")
-            return {
+            video_info = {
                 "title": snippet['title'],
                 "description": snippet['description'],
                 "channelTitle": snippet['channelTitle'],
                 "channelId": snippet['channelId']
             }
+            # 取得に失敗した場合の空の情報はキャッシュしない
+            cache.set("video_info", video_id, video_info, ttl=VIDEO_INFO_CACHE_TTL_SECONDS)
+            return video_info
             
         except HttpError as e:
             error_trace = traceback.format_exc()
@@ -399,6 +636,11 @@ class YouTubeTranscriptService:
             logger.error(error_message)
             return {"title": "", "description": "", "channelTitle": "", "channelId": ""}
             
+        except UpstreamThrottled as ut:
+            # 待機上限まで待っても枠が空かない場合や障害で遮断中の場合はメタデータなしで継続する
+            logger.warning(f"YouTube Data APIのレート制限・障害によりビデオ情報を省略します: {str(ut)}")
+            return {"title": "", "description": "", "channelTitle": "", "channelId": ""}
+            
         except Exception as e:
             error_trace = traceback.format_exc()
             log_structured_error(
@@ -414,11 +656,247 @@ class YouTubeTranscriptService:
             return {"title": "", "description": "", "channelTitle": "", "channelId": ""}
 
 
+class SummaryPipelineService:
+    '''
+    概要: 要約パイプライン（文字起こし取得・要約生成・保存）を実行するサービス \n
+    用途: ジョブワーカーおよびワーカー無効時の/summarize/から呼び出される
+    '''
+
+    @staticmethod
+    def _to_summary_dict(video_id: str, db_summary) -> Dict[str, Any]:
+        return {
+            "video_id": video_id,
+            "summary": json.dumps(db_summary.summary_data),
+            "gcs_path": db_summary.gcs_path,
+            **db_summary.version
+        }
+
+    @staticmethod
+    def get_cached_summary(video_id: str) -> Optional[Dict[str, Any]]:
+        '''
+        概要: 保存済みの最新の要約を取得する（バージョンは問わない） \n
+        用途: 共有キャッシュを優先し、なければDBから取得してキャッシュに格納する
+        '''
+        cached_summary = cache.get("summary", video_id)
+        if cached_summary is not None:
+            return cached_summary
+        existing_summary = DatabaseService.get_summary_by_video_id(video_id)
+        if not existing_summary:
+            return None
+        summary = SummaryPipelineService._to_summary_dict(video_id, existing_summary)
+        cache.set("summary", video_id, summary, ttl=SUMMARY_CACHE_TTL_SECONDS)
+        return summary
+
+    @staticmethod
+    def get_summary_document(video_id: str) -> Optional[Dict[str, Any]]:
+        '''
+        概要: 最新の要約ドキュメントとその内容ハッシュを取得する \n
+        用途: GET /summaries/{video_id} で使用する。共有キャッシュを優先し、なければDBから取得する
+        '''
+        cached_document = cache.get("summary_document", video_id)
+        if cached_document is not None:
+            return cached_document
+        existing_summary = DatabaseService.get_summary_by_video_id(video_id)
+        if not existing_summary:
+            return None
+        entry = {"document": summary_to_document(existing_summary), "content_hash": existing_summary.content_hash}
+        cache.set("summary_document", video_id, entry, ttl=SUMMARY_CACHE_TTL_SECONDS)
+        return entry
+
+    @staticmethod
+    def is_current(summary: Dict[str, Any], video_id: str) -> bool:
+        '''
+        概要: 要約が現在のプロンプト・モデル・文字起こしで生成されたものか判定する \n
+        用途: 文字起こしはキャッシュにある場合のみ比較する（判定のためにYouTubeへ問い合わせない）
+        '''
+        version = get_summary_version()
+        if summary.get("prompt_hash") != version["prompt_hash"] or summary.get("model_name") != version["model_name"]:
+            return False
+        cached_transcript = cache.get("transcript", video_id)
+        if cached_transcript is not None and summary.get("transcript_hash") != compute_transcript_hash(cached_transcript):
+            return False
+        return True
+
+    @staticmethod
+    def run(video_id: str) -> Dict[str, Any]:
+        '''
+        概要: 1動画分の要約パイプラインを実行する \n
+        用途: 現在のバージョンの要約があればそれを返し、なければ生成してGCSとDBに保存する
+        '''
+        # 既存の要約データを検索（再試行時やジョブ重複時の再計算を避ける）
+        existing_summary = SummaryPipelineService.get_cached_summary(video_id)
+        if existing_summary and SummaryPipelineService.is_current(existing_summary, video_id):
+            return existing_summary
+        
+        try:
+            transcript = YouTubeTranscriptService.get_transcript(video_id)
+        except HTTPException as he:
+            # YouTubeの障害中・レート制限中は古いバージョンの要約を返す（新しい要約は再要約で生成される）
+            if he.status_code == 503 and existing_summary:
+                logger.warning(f"文字起こしを取得できないため古いバージョンの要約を返却: video_id={video_id}")
+                return existing_summary
+            raise
+        version = get_summary_version(transcript)
+        
+        # プロンプト・モデル・文字起こしがすべて一致する要約が既にあれば再計算しない
+        matching_summary = DatabaseService.get_summary_by_video_id(video_id, **version)
+        if matching_summary:
+            summary = SummaryPipelineService._to_summary_dict(video_id, matching_summary)
+            cache.set("summary", video_id, summary, ttl=SUMMARY_CACHE_TTL_SECONDS)
+            return summary
+        
+        video_info = YouTubeTranscriptService.get_video_info(video_id)
+        
+        # 初期状態の作成
+        initial_state = SummaryState(
+            transcript=transcript,
+            summary="",
+            needs_refinement=True
+        )
+        
+        # 要約ワークフローの作成と実行
+        initial_summarizer = create_initial_summarizer()
+        try:
+            # 要約の出力は要約エージェント内でスキーマ検証・修復済み
+            final_result = initial_summarizer.invoke(initial_state)
+        except SummaryParseError as pe:
+            log_structured_error(
+                "json_parse_error",
+                "要約のJSON解析に失敗しました",
+                exception=pe,
+                video_id=video_id,
+                raw_data=pe.raw_text[:200]
+            )
+            raise HTTPException(
+                status_code=500, 
+                detail=f"要約のJSON解析に失敗しました。\n生データ: {pe.raw_text[:200]}..."
+            )
+        summary_json = json.loads(final_result['summary'])
+        
+        # GCSに保存
+        gcs_path = GoogleCloudStorageService.save_summary_to_gcs(
+            video_id=video_id,
+            summary_data=summary_json,
+            video_info=video_info,
+            version=version
+        )
+        
+        # データベースに保存
+        db_id = DatabaseService.save_summary_to_db(
+            video_id=video_id,
+            summary_data=summary_json,
+            video_info=video_info,
+            gcs_path=gcs_path,
+            version=version
+        )
+        
+        if db_id:
+            print(f"要約データをデータベースに保存しました: ID={db_id}")
+            # このプロセスの関連動画インデックスに即座に反映する（他のプロセスは定期的な差分取得で反映）
+            if RELATED_INDEX_ENABLED:
+                related_index.add(video_id, summary_json)
+        
+        # 新しい要約で共有キャッシュを置き換える（それまでは古い要約が返される）
+        summary = {
+            "video_id": video_id,
+            "summary": final_result['summary'],
+            "gcs_path": gcs_path,
+            **version
+        }
+        cache.set("summary", video_id, summary, ttl=SUMMARY_CACHE_TTL_SECONDS)
+        cache.delete("summary_document", video_id)
+        return summary
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    '''If-None-Matchヘッダーが指定したETagに一致するか判定する（弱い比較。"*"はすべてに一致）'''
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in [candidate[2:] if candidate.startswith("W/") else candidate for candidate in candidates]
+
+
+def handle_summary_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    '''
+    概要: 要約ジョブのハンドラー \n
+    用途: ワーカープールから呼び出され、HTTPExceptionをジョブの失敗種別に変換する
+    '''
+    if job["strategy"] not in SUMMARY_STRATEGIES:
+        raise PermanentJobError(f"未対応の要約ストラテジーです: {job['strategy']}")
+    try:
+        return SummaryPipelineService.run(job["video_id"])
+    except HTTPException as he:
+        if he.status_code == 503:
+            retry_after = float((he.headers or {}).get("Retry-After", 1))
+            raise UpstreamThrottled("youtube_transcript", retry_after, str(he.detail))
+        if 400 <= he.status_code < 500:
+            # 文字起こしが存在しないなど、再試行しても結果が変わらないエラー
+            raise PermanentJobError(str(he.detail), status_code=he.status_code)
+        raise
+
+
+def shed_summary_request(video_id: str, overloaded: Overloaded):
+    '''
+    概要: 混雑時に受け付けなかった要約リクエストの扱いを決める \n
+    用途: ジョブキューが使える場合はジョブを登録して完了を待たずに202を返し（GET /jobs/{id}でポーリング）、
+          使えない場合は503とRetry-Afterを返す
+    '''
+    # ジョブキューの滞留による混雑の場合は、ジョブキューに回しても滞留が増えるだけのため503とする
+    if (not overloaded.queue_full and summary_worker_pool.is_running
+            and not circuit_breakers.get(CircuitBreakerRegistry.DATABASE).is_open):
+        try:
+            job = JobQueueService.enqueue(video_id, DEFAULT_SUMMARY_STRATEGY, priority=SUMMARY_INTERACTIVE_PRIORITY)
+        except SQLAlchemyError:
+            logger.warning(f"混雑時のジョブ登録に失敗しました: video_id={video_id}")
+        else:
+            summary_worker_pool.notify()
+            admission_controller.record_diverted("summarize")
+            logger.info(f"混雑のため要約をジョブキューに回しました: job_id={job['job_id']}, {overloaded.reason}")
+            return JSONResponse(
+                status_code=202,
+                content=JobResponse(**job).model_dump(),
+                headers={"Location": f"/jobs/{job['job_id']}", "Retry-After": str(int(overloaded.retry_after))}
+            )
+    admission_controller.record_rejected("summarize")
+    logger.warning(f"混雑のため要約リクエストを拒否しました: video_id={video_id}, {overloaded.reason}")
+    raise HTTPException(status_code=503, detail=str(overloaded), headers={"Retry-After": str(int(overloaded.retry_after))})
+
+
+# 要約ジョブのワーカープール
+summary_worker_pool = SummaryWorkerPool(handler=handle_summary_job)
+
+# 流入制御の判定に、/summarize/のジョブより先に処理される待機中のジョブを含める
+admission_controller.job_backlog = lambda: JobQueueService.backlog(min_priority=SUMMARY_INTERACTIVE_PRIORITY)
+
+# チャンネル・プレイリストの事前要約スケジューラー（INGEST_SOURCES設定時のみ動作）
+ingestion_scheduler = IngestionScheduler(configured_sources())
+
+# 古いバージョンの要約の再要約スケジューラー（RESUMMARIZE_ENABLED=true時のみ動作）
+resummarize_scheduler = ResummarizeScheduler(get_summary_version)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    '''アプリケーションの起動・終了時にジョブワーカーと各スケジューラーを開始・停止する'''
+    summary_worker_pool.start()
+    ingestion_scheduler.start()
+    if RESUMMARIZE_ENABLED:
+        resummarize_scheduler.start()
+    if RELATED_INDEX_ENABLED:
+        related_index.start()
+    yield
+    related_index.stop()
+    resummarize_scheduler.stop()
+    ingestion_scheduler.stop()
+    summary_worker_pool.stop()
+
+
 # FastAPIインスタンスの作成
 app = FastAPI(
     title=API_TITLE,
     description=API_DESCRIPTION,
     version=API_VERSION,
+    lifespan=lifespan,
 )
 
 # アプリケーション起動時にテーブルを作成
@@ -454,7 +932,7 @@ async def root():
 
 
 @app.post("/transcript/", response_model=TranscriptResponse)
-async def get_video_transcript(request: TranscriptRequest):
+def get_video_transcript(request: TranscriptRequest):
     try:
         video_id = request.video_id
         logger.info(f"文字起こしリクエストを受信: video_id={video_id}")
@@ -466,7 +944,10 @@ async def get_video_transcript(request: TranscriptRequest):
             title=video_info["title"],
             description=video_info["description"],
             channelTitle=video_info["channelTitle"],
-            channelId=video_info["channelId"]
+            channelId=video_info["channelId"],
+            transcript_handle=YouTubeTranscriptService.create_transcript_handle(
+                YouTubeTranscriptService.extract_video_id(video_id), transcript, video_info
+            )
         )
     except HTTPException as he:
         log_structured_error(
@@ -487,76 +968,74 @@ async def get_video_transcript(request: TranscriptRequest):
 
 
 @app.post("/summarize/", response_model=SummaryResponse)
-async def get_video_summary(request: TranscriptRequest):
-    """動画の文字起こしを要約するエンドポイント"""
+def get_video_summary(request: TranscriptRequest):
+    """動画の文字起こしを要約するエンドポイント（要約ジョブの完了を待つラッパー）"""
     try:
-        video_id = request.video_id
+        video_id = YouTubeTranscriptService.extract_video_id(request.video_id)
         logger.info(f"要約リクエストを受信: video_id={video_id}")
-        transcript = YouTubeTranscriptService.get_transcript(video_id)
-        video_info = YouTubeTranscriptService.get_video_info(video_id)
         
-        # 既存の要約データをDBから検索（キャッシュとして使用）
-        existing_summary = DatabaseService.get_summary_by_video_id(video_id)
+        # 既存の要約データを共有キャッシュ・DBから検索
+        existing_summary = SummaryPipelineService.get_cached_summary(video_id)
         if existing_summary:
             logger.info(f"キャッシュされた要約を返却: video_id={video_id}")
-            return SummaryResponse(
-                video_id=video_id, 
-                summary=json.dumps(existing_summary.summary_data),
-                gcs_path=existing_summary.gcs_path
-            )
+            if summary_worker_pool.is_running and not SummaryPipelineService.is_current(existing_summary, video_id):
+                # 古いバージョンの要約はそのまま返し、再要約の上限（RESUMMARIZE_MAX_PER_HOUR）の範囲で新しい要約をバックグラウンドで生成する
+                # （プロンプト・モデルの変更後に、読み取りの多い動画の再要約が一斉に登録されないようにする）
+                try:
+                    resummarize_scheduler.request(video_id, DEFAULT_SUMMARY_STRATEGY)
+                except SQLAlchemyError:
+                    logger.warning(f"再要約ジョブの登録に失敗しました: video_id={video_id}")
+            return SummaryResponse(**existing_summary)
         
-        # 初期状態の作成
-        initial_state = SummaryState(
-            transcript=transcript,
-            summary="",
-            needs_refinement=True
-        )
+        # /transcript/で取得済みの文字起こし・ビデオ情報を動画IDごとのキャッシュに格納し、パイプラインでの再取得を省略する
+        YouTubeTranscriptService.resolve_transcript_handle(request.transcript_handle, video_id)
         
-        # 要約ワークフローの作成と実行
-        initial_summarizer = create_initial_summarizer()
-        final_result = initial_summarizer.invoke(initial_state)
+        # 要約の生成（LLM呼び出し）が混雑している場合は、待たせずにジョブキューに回すか503を返す
+        try:
+            admission_controller.admit("summarize", queued=summary_worker_pool.is_running)
+        except Overloaded as ov:
+            return shed_summary_request(video_id, ov)
+        
+        if not summary_worker_pool.is_running or circuit_breakers.get(CircuitBreakerRegistry.DATABASE).is_open:
+            # ワーカーが無効な場合や、DBの障害でジョブキューが使えない場合はリクエスト内で直接実行する
+            return SummaryResponse(**SummaryPipelineService.run(video_id))
         
         try:
-            # JSONとして解析可能か確認
-            summary_json = json.loads(final_result['summary'])
-            
-            # GCSに保存
-            gcs_path = GoogleCloudStorageService.save_summary_to_gcs(
-                video_id=video_id,
-                summary_data=summary_json,
-                video_info=video_info
-            )
-            
-            # データベースに保存
-            db_id = DatabaseService.save_summary_to_db(
-                video_id=video_id,
-                summary_data=summary_json,
-                video_info=video_info,
-                gcs_path=gcs_path
-            )
-            
-            if db_id:
-                print(f"要約データをデータベースに保存しました: ID={db_id}")
-            
-            return SummaryResponse(
-                video_id=video_id, 
-                summary=final_result['summary'],
-                gcs_path=gcs_path
-            )
-        except json.JSONDecodeError as je:
-            log_structured_error(
-                "json_parse_error",
-                "要約のJSON解析に失敗しました",
-                exception=je,
-                video_id=video_id,
-                error_position=je.pos,
-                raw_data=final_result['summary'][:200]
-            )
-            raise HTTPException(
-                status_code=500, 
-                detail=f"要約のJSON解析に失敗しました。エラー位置: {je.pos}, 原因: {je.msg}\n生データ: {final_result['summary'][:200]}..."
-            )
+            job = JobQueueService.enqueue(video_id, DEFAULT_SUMMARY_STRATEGY, priority=SUMMARY_INTERACTIVE_PRIORITY)
+        except SQLAlchemyError:
+            logger.warning(f"ジョブキューが利用できないため直接要約を実行します: video_id={video_id}")
+            return SummaryResponse(**SummaryPipelineService.run(video_id))
+        summary_worker_pool.notify()
+        
+        # 状態を取得できない場合（DBの一時的な障害など）は登録時の情報で202を返す
+        job = JobQueueService.wait_for_job(job["job_id"], SUMMARY_WAIT_TIMEOUT_SECONDS) or job
+        if job["status"] == JOB_STATUS_SUCCEEDED:
+            return SummaryResponse(**job["result"])
+        if job["status"] == JOB_STATUS_FAILED:
+            raise HTTPException(status_code=job["error_code"] or 500, detail=job["error"])
+        
+        # 待機時間内に完了しない場合はジョブIDを返し、GET /jobs/{id}でのポーリングに切り替えてもらう
+        logger.info(f"要約ジョブが待機時間内に完了しませんでした: job_id={job['job_id']}")
+        return JSONResponse(
+            status_code=202,
+            content=JobResponse(**job).model_dump(),
+            headers={"Location": f"/jobs/{job['job_id']}"}
+        )
             
+    except HTTPException:
+        raise
+    except UpstreamThrottled as ut:
+        log_structured_error(
+            "summary_rate_limited",
+            str(ut),
+            video_id=video_id,
+            upstream=ut.upstream,
+            retry_after=ut.retry_after
+        )
+        raise HTTPException(status_code=503, detail=str(ut), headers={"Retry-After": str(int(ut.retry_after))})
+    except LLMTimeout as lt:
+        log_structured_error("summary_llm_timeout", str(lt), video_id=video_id, kind=lt.kind, deadline=lt.deadline)
+        raise HTTPException(status_code=504, detail=str(lt))
     except Exception as e:
         log_structured_error(
             "summary_generation_error",
@@ -567,16 +1046,181 @@ async def get_video_summary(request: TranscriptRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/summaries/{video_id}", response_model=SummaryDocument)
+def get_summary_document(video_id: str, request: Request):
+    '''
+    概要: 保存済み要約の取得エンドポイント \n
+    用途: 要約を型付きのオブジェクトとして返す（生成は行わない）。内容ハッシュをETagとし、
+          If-None-Matchが一致する場合は304を返す。Cache-ControlによりCloud CDNやブラウザでキャッシュ可能
+    '''
+    video_id = YouTubeTranscriptService.extract_video_id(video_id)
+    entry = SummaryPipelineService.get_summary_document(video_id)
+    if entry is None:
+        try:
+            circuit_breakers.get(CircuitBreakerRegistry.DATABASE).check()
+        except CircuitOpen as co:
+            # DBの障害中は要約の有無を判定できないため、404ではなく503を返す
+            raise HTTPException(
+                status_code=503,
+                detail=str(co),
+                headers={"Cache-Control": "no-store", "Retry-After": str(int(co.retry_after))}
+            )
+        raise HTTPException(
+            status_code=404,
+            detail="指定された動画の要約が見つかりません",
+            headers={"Cache-Control": "no-store"}
+        )
+    etag = f'"{entry["content_hash"]}"'
+    headers = {"ETag": etag, "Cache-Control": SUMMARY_CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    # キャッシュ済みの辞書をorjsonで直接バイト列にする（JSON文字列の二重エンコードやモデル検証を行わない）
+    return Response(content=orjson.dumps(entry["document"]), media_type="application/json", headers=headers)
+
+
+@app.get("/summaries/{video_id}/related", response_model=RelatedVideosResponse)
+def get_related_videos(video_id: str, limit: int = 10):
+    '''
+    概要: 関連動画の取得エンドポイント \n
+    用途: サブタイトル・概要・キーワード・主要トピックのTF-IDFベクトルが似ている要約済みの動画を類似度順に返す。
+          インデックスの準備中は503（Retry-After付き）、要約のない動画は404を返す
+    '''
+    video_id = YouTubeTranscriptService.extract_video_id(video_id)
+    if not RELATED_INDEX_ENABLED:
+        raise HTTPException(status_code=404, detail="関連動画インデックスは無効です")
+    try:
+        related = related_index.related(video_id, limit=max(1, min(limit, 50)))
+    except RelatedIndexNotReady as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    if related is None:
+        raise HTTPException(status_code=404, detail="指定された動画の要約が見つかりません")
+    try:
+        summaries = DatabaseService.get_latest_summaries([related_id for related_id, _ in related])
+    except SQLAlchemyError as e:
+        log_structured_error("related_videos_error", "関連動画の取得に失敗しました", exception=e, video_id=video_id)
+        raise HTTPException(status_code=503, detail="データベースが利用できません")
+    results = []
+    for related_id, score in related:
+        summary = summaries.get(related_id)
+        if summary is None:
+            continue
+        results.append({
+            "video_id": related_id,
+            "title": summary.video_title,
+            "channel_title": summary.channel_title,
+            "sub_title": summary.sub_title,
+            "score": score,
+        })
+    return {"video_id": video_id, "results": results}
+
+
+@app.get("/search", response_model=SearchResponse)
+def search_summaries(q: str, limit: int = 20, offset: int = 0):
+    '''
+    概要: 保存済み要約の検索エンドポイント \n
+    用途: キーワード・主要トピック・タイトル・サブタイトル・概要を対象に、検索語をすべて含む要約をスコア順に返す
+    '''
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="検索語を指定してください")
+    try:
+        return SearchService.search(q, limit=max(1, min(limit, 100)), offset=max(0, offset))
+    except SQLAlchemyError as e:
+        log_structured_error("summary_search_error", "要約の検索に失敗しました", exception=e, query=q)
+        raise HTTPException(status_code=503, detail="データベースが利用できません")
+
+
+@app.get("/export/summaries")
+def export_summaries(since: Optional[str] = None, format: str = EXPORT_FORMAT_NDJSON, gzip: bool = True,
+                     authorization: Optional[str] = Header(None)):
+    '''
+    概要: 保存済み要約の一括エクスポートエンドポイント \n
+    用途: 要約をサーバーサイドカーソルで逐次読み出し、NDJSONまたは列指向のチャンクとして（既定ではgzip圧縮して）ストリーミングで返す。
+          レスポンスヘッダーX-Export-Watermarkの値を次回のsinceに渡すと、前回以降に保存された要約のみを取得できる。
+          EXPORT_API_TOKENが未設定の場合は無効（404）、設定時はAuthorization: Bearer <トークン>が必要（401）。
+          同時実行数はEXPORT_MAX_CONCURRENT_STREAMSまで（超えた場合は503）
+    '''
+    if not EXPORT_API_TOKEN:
+        raise HTTPException(status_code=404, detail="HTTPエクスポートは無効です")
+    if not is_authorized_export(authorization):
+        raise HTTPException(status_code=401, detail="認証が必要です", headers={"WWW-Authenticate": "Bearer"})
+    if not export_stream_slots.try_acquire():
+        raise HTTPException(
+            status_code=503, detail="同時に実行できるエクスポートの上限に達しています", headers={"Retry-After": "60"}
+        )
+    try:
+        export = SummaryExport(parse_watermark(since), format, compress=gzip)
+    except ValueError as ve:
+        export_stream_slots.release()
+        raise HTTPException(status_code=400, detail=str(ve))
+    except SQLAlchemyError as e:
+        export_stream_slots.release()
+        log_structured_error("summary_export_error", "エクスポート対象の取得に失敗しました", exception=e, since=since)
+        raise HTTPException(status_code=503, detail="データベースが利用できません")
+    headers = {
+        "Content-Disposition": f'attachment; filename="{export.filename}"',
+        "Cache-Control": "no-store",
+    }
+    if export.watermark is not None:
+        headers["X-Export-Watermark"] = format_watermark(export.watermark)
+    return StreamingResponse(export_stream_slots.stream(export), media_type=export.media_type, headers=headers)
+
+
+@app.post("/jobs/summarize", status_code=202, response_model=JobResponse)
+def create_summary_job(request: SummarizeJobRequest):
+    '''
+    概要: 要約ジョブ登録エンドポイント \n
+    用途: 要約をバックグラウンドで実行するジョブを登録し、ジョブIDを即座に返す。
+          同じ(video_id, strategy)のジョブが既に存在する場合はそのジョブを返す
+    '''
+    if request.strategy not in SUMMARY_STRATEGIES:
+        raise HTTPException(status_code=400, detail=f"未対応の要約ストラテジーです: {request.strategy}")
+    video_id = YouTubeTranscriptService.extract_video_id(request.video_id)
+    try:
+        job = JobQueueService.enqueue(video_id, request.strategy, priority=request.priority)
+    except SQLAlchemyError as e:
+        log_structured_error("job_enqueue_error", "ジョブの登録に失敗しました", exception=e, video_id=video_id)
+        raise HTTPException(status_code=503, detail="ジョブキューが利用できません")
+    summary_worker_pool.notify()
+    return JobResponse(**job)
+
+
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+def get_job_status(job_id: str):
+    '''
+    概要: ジョブ状態取得エンドポイント \n
+    用途: ジョブの状態（queued / running / succeeded / failed）と完了時の要約結果を返す
+    '''
+    job = JobQueueService.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="指定されたジョブが見つかりません")
+    return JobResponse(**job)
+
+
 @app.post("/chat/", response_model=Dict[str, str])
-async def process_chat(request: Dict[str, Any]):
+def process_chat(request: Dict[str, Any]):
     """チャットメッセージを処理するエンドポイント"""
     try:
         content = request.get("content", "")
         chat_type = request.get("type", "transcript")
         content_text = request.get("contentText", "")
+        video_id = request.get("video_id")
+        if video_id:
+            video_id = YouTubeTranscriptService.extract_video_id(video_id)
         
         logger.info(f"チャットリクエストを受信: type={chat_type}")
         
+        if chat_type == "transcript":
+            # 要約時と同じ前処理済みの文字起こしを使い、要約時の呼び出しとプロンプトの先頭部分を一致させる。
+            # ハンドルがあればcontentTextは不要（期限切れの場合は動画IDごとのキャッシュかYouTubeから取得する）
+            entry = YouTubeTranscriptService.resolve_transcript_handle(request.get("transcript_handle"), video_id)
+            if entry is not None:
+                video_id = entry["video_id"]
+            transcript = entry["transcript"] if entry is not None else (cache.get("transcript", video_id) if video_id else None)
+            if transcript is None and not content_text and video_id:
+                transcript = YouTubeTranscriptService.get_transcript(video_id)
+            if transcript is not None:
+                content_text = transcript_to_text(preprocess_transcript(transcript).transcript)
+        
         if not content or not content_text:
             log_structured_error(
                 "chat_validation_error",
@@ -587,25 +1231,131 @@ async def process_chat(request: Dict[str, Any]):
             )
             raise ValueError("必要なパラメータが不足しています")
 
-        llm = ChatOpenAI(model="gpt-4.1-nano", temperature=0)
-        
+        try:
+            admission_controller.admit("chat")
+        except Overloaded as ov:
+            admission_controller.record_rejected("chat")
+            raise HTTPException(status_code=503, detail=str(ov), headers={"Retry-After": str(int(ov.retry_after))})
+
         system_message = "文字起こし" if chat_type == "transcript" else "要約"
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", f"あなたは{system_message}の内容について質問に答える専門家です。"),
-            ("user", f"以下の{system_message}の内容に関する質問に答えてください:\n\n{content_text}\n\n質問: {content}")
-        ])
-        
-        formatted_prompt = prompt.format_messages()
-        response = llm.invoke(formatted_prompt)
+        formatted_prompt = build_prompt_messages(
+            content_text,
+            CHAT_INSTRUCTION.format(label=system_message, question=content),
+            context_type="transcript" if chat_type == "transcript" else "summary"
+        )
+        # 要約時と同じツール定義を送り、共通プレフィックスを一致させる（チャットではツールを呼び出させない）
+        response = get_llm_client(SUMMARY_MODEL).invoke(
+            formatted_prompt, "chat", tools=SHARED_TOOLS, tool_choice=CHAT_TOOL_CHOICE
+        )
         return {"response": response.content}
+    except HTTPException:
+        raise
     except ValueError as ve:
         raise HTTPException(status_code=400, detail=str(ve))
+    except UpstreamThrottled as ut:
+        raise HTTPException(status_code=503, detail=str(ut), headers={"Retry-After": str(int(ut.retry_after))})
+    except LLMTimeout as lt:
+        raise HTTPException(status_code=504, detail=str(lt))
     except Exception as e:
         error_trace = traceback.format_exc()
         print(f"チャット処理中にエラーが発生: {error_trace}", file=sys.stderr)
         raise HTTPException(status_code=500, detail=f"チャット処理中にエラーが発生しました: {str(e)}")
 
 
+@app.get("/ingest/runs")
+def get_ingestion_runs(source_id: Optional[str] = None, limit: int = 50, authorization: Optional[str] = Header(None)):
+    '''
+    概要: 事前要約の実行履歴を返すエンドポイント \n
+    用途: チャンネル・プレイリストごとの取得ページ数、登録・スキップした動画数、消費クォータを確認する。
+          エクスポートと同じくEXPORT_API_TOKENが未設定の場合は無効（404）、設定時はAuthorization: Bearer <トークン>が必要（401）
+    '''
+    if not EXPORT_API_TOKEN:
+        raise HTTPException(status_code=404, detail="実行履歴の取得は無効です")
+    if not is_authorized_export(authorization):
+        raise HTTPException(status_code=401, detail="認証が必要です", headers={"WWW-Authenticate": "Bearer"})
+    try:
+        return IngestionService.list_runs(limit=min(limit, 200), source_id=source_id)
+    except SQLAlchemyError as e:
+        log_structured_error("ingestion_runs_error", "事前要約の実行履歴の取得に失敗しました", exception=e, source_id=source_id)
+        raise HTTPException(status_code=503, detail="データベースが利用できません")
+
+
+@app.get("/health")
+async def health_check():
+    '''
+    概要: ヘルスチェックエンドポイント \n
+    用途: 依存先（YouTube Data API、文字起こし取得、OpenAI、GCS、データベース）ごとのサーキットブレーカーの状態を返す。
+          遮断中・試行中の依存先がある場合はstatusがdegradedとなる（プロセス自体は応答可能なため常に200を返す）
+    '''
+    breakers = circuit_breakers.snapshot()
+    degraded = [name for name, breaker in breakers.items() if breaker["state"] != "closed"]
+    return {"status": "degraded" if degraded else "ok", "degraded": degraded, "circuit_breakers": breakers}
+
+
+@app.get("/status/admission")
+async def get_admission_status():
+    '''
+    概要: 流入制御の状態を返すエンドポイント \n
+    用途: 実行中のLLM呼び出し数・待ち時間と目標値、エンドポイントごとの受付・ジョブキューへの振り替え・拒否の件数を確認する
+    '''
+    return admission_controller.snapshot()
+
+
+@app.get("/status/rate_limits")
+async def get_rate_limit_status():
+    '''
+    概要: 上流APIのレート制御状態を返すエンドポイント \n
+    用途: トークンバケット残量・AIMD同時実行数・429発生回数を確認し、スロットリング中かどうかを把握する
+    '''
+    return scheduler.snapshot()
+
+
+@app.get("/status/cache")
+async def get_cache_status():
+    '''
+    概要: キャッシュの状態を返すエンドポイント \n
+    用途: バックエンド種別・エントリ数・サイズ・ヒット率を確認する
+    '''
+    return cache.stats()
+
+
+@app.get("/status/llm_usage")
+async def get_llm_usage_status():
+    '''
+    概要: LLM呼び出しのトークン使用量を返すエンドポイント \n
+    用途: 分析・要約・チャットごとのキャッシュ済み入力トークンの割合と、キャッシュヒット有無別の平均応答時間を確認する
+    '''
+    return llm_usage.snapshot()
+
+
+@app.get("/status/llm_calls")
+async def get_llm_call_status():
+    '''
+    概要: LLM呼び出しの期限・ヘッジの状態を返すエンドポイント \n
+    用途: 呼び出しの種類ごとのヘッジ回数・ヘッジ側の勝利回数・タイムアウト回数と応答時間のパーセンタイルを確認し、
+          ヘッジのしきい値（LLM_HEDGE_PERCENTILE）を調整する
+    '''
+    return llm_clients_snapshot()
+
+
+@app.get("/status/related_index")
+async def get_related_index_status():
+    '''
+    概要: 関連動画インデックスの状態を返すエンドポイント \n
+    用途: 登録済みの動画数・語彙数・未統合の要約数と、問い合わせ数・まとめて計算した回数（バッチ数）を確認する
+    '''
+    return related_index.stats()
+
+
+@app.get("/status/summary_repairs")
+async def get_summary_repair_status():
+    '''
+    概要: 要約出力のJSON修復状況を返すエンドポイント \n
+    用途: そのまま有効だった割合と、コードフェンス除去・ローカル修復・LLM修復・失敗の件数を確認する
+    '''
+    return summary_repair_stats.snapshot()
+
+
 # メインプロセス
 if __name__ == "__main__":
     try:
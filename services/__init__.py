@@ -0,0 +1,5 @@
+# 上流API呼び出しの共通サービスパッケージの初期化
+from .rate_limiter import OutboundScheduler, UpstreamThrottled, scheduler
+from .token_counter import count_tokens, count_message_tokens
+
+__all__ = ['OutboundScheduler', 'UpstreamThrottled', 'scheduler', 'count_tokens', 'count_message_tokens']
@@ -0,0 +1,201 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 流入制御（アドミッションコントロール）設定
+ADMISSION_CONTROL_ENABLED = os.getenv("ADMISSION_CONTROL_ENABLED", "true").lower() == "true"
+ADMISSION_TARGET_WAIT_SECONDS = float(os.getenv("ADMISSION_TARGET_WAIT_SECONDS", "2"))  # LLM呼び出しの待ち時間の目標値
+ADMISSION_MAX_INFLIGHT_LLM_CALLS = int(os.getenv("ADMISSION_MAX_INFLIGHT_LLM_CALLS", "32"))  # 実行中・待機中のLLM呼び出しの上限
+ADMISSION_WAIT_WINDOW_SECONDS = float(os.getenv("ADMISSION_WAIT_WINDOW_SECONDS", "10"))  # 待ち時間の集計期間
+ADMISSION_WAIT_PERCENTILE = float(os.getenv("ADMISSION_WAIT_PERCENTILE", "90"))
+ADMISSION_MAX_RETRY_AFTER_SECONDS = float(os.getenv("ADMISSION_MAX_RETRY_AFTER_SECONDS", "60"))
+ADMISSION_MAX_QUEUED_JOBS = int(os.getenv("ADMISSION_MAX_QUEUED_JOBS", "20"))  # 待機中の要約ジョブ（対話的な優先度以上）の上限
+ADMISSION_MAX_QUEUE_AGE_SECONDS = float(os.getenv("ADMISSION_MAX_QUEUE_AGE_SECONDS", "30"))  # 最も古い待機中ジョブの待ち時間の上限
+ADMISSION_BACKLOG_REFRESH_SECONDS = float(os.getenv("ADMISSION_BACKLOG_REFRESH_SECONDS", "1"))  # ジョブキューの状態を問い合わせる間隔
+
+OUTCOME_ADMITTED = "admitted"
+OUTCOME_DIVERTED = "diverted"
+OUTCOME_REJECTED = "rejected"
+
+
+class Overloaded(Exception):
+    """
+    概要: LLM呼び出しの待ち時間・実行数が上限を超えているため、新しい重い処理を受け付けられないことを示す例外
+    用途: 呼び出し側で503とRetry-Afterに変換するか、ジョブキューに回す
+    """
+
+    def __init__(self, reason: str, retry_after: float, queue_full: bool = False):
+        self.reason = reason
+        # ジョブキューの滞留による混雑（ジョブキューに回しても滞留が増えるだけのため、503とする）
+        self.queue_full = queue_full
+        self.retry_after = max(1.0, min(ADMISSION_MAX_RETRY_AFTER_SECONDS, retry_after))
+        super().__init__(f"サーバーが混雑しています（{reason}）。{self.retry_after:.0f}秒後に再試行してください")
+
+
+class AdmissionController:
+    """
+    概要: 実行中のLLM呼び出し数と、LLM呼び出しがレート制御の枠を待った時間による流入制御
+    用途: 待ち時間は直近の集計期間に枠を取得した呼び出しの待ち時間のパーセンタイルと、現在待機中の呼び出しの最長待ち時間の大きい方とする
+          （待機中の呼び出しも含めるため、枠が空かない間に新しい処理を受け付け続けることがない）。
+          キャッシュヒットや文字起こし取得などの軽い処理は判定せず、要約生成・チャットなどの重い処理の受付前にadmitを呼び出す。
+          ジョブキューで実行する処理は、待機中のジョブの件数と最も古いジョブの待ち時間も判定に使う
+          （ワーカー数でLLM呼び出しが抑えられるため、混雑はLLM呼び出しではなくジョブキューの滞留として現れる）
+    """
+
+    def __init__(self, enabled: bool = ADMISSION_CONTROL_ENABLED, target_wait: float = ADMISSION_TARGET_WAIT_SECONDS,
+                 max_in_flight: int = ADMISSION_MAX_INFLIGHT_LLM_CALLS, window: float = ADMISSION_WAIT_WINDOW_SECONDS,
+                 max_queued_jobs: int = ADMISSION_MAX_QUEUED_JOBS, max_queue_age: float = ADMISSION_MAX_QUEUE_AGE_SECONDS,
+                 backlog_refresh: float = ADMISSION_BACKLOG_REFRESH_SECONDS,
+                 job_backlog: Optional[Callable[[], Tuple[int, float]]] = None):
+        self.enabled = enabled
+        self.target_wait = target_wait
+        self.max_in_flight = max_in_flight
+        self.window = window
+        self.max_queued_jobs = max_queued_jobs
+        self.max_queue_age = max_queue_age
+        self.backlog_refresh = backlog_refresh
+        # 待機中のジョブの件数と最も古いジョブの待ち時間（秒）を返す関数
+        self.job_backlog = job_backlog
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waiting: Dict[object, float] = {}
+        self._samples: deque = deque()
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._backlog: Tuple[int, float] = (0, 0.0)
+        self._backlog_at: Optional[float] = None
+        # 前回の問い合わせ以降に受け付けたジョブ（まだジョブキューに反映されていない可能性がある）
+        self._admitted_since_backlog = 0
+
+    @contextmanager
+    def track_llm_call(self) -> Iterator[Callable[[], None]]:
+        '''
+        概要: LLM呼び出し1回を実行中として数える
+        用途: 返される関数はレート制御の枠を取得して実際に送信を始める時点で呼び出す（それまでの時間を待ち時間として記録する）
+        '''
+        token = object()
+        with self._lock:
+            self._in_flight += 1
+            self._waiting[token] = time.monotonic()
+
+        def started():
+            now = time.monotonic()
+            with self._lock:
+                queued_at = self._waiting.pop(token, None)
+                if queued_at is not None:
+                    self._samples.append((now, now - queued_at))
+
+        try:
+            yield started
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._waiting.pop(token, None)
+
+    def _queue_wait(self, now: float) -> float:
+        '''直近の待ち時間のパーセンタイルと、待機中の呼び出しの最長待ち時間の大きい方（ロック取得済みで呼び出す）'''
+        while self._samples and self._samples[0][0] < now - self.window:
+            self._samples.popleft()
+        observed = 0.0
+        if self._samples:
+            ordered = sorted(wait for _, wait in self._samples)
+            observed = ordered[min(len(ordered) - 1, int(round(ADMISSION_WAIT_PERCENTILE / 100 * (len(ordered) - 1))))]
+        oldest = max((now - queued_at for queued_at in self._waiting.values()), default=0.0)
+        return max(observed, oldest)
+
+    def _job_backlog(self, now: float) -> Tuple[int, float]:
+        '''
+        概要: 待機中のジョブの件数と最も古いジョブの待ち時間を返す
+        用途: DBへの問い合わせはbacklog_refresh秒ごとに間引き、その間に受け付けた件数を加える
+              （同時に届いたリクエストがすべて判定を通過しないようにする）。問い合わせに失敗した場合は前回の値を使う
+        '''
+        if self.job_backlog is None:
+            return 0, 0.0
+        with self._lock:
+            if self._backlog_at is not None and now - self._backlog_at < self.backlog_refresh:
+                pending, oldest = self._backlog
+                elapsed = now - self._backlog_at if self._backlog_at is not None else 0.0
+                return pending + self._admitted_since_backlog, oldest + elapsed if pending else 0.0
+        try:
+            backlog = self.job_backlog()
+        except Exception as e:
+            logger.warning(f"ジョブキューの状態を取得できないため、前回の値で判定します: {str(e)}")
+            backlog = None
+        with self._lock:
+            if backlog is not None:
+                self._backlog = backlog
+                self._admitted_since_backlog = 0
+            self._backlog_at = now
+            return self._backlog[0] + self._admitted_since_backlog, self._backlog[1]
+
+    def _record(self, route: str, outcome: str):
+        with self._lock:
+            stats = self._stats.setdefault(route, {OUTCOME_ADMITTED: 0, OUTCOME_DIVERTED: 0, OUTCOME_REJECTED: 0})
+            stats[outcome] += 1
+
+    def admit(self, route: str, queued: bool = False):
+        '''
+        概要: 重い処理を受け付けてよいか判定する
+        用途: 待ち時間が目標値を超えている場合や実行中のLLM呼び出しが上限に達している場合はOverloadedを送出する。
+              queued=True（ジョブキューで実行する処理）の場合は、待機中のジョブが上限に達しているか、最も古いジョブの待ち時間が
+              上限を超えている場合にもqueue_full=TrueのOverloadedを送出する。
+              送出後の扱い（ジョブキューに回すか503を返すか）は呼び出し側でrecord_divertedまたはrecord_rejectedで記録する
+        '''
+        if not self.enabled:
+            return
+        if queued:
+            pending, oldest = self._job_backlog(time.monotonic())
+            if pending >= self.max_queued_jobs:
+                raise Overloaded(f"待機中の要約ジョブ {pending}件", max(oldest, self.target_wait), queue_full=True)
+            if oldest > self.max_queue_age:
+                raise Overloaded(f"要約ジョブの待ち時間 {oldest:.0f}秒", oldest, queue_full=True)
+        with self._lock:
+            wait = self._queue_wait(time.monotonic())
+            in_flight = self._in_flight
+        if wait > self.target_wait:
+            raise Overloaded(f"LLM呼び出しの待ち時間 {wait:.1f}秒", wait)
+        if in_flight >= self.max_in_flight:
+            raise Overloaded(f"実行中のLLM呼び出し {in_flight}件", self.target_wait)
+        if queued:
+            with self._lock:
+                self._admitted_since_backlog += 1
+        self._record(route, OUTCOME_ADMITTED)
+
+    def record_diverted(self, route: str):
+        self._record(route, OUTCOME_DIVERTED)
+
+    def record_rejected(self, route: str):
+        self._record(route, OUTCOME_REJECTED)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            wait = self._queue_wait(time.monotonic())
+            in_flight = self._in_flight
+            waiting = len(self._waiting)
+            samples = len(self._samples)
+            queued_jobs, oldest_queued = self._backlog
+            routes = {route: dict(stats) for route, stats in self._stats.items()}
+        return {
+            "enabled": self.enabled,
+            "overloaded": self.enabled and (wait > self.target_wait or in_flight >= self.max_in_flight),
+            "target_wait_seconds": self.target_wait,
+            "max_in_flight_llm_calls": self.max_in_flight,
+            "queue_wait_seconds": round(wait, 3),
+            "in_flight_llm_calls": in_flight,
+            "waiting_llm_calls": waiting,
+            "wait_samples": samples,
+            "max_queued_jobs": self.max_queued_jobs,
+            "max_queue_age_seconds": self.max_queue_age,
+            "queued_jobs": queued_jobs,
+            "oldest_queued_job_seconds": round(oldest_queued, 1),
+            "routes": routes,
+        }
+
+
+# プロセス共通の流入制御
+admission_controller = AdmissionController()
@@ -0,0 +1,310 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+import logging
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# キャッシュ設定
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")  # memory / sqlite
+CACHE_PATH = os.getenv("CACHE_PATH", "/tmp/youtube_content_processor_cache.sqlite3")
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# 名前空間ごとのTTL（秒）
+TRANSCRIPT_CACHE_TTL_SECONDS = int(os.getenv("TRANSCRIPT_CACHE_TTL_SECONDS", str(24 * 3600)))
+VIDEO_INFO_CACHE_TTL_SECONDS = int(os.getenv("VIDEO_INFO_CACHE_TTL_SECONDS", str(6 * 3600)))
+SUMMARY_CACHE_TTL_SECONDS = int(os.getenv("SUMMARY_CACHE_TTL_SECONDS", str(24 * 3600)))
+TRANSCRIPT_HANDLE_TTL_SECONDS = int(os.getenv("TRANSCRIPT_HANDLE_TTL_SECONDS", str(30 * 60)))  # /transcript/が返すハンドルの有効期間
+
+# SQLiteバックエンドで最終アクセス時刻を更新する間隔（読み取りのたびに書き込みが発生しないよう間引く）
+SQLITE_TOUCH_INTERVAL_SECONDS = 60
+
+
+class CacheBackend(ABC):
+    """
+    概要: キャッシュバックエンドの共通インターフェース
+    用途: 文字起こし・ビデオ情報・要約をJSONシリアライズ可能な値として保持する
+    """
+
+    @abstractmethod
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        ...
+
+    @abstractmethod
+    def delete(self, namespace: str, key: str):
+        ...
+
+    @abstractmethod
+    def clear(self):
+        ...
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        ...
+
+
+class InMemoryCache(CacheBackend):
+    """
+    概要: プロセス内のサイズ上限付きLRUキャッシュ
+    用途: 単一ワーカー構成やテストで使用する
+    """
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()  # (namespace, key) -> (payload, expires_at, size)
+        self._size = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry is None or (entry[1] is not None and entry[1] < time.time()):
+                if entry is not None:
+                    self._remove((namespace, key))
+                self._misses += 1
+                return None
+            self._entries.move_to_end((namespace, key))
+            self._hits += 1
+            payload = entry[0]
+        return json.loads(payload)
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        payload = json.dumps(value, ensure_ascii=False)
+        size = len(payload.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._remove((namespace, key))
+            self._entries[(namespace, key)] = (payload, expires_at, size)
+            self._size += size
+            while self._size > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._evictions += 1
+
+    def _remove(self, entry_key: tuple):
+        entry = self._entries.pop(entry_key, None)
+        if entry is not None:
+            self._size -= entry[2]
+
+    def delete(self, namespace: str, key: str):
+        with self._lock:
+            self._remove((namespace, key))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "entries": len(self._entries),
+                "size_bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+            }
+
+
+class SQLiteCache(CacheBackend):
+    """
+    概要: ホスト上の全ワーカープロセスで共有するSQLite（WALモード）キャッシュ
+    用途: uvicornを複数ワーカーで動かす場合に、ワーカーごとのキャッシュ重複とウォームアップを避ける。
+          WALモードにより読み取りは書き込みと並行して実行できる
+    """
+
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._stats_lock = threading.Lock()
+        conn = self._connection()
+        # 複数のワーカーが同時に起動しても、合計サイズの初期値とトリガーの作成の間に書き込みが入らないようにする
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires_at REAL,
+                    accessed_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_entries_accessed_at ON cache_entries (accessed_at)")
+            # 合計サイズを1行のテーブルに保持し、追加・更新・削除のたびにトリガーで加減する（書き込みごとの全件集計を避ける）
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache_meta (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    total_size INTEGER NOT NULL
+                )
+            """)
+            conn.execute(
+                "INSERT OR IGNORE INTO cache_meta (id, total_size) SELECT 0, COALESCE(SUM(size), 0) FROM cache_entries"
+            )
+            conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS cache_entries_size_insert AFTER INSERT ON cache_entries BEGIN
+                    UPDATE cache_meta SET total_size = total_size + NEW.size WHERE id = 0;
+                END
+            """)
+            conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS cache_entries_size_update AFTER UPDATE OF size ON cache_entries BEGIN
+                    UPDATE cache_meta SET total_size = total_size + NEW.size - OLD.size WHERE id = 0;
+                END
+            """)
+            conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS cache_entries_size_delete AFTER DELETE ON cache_entries BEGIN
+                    UPDATE cache_meta SET total_size = total_size - OLD.size WHERE id = 0;
+                END
+            """)
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3の接続はスレッド間で共有できないため、スレッドごとに接続を持つ
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, attr: str):
+        with self._stats_lock:
+            setattr(self, attr, getattr(self, attr) + 1)
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        now = time.time()
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT value, expires_at, accessed_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                (namespace, key)
+            ).fetchone()
+            if row is None or (row[1] is not None and row[1] < now):
+                if row is not None:
+                    conn.execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (namespace, key))
+                self._count("_misses")
+                return None
+            if now - row[2] > SQLITE_TOUCH_INTERVAL_SECONDS:
+                conn.execute(
+                    "UPDATE cache_entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                    (now, namespace, key)
+                )
+            self._count("_hits")
+            return json.loads(row[0])
+        except sqlite3.Error as e:
+            logger.warning(f"共有キャッシュの読み取りに失敗しました: {str(e)}")
+            return None
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        payload = json.dumps(value, ensure_ascii=False)
+        size = len(payload.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        try:
+            conn = self._connection()
+            # INSERT OR REPLACEの置き換えでは削除のトリガーが実行されないため、既存の行は更新する
+            conn.execute(
+                "INSERT INTO cache_entries (namespace, key, value, size, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (namespace, key) DO UPDATE SET "
+                "value = excluded.value, size = excluded.size, expires_at = excluded.expires_at, accessed_at = excluded.accessed_at",
+                (namespace, key, payload, size, now + ttl if ttl else None, now)
+            )
+            self._evict(conn, now)
+        except sqlite3.Error as e:
+            logger.warning(f"共有キャッシュへの書き込みに失敗しました: {str(e)}")
+
+    @staticmethod
+    def _total_size(conn: sqlite3.Connection) -> int:
+        return conn.execute("SELECT total_size FROM cache_meta WHERE id = 0").fetchone()[0]
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        # 上限以内であれば何もしない（期限切れの行は読み取り時、または上限を超えた時にまとめて削除する）
+        if self._total_size(conn) <= self.max_bytes:
+            return
+        conn.execute("DELETE FROM cache_entries WHERE expires_at IS NOT NULL AND expires_at < ?", (now,))
+        total = self._total_size(conn)
+        while total > self.max_bytes:
+            # 最終アクセスが古いものから削除する（LRU）
+            rows = conn.execute(
+                "SELECT namespace, key, size FROM cache_entries ORDER BY accessed_at ASC LIMIT 32"
+            ).fetchall()
+            if not rows:
+                break
+            for namespace, key, size in rows:
+                conn.execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (namespace, key))
+                total -= size
+                self._count("_evictions")
+                if total <= self.max_bytes:
+                    break
+
+    def delete(self, namespace: str, key: str):
+        try:
+            self._connection().execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (namespace, key)
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"共有キャッシュの削除に失敗しました: {str(e)}")
+
+    def clear(self):
+        self._connection().execute("DELETE FROM cache_entries")
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._connection()
+        entries = conn.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+        size = self._total_size(conn)
+        with self._stats_lock:
+            return {
+                "backend": "sqlite",
+                "path": self.path,
+                "entries": entries,
+                "size_bytes": size,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+            }
+
+
+def create_cache(backend: str = CACHE_BACKEND) -> CacheBackend:
+    """
+    概要: 設定に応じてキャッシュバックエンドを生成する
+    用途: CACHE_BACKEND=sqliteの場合はホスト共有キャッシュ、それ以外はプロセス内キャッシュを使用
+    """
+    if backend == "sqlite":
+        try:
+            return SQLiteCache()
+        except sqlite3.Error as e:
+            logger.warning(f"共有キャッシュを初期化できないためプロセス内キャッシュを使用します: {str(e)}")
+    return InMemoryCache()
+
+
+# プロセス共通のキャッシュ
+cache = create_cache()
@@ -0,0 +1,314 @@
+import os
+import sys
+import uuid
+import socket
+import argparse
+import threading
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+from zoneinfo import ZoneInfo
+from dotenv import load_dotenv
+from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+from database.db_models import create_tables
+from database.ingestion_service import IngestionService
+from database.job_service import JobQueueService
+from .rate_limiter import scheduler, OutboundScheduler, UpstreamThrottled
+from .circuit_breaker import circuit_breakers, CircuitBreakerRegistry
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# 事前要約（プリウォーム）設定
+INGEST_SOURCES = os.getenv("INGEST_SOURCES", "")  # カンマ区切りのチャンネルID・プレイリストID
+INGEST_INTERVAL_SECONDS = int(os.getenv("INGEST_INTERVAL_SECONDS", "3600"))
+INGEST_OFF_PEAK_HOURS = os.getenv("INGEST_OFF_PEAK_HOURS", "1-6")  # 例: "1-6,13"
+INGEST_TIMEZONE = os.getenv("INGEST_TIMEZONE", "Asia/Tokyo")
+INGEST_MAX_PAGES = int(os.getenv("INGEST_MAX_PAGES", "4"))
+INGEST_QUOTA_RESERVE_UNITS = float(os.getenv("INGEST_QUOTA_RESERVE_UNITS", "50"))  # 対話的リクエスト用に残すクォータ
+INGEST_LEASE_NAME = "ingestion"  # 定期取り込みを担当するプロセスを決めるリース名（全ワーカーで1プロセスのみ実行する）
+INGEST_JOB_PRIORITY = -10  # 対話的な要約リクエストより後に処理する
+INGEST_MAX_WAIT_SECONDS = 2.0  # バックグラウンド処理なので枠が空かなければすぐに中断する
+
+YOUTUBE_PAGE_SIZE = 50  # channels.list / playlistItems.listの1リクエストあたりの最大件数
+
+
+class IngestionStopped(Exception):
+    """クォータ残量の不足などで取り込みを途中で止める場合の例外"""
+
+
+def is_youtube_api_outage(exc):
+    '''YouTube Data APIの例外が障害（5xx・接続エラー）によるものか判定する（クォータ超過などの4xxは障害として扱わない）'''
+    if isinstance(exc, UpstreamThrottled):
+        return False
+    if isinstance(exc, HttpError):
+        return exc.resp.status >= 500
+    return True
+
+
+def parse_source(raw: str) -> Tuple[str, str]:
+    """
+    概要: 取り込み対象の文字列をIDと種別に分解する
+    用途: "channel:UC..." / "playlist:PL..." の明示指定、またはUCで始まるIDをチャンネルとして扱う
+    """
+    raw = raw.strip()
+    if ":" in raw:
+        source_type, source_id = raw.split(":", 1)
+        if source_type not in ("channel", "playlist"):
+            raise ValueError(f"未対応の取り込み対象種別です: {source_type}")
+        return source_id, source_type
+    return raw, "channel" if raw.startswith("UC") else "playlist"
+
+
+def parse_hours(spec: str) -> Set[int]:
+    """ "1-6,13" のような時間帯指定を時刻の集合に変換する（終了時刻を含む）"""
+    hours = set()
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        if "-" in part:
+            start, end = (int(v) for v in part.split("-", 1))
+            hour = start
+            while True:
+                hours.add(hour % 24)
+                if hour % 24 == end % 24:
+                    break
+                hour += 1
+        else:
+            hours.add(int(part) % 24)
+    return hours
+
+
+def is_off_peak(now: Optional[datetime] = None) -> bool:
+    """現在がオフピーク時間帯かどうかを判定する"""
+    now = now or datetime.now(ZoneInfo(INGEST_TIMEZONE))
+    return now.hour in parse_hours(INGEST_OFF_PEAK_HOURS)
+
+
+def parse_published_at(value: Optional[str]) -> Optional[datetime]:
+    """YouTube APIのRFC3339日時をUTCのnaive datetimeに変換する（DBの他の日時列と揃える）"""
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).astimezone(ZoneInfo("UTC")).replace(tzinfo=None)
+
+
+class ChannelIngester:
+    """
+    概要: チャンネル・プレイリストの新着動画を走査して要約ジョブを登録する
+    用途: よく視聴されるチャンネルの動画を事前に要約し、実ユーザーのリクエストをキャッシュヒットにする
+    """
+
+    def __init__(self, api_key: Optional[str] = None, dry_run: bool = False, max_pages: int = INGEST_MAX_PAGES,
+                 youtube: Any = None):
+        self.dry_run = dry_run
+        self.max_pages = max_pages
+        self.youtube = youtube or build('youtube', 'v3', developerKey=api_key or os.getenv('YouTube_API_KEY'))
+        self.limiter = scheduler.get(OutboundScheduler.YOUTUBE_DATA_API)
+        self.breaker = circuit_breakers.get(CircuitBreakerRegistry.YOUTUBE_DATA_API)
+
+    def _execute(self, request, run_id: Optional[int] = None) -> Dict[str, Any]:
+        """
+        概要: クォータを確認したうえでYouTube Data APIを1回呼び出す（1リクエスト=1ユニット）
+        用途: 対話的リクエストと同じサーキットブレーカーを通し、障害の検知中は取り込みを中断する
+        """
+        if self.limiter.available("quota_units") < INGEST_QUOTA_RESERVE_UNITS + 1:
+            raise IngestionStopped("対話的リクエスト用のクォータを残すため取り込みを中断しました")
+        try:
+            response = self.breaker.call(
+                lambda: self.limiter.call(request.execute, costs={"quota_units": 1}, max_wait=INGEST_MAX_WAIT_SECONDS),
+                is_failure=is_youtube_api_outage
+            )
+        except UpstreamThrottled as ut:
+            # サーキットブレーカーの遮断（CircuitOpen）もここで中断する
+            raise IngestionStopped(str(ut))
+        if run_id is not None:
+            IngestionService.record_progress(run_id, quota_units_used=1)
+        return response
+
+    def resolve_uploads_playlists(self, channel_ids: List[str], run_ids: Optional[Dict[str, int]] = None) -> Dict[str, str]:
+        """
+        概要: チャンネルIDからアップロード動画プレイリストIDを取得する
+        用途: channels.listに最大50件ずつまとめて問い合わせ、クォータ消費を抑える。
+              消費したクォータは、run_ids（チャンネルID → 実行ID）があればまとめた先頭のチャンネルの実行に記録する
+        """
+        uploads = {}
+        for i in range(0, len(channel_ids), YOUTUBE_PAGE_SIZE):
+            batch = channel_ids[i:i + YOUTUBE_PAGE_SIZE]
+            response = self._execute(self.youtube.channels().list(
+                part="contentDetails", id=",".join(batch), maxResults=YOUTUBE_PAGE_SIZE
+            ), (run_ids or {}).get(batch[0]))
+            for item in response.get("items", []):
+                uploads[item["id"]] = item["contentDetails"]["relatedPlaylists"]["uploads"]
+        return uploads
+
+    def ingest(self, raw_sources: List[str]) -> List[Dict[str, Any]]:
+        """
+        概要: 複数の取り込み対象を順に処理する
+        用途: チャンネルのアップロードプレイリストを一括解決してから、対象ごとに新着動画を走査する
+        """
+        sources = [IngestionService.get_or_create_source(*parse_source(raw)) for raw in raw_sources if raw.strip()]
+        # プレイリストの解決で消費したクォータも記録できるよう、先に全対象の実行を開始する
+        run_ids = {s["source_id"]: IngestionService.start_run(s["source_id"], dry_run=self.dry_run) for s in sources}
+        unresolved = [s["source_id"] for s in sources if s["source_type"] == "channel" and not s["uploads_playlist_id"]]
+        if unresolved:
+            try:
+                resolved = self.resolve_uploads_playlists(unresolved, run_ids)
+            except IngestionStopped as e:
+                logger.warning(f"アップロードプレイリストの解決を中断しました: {str(e)}")
+                resolved = {}
+            for source in sources:
+                if source["source_id"] in resolved:
+                    source["uploads_playlist_id"] = resolved[source["source_id"]]
+                    IngestionService.update_source(source["source_id"], uploads_playlist_id=source["uploads_playlist_id"])
+        return [self.ingest_source(source, run_ids[source["source_id"]]) for source in sources]
+
+    def ingest_source(self, source: Dict[str, Any], run_id: Optional[int] = None) -> Dict[str, Any]:
+        """
+        概要: 1つの取り込み対象の新着動画を走査し、未処理の動画をジョブとして登録する
+        用途: チャンネルの場合は前回の最新公開日時より古い動画に到達した時点で走査を終了する。
+              run_idを省略した場合は新しい実行を開始する
+        """
+        source_id = source["source_id"]
+        if run_id is None:
+            run_id = IngestionService.start_run(source_id, dry_run=self.dry_run)
+        is_channel = source["source_type"] == "channel"
+        playlist_id = source["uploads_playlist_id"] if is_channel else source_id
+        watermark = source["last_published_at"] if is_channel else None
+        newest_published_at = watermark
+        unseen_video_ids: List[str] = []
+        status, error = "completed", None
+
+        try:
+            if not playlist_id:
+                raise IngestionStopped("アップロードプレイリストを解決できませんでした")
+            page_token = None
+            for _ in range(self.max_pages):
+                response = self._execute(self.youtube.playlistItems().list(
+                    part="contentDetails", playlistId=playlist_id, maxResults=YOUTUBE_PAGE_SIZE, pageToken=page_token
+                ), run_id)
+                items = response.get("items", [])
+                reached_watermark = False
+                page_video_ids = []
+                for item in items:
+                    details = item.get("contentDetails", {})
+                    published_at = parse_published_at(details.get("videoPublishedAt"))
+                    if published_at is None:
+                        # 非公開・削除済みの動画は公開日時を持たない
+                        continue
+                    if watermark and published_at <= watermark:
+                        reached_watermark = True
+                        continue
+                    page_video_ids.append(details["videoId"])
+                    if newest_published_at is None or published_at > newest_published_at:
+                        newest_published_at = published_at
+
+                page_unseen = IngestionService.filter_unseen_video_ids(page_video_ids)
+                if not self.dry_run:
+                    for video_id in page_unseen:
+                        JobQueueService.enqueue(video_id, priority=INGEST_JOB_PRIORITY)
+                unseen_video_ids.extend(page_unseen)
+                IngestionService.record_progress(
+                    run_id,
+                    pages_fetched=1,
+                    videos_seen=len(page_video_ids),
+                    videos_enqueued=0 if self.dry_run else len(page_unseen),
+                    videos_skipped=len(page_video_ids) - len(page_unseen),
+                )
+
+                page_token = response.get("nextPageToken")
+                if reached_watermark or not page_token:
+                    break
+        except IngestionStopped as e:
+            status, error = "stopped", str(e)
+            logger.warning(f"取り込みを中断しました: source_id={source_id}, {error}")
+        except Exception as e:
+            status, error = "failed", f"{type(e).__name__}: {str(e)}"
+            logger.exception(f"取り込み中にエラーが発生しました: source_id={source_id}")
+
+        if not self.dry_run:
+            fields = {"last_run_at": datetime.utcnow()}
+            # 途中で中断した場合は取りこぼしを避けるため最新公開日時を進めない
+            if status == "completed" and newest_published_at:
+                fields["last_published_at"] = newest_published_at
+            IngestionService.update_source(source_id, **fields)
+
+        run = IngestionService.finish_run(run_id, status, error) or {"run_id": run_id, "status": status, "error": error}
+        run["unseen_video_ids"] = unseen_video_ids
+        logger.info(
+            f"取り込み完了: source_id={source_id}, status={status}, dry_run={self.dry_run}, 未処理動画={len(unseen_video_ids)}件"
+        )
+        return run
+
+
+class IngestionScheduler:
+    """
+    概要: 定期的にオフピーク時間帯かを確認し、取り込みを実行するバックグラウンドスレッド
+    用途: INGEST_SOURCESが設定されている場合にアプリケーション起動時に開始する。全ワーカーで起動するが、
+          DBのリースを取得した1プロセスのみが取り込みを実行する（担当のプロセスが停止した場合は期限切れ後に引き継ぐ）
+    """
+
+    def __init__(self, sources: List[str], interval: int = INGEST_INTERVAL_SECONDS):
+        self.sources = sources
+        self.interval = interval
+        # 担当のプロセスは毎回延長するため、1回分の確認を逃しても引き継がれないよう間隔の2倍を期限とする
+        self.lease_seconds = interval * 2
+        self.holder = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if not self.sources or (self._thread and self._thread.is_alive()):
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="channel-ingester", daemon=True)
+        self._thread.start()
+        logger.info(f"事前要約スケジューラーを起動しました: sources={self.sources}, off_peak={INGEST_OFF_PEAK_HOURS}")
+
+    def stop(self, timeout: Optional[float] = 5.0):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+            IngestionService.release_lease(INGEST_LEASE_NAME, self.holder)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            if IngestionService.acquire_lease(INGEST_LEASE_NAME, self.holder, self.lease_seconds) and is_off_peak():
+                try:
+                    ChannelIngester().ingest(self.sources)
+                except Exception:
+                    logger.exception("事前要約の実行中にエラーが発生しました")
+            self._stop_event.wait(self.interval)
+
+
+def configured_sources() -> List[str]:
+    return [s for s in (v.strip() for v in INGEST_SOURCES.split(",")) if s]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="チャンネル・プレイリストの新着動画を事前要約ジョブとして登録する")
+    parser.add_argument("sources", nargs="*", help="チャンネルID・プレイリストID（channel:/playlist:で種別を明示可能）。省略時はINGEST_SOURCES")
+    parser.add_argument("--dry-run", action="store_true", help="ジョブを登録せず、未処理の動画IDだけを表示する")
+    parser.add_argument("--max-pages", type=int, default=INGEST_MAX_PAGES, help="対象ごとに取得する最大ページ数（1ページ50件）")
+    parser.add_argument("--off-peak-only", action="store_true", help="オフピーク時間帯以外は何もせず終了する")
+    args = parser.parse_args(argv)
+
+    sources = args.sources or configured_sources()
+    if not sources:
+        parser.error("取り込み対象が指定されていません")
+    if args.off_peak_only and not is_off_peak():
+        print("オフピーク時間帯ではないため終了します")
+        return 0
+
+    create_tables()
+    runs = ChannelIngester(dry_run=args.dry_run, max_pages=args.max_pages).ingest(sources)
+    for run in runs:
+        print(f"{run.get('source_id')}: status={run['status']}, 未処理動画={len(run['unseen_video_ids'])}件")
+        if args.dry_run:
+            for video_id in run["unseen_video_ids"]:
+                print(f"  {video_id}")
+    return 0 if all(run["status"] != "failed" for run in runs) else 1
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,208 @@
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+from .rate_limiter import UpstreamThrottled
+
+logger = logging.getLogger(__name__)
+
+# サーキットブレーカー設定（依存先ごとに CIRCUIT_<依存先名>_FAILURE_THRESHOLD などで上書き可能）
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))  # 連続失敗がこの回数に達したら遮断する
+CIRCUIT_RECOVERY_SECONDS = float(os.getenv("CIRCUIT_RECOVERY_SECONDS", "30"))  # 遮断してから試行を再開するまでの時間
+CIRCUIT_HALF_OPEN_MAX_CALLS = int(os.getenv("CIRCUIT_HALF_OPEN_MAX_CALLS", "1"))  # 半開状態で同時に通す試行の数
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+def _setting(name: str, key: str, default: float) -> float:
+    return float(os.getenv(f"CIRCUIT_{name.upper()}_{key}", default))
+
+
+class CircuitOpen(UpstreamThrottled):
+    """
+    概要: 依存先の障害を検知してサーキットブレーカーが呼び出しを遮断したことを示す例外
+    用途: UpstreamThrottledと同様に503とRetry-Afterに変換し、ジョブは遮断が解除される時刻以降に再試行する
+    """
+
+    def __init__(self, dependency: str, retry_after: float):
+        self.dependency = dependency
+        super().__init__(
+            dependency, retry_after,
+            f"{dependency}で障害を検知したため呼び出しを停止しています。{max(1.0, retry_after):.0f}秒後に再試行してください"
+        )
+
+
+def _always_failure(exc: Exception) -> bool:
+    return True
+
+
+class CircuitBreaker:
+    """
+    概要: 依存先1つ分のサーキットブレーカー（閉・開・半開の3状態）
+    用途: 連続失敗がしきい値に達したら一定時間は呼び出さずに即座に失敗させ（開）、経過後は少数の試行だけを通して（半開）、
+          成功すれば通常状態（閉）に戻す。障害中の依存先のタイムアウトを待つことでワーカーが埋まるのを防ぐ
+    """
+
+    def __init__(self, name: str, failure_threshold: Optional[int] = None, recovery_seconds: Optional[float] = None,
+                 half_open_max_calls: Optional[int] = None):
+        self.name = name
+        self.failure_threshold = int(failure_threshold or _setting(name, "FAILURE_THRESHOLD", CIRCUIT_FAILURE_THRESHOLD))
+        self.recovery_seconds = recovery_seconds or _setting(name, "RECOVERY_SECONDS", CIRCUIT_RECOVERY_SECONDS)
+        self.half_open_max_calls = int(half_open_max_calls or _setting(name, "HALF_OPEN_MAX_CALLS", CIRCUIT_HALF_OPEN_MAX_CALLS))
+        self._lock = threading.Lock()
+        self._state = STATE_CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self._last_error: Optional[str] = None
+        self._stats = {"calls": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    def _retry_after(self, now: float) -> float:
+        return max(0.0, self._opened_at + self.recovery_seconds - now)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == STATE_OPEN and self._retry_after(time.monotonic()) == 0:
+                return STATE_HALF_OPEN
+            return self._state
+
+    @property
+    def is_open(self) -> bool:
+        '''遮断中か（呼び出しても即座にCircuitOpenとなる状態か）。試行の枠は消費しない'''
+        return self.state == STATE_OPEN
+
+    def check(self):
+        '''遮断中であればCircuitOpenを送出する（複数回の呼び出しを行う処理の前に、試行の枠を消費せずに確認する）'''
+        with self._lock:
+            retry_after = self._retry_after(time.monotonic()) if self._state == STATE_OPEN else 0.0
+        if retry_after > 0:
+            raise CircuitOpen(self.name, retry_after)
+
+    def acquire(self) -> bool:
+        '''
+        概要: 呼び出しの可否を判定する
+        用途: 遮断中はCircuitOpenを送出する。半開状態の試行として通した場合はTrueを返す（結果は必ずrecord_*で記録する）
+        '''
+        now = time.monotonic()
+        with self._lock:
+            self._stats["calls"] += 1
+            if self._state == STATE_OPEN:
+                retry_after = self._retry_after(now)
+                if retry_after > 0:
+                    self._stats["rejected"] += 1
+                    raise CircuitOpen(self.name, retry_after)
+                self._state = STATE_HALF_OPEN
+                self._half_open_calls = 0
+            if self._state == STATE_HALF_OPEN:
+                if self._half_open_calls >= self.half_open_max_calls:
+                    self._stats["rejected"] += 1
+                    raise CircuitOpen(self.name, 1.0)
+                self._half_open_calls += 1
+                return True
+            return False
+
+    def record_success(self, probe: bool = False):
+        with self._lock:
+            self._consecutive_failures = 0
+            # 半開状態の試行が成功した場合のみ遮断を解除する（遮断前に開始した呼び出しの成功では解除しない）
+            if probe and self._state == STATE_HALF_OPEN:
+                self._state = STATE_CLOSED
+                self._half_open_calls = 0
+                logger.info(f"{self.name}: 試行が成功したため遮断を解除しました")
+
+    def record_failure(self, exc: Optional[Exception] = None, probe: bool = False):
+        with self._lock:
+            self._stats["failures"] += 1
+            self._consecutive_failures += 1
+            if exc is not None:
+                self._last_error = f"{type(exc).__name__}: {str(exc)[:200]}"
+            if (probe and self._state == STATE_HALF_OPEN) or (
+                self._state == STATE_CLOSED and self._consecutive_failures >= self.failure_threshold
+            ):
+                self._state = STATE_OPEN
+                self._opened_at = time.monotonic()
+                self._half_open_calls = 0
+                self._stats["opened"] += 1
+                logger.warning(
+                    f"{self.name}: 連続{self._consecutive_failures}回失敗したため{self.recovery_seconds:g}秒間呼び出しを遮断します"
+                    f"（{self._last_error}）"
+                )
+
+    @contextmanager
+    def guard(self, is_failure: Callable[[Exception], bool] = _always_failure):
+        '''
+        概要: ブロック内の処理を1回の呼び出しとして結果を記録する
+        用途: is_failureがFalseを返す例外（404やレート制限など依存先が応答した結果）は成功として扱い、例外はそのまま送出する
+        '''
+        probe = self.acquire()
+        try:
+            yield
+        except Exception as e:
+            if is_failure(e):
+                self.record_failure(e, probe)
+            else:
+                self.record_success(probe)
+            raise
+        except BaseException:
+            # 中断された試行は結果が不明なため、半開状態の枠だけを戻す
+            if probe:
+                with self._lock:
+                    self._half_open_calls = max(0, self._half_open_calls - 1)
+            raise
+        self.record_success(probe)
+
+    def call(self, func: Callable[[], Any], is_failure: Callable[[Exception], bool] = _always_failure) -> Any:
+        '''サーキットブレーカーを通して関数を実行する（遮断中はCircuitOpenを送出する）'''
+        with self.guard(is_failure):
+            return func()
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            state = self._state
+            retry_after = self._retry_after(now) if state == STATE_OPEN else 0.0
+            if state == STATE_OPEN and retry_after == 0:
+                state = STATE_HALF_OPEN
+            return {
+                "state": state,
+                "consecutive_failures": self._consecutive_failures,
+                "failure_threshold": self.failure_threshold,
+                "recovery_seconds": self.recovery_seconds,
+                "retry_after_remaining": round(retry_after, 2),
+                "last_error": self._last_error,
+                "stats": dict(self._stats),
+            }
+
+
+class CircuitBreakerRegistry:
+    """
+    概要: 依存先（YouTube Data API、文字起こし取得、OpenAI、GCS、データベース）ごとのサーキットブレーカー
+    用途: プロセス内の全リクエスト・ワーカーで依存先ごとの状態を共有し、ヘルスチェックで状態を返す
+    """
+
+    YOUTUBE_DATA_API = "youtube_data_api"
+    YOUTUBE_TRANSCRIPT = "youtube_transcript"
+    OPENAI = "openai"
+    GCS = "gcs"
+    DATABASE = "database"
+
+    def __init__(self):
+        self.breakers: Dict[str, CircuitBreaker] = {
+            name: CircuitBreaker(name)
+            for name in (self.YOUTUBE_DATA_API, self.YOUTUBE_TRANSCRIPT, self.OPENAI, self.GCS, self.DATABASE)
+        }
+
+    def get(self, name: str) -> CircuitBreaker:
+        return self.breakers[name]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {name: breaker.snapshot() for name, breaker in self.breakers.items()}
+
+
+# プロセス共通のサーキットブレーカー
+circuit_breakers = CircuitBreakerRegistry()
@@ -0,0 +1,98 @@
+import os
+import socket
+import threading
+import logging
+from typing import Any, Callable, Dict, List, Optional
+from database.job_service import JobQueueService, JOB_VISIBILITY_TIMEOUT_SECONDS
+from .rate_limiter import UpstreamThrottled
+
+logger = logging.getLogger(__name__)
+
+# ワーカープール設定
+JOB_WORKER_COUNT = int(os.getenv("JOB_WORKER_COUNT", "2"))
+JOB_POLL_INTERVAL_SECONDS = float(os.getenv("JOB_POLL_INTERVAL_SECONDS", "1.0"))
+JOB_RETRY_DELAY_SECONDS = float(os.getenv("JOB_RETRY_DELAY_SECONDS", "5"))
+
+
+class PermanentJobError(Exception):
+    """
+    概要: 再試行しても成功しないジョブのエラー
+    用途: 文字起こしが存在しない場合など、再キューイングせずに失敗として確定させる
+    """
+
+    def __init__(self, message: str, status_code: int = 400):
+        self.status_code = status_code
+        super().__init__(message)
+
+
+class SummaryWorkerPool:
+    """
+    概要: 永続ジョブキューからジョブを取得して処理するワーカープール
+    用途: 要約などの長時間処理をリクエストスレッドから切り離して実行する
+    """
+
+    def __init__(self, handler: Callable[[Dict[str, Any]], Dict[str, Any]],
+                 num_workers: int = JOB_WORKER_COUNT,
+                 poll_interval: float = JOB_POLL_INTERVAL_SECONDS,
+                 visibility_timeout: int = JOB_VISIBILITY_TIMEOUT_SECONDS):
+        self.handler = handler
+        self.num_workers = num_workers
+        self.poll_interval = poll_interval
+        self.visibility_timeout = visibility_timeout
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._worker_prefix = f"{socket.gethostname()}-{os.getpid()}"
+
+    @property
+    def is_running(self) -> bool:
+        return any(thread.is_alive() for thread in self._threads)
+
+    def start(self):
+        if self.is_running or self.num_workers <= 0:
+            return
+        self._stop_event.clear()
+        self._threads = [
+            threading.Thread(target=self._run, args=(f"{self._worker_prefix}-{i}",), name=f"summary-worker-{i}", daemon=True)
+            for i in range(self.num_workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"ジョブワーカーを起動しました: workers={self.num_workers}")
+
+    def stop(self, timeout: Optional[float] = 5.0):
+        self._stop_event.set()
+        self._wake_event.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        logger.info("ジョブワーカーを停止しました")
+
+    def notify(self):
+        """新しいジョブが登録されたことを通知し、ポーリング待機中のワーカーを起こす"""
+        self._wake_event.set()
+
+    def _run(self, worker_id: str):
+        while not self._stop_event.is_set():
+            job = JobQueueService.claim_next(worker_id, self.visibility_timeout)
+            if job is None:
+                self._wake_event.wait(self.poll_interval)
+                self._wake_event.clear()
+                continue
+            self._process(worker_id, job)
+
+    def _process(self, worker_id: str, job: Dict[str, Any]):
+        job_id = job["job_id"]
+        logger.info(f"ジョブ処理開始: job_id={job_id}, video_id={job['video_id']}, attempts={job['attempts']}, worker={worker_id}")
+        try:
+            result = self.handler(job)
+        except PermanentJobError as e:
+            JobQueueService.fail(job_id, worker_id, str(e), retryable=False, error_code=e.status_code)
+        except UpstreamThrottled as e:
+            JobQueueService.fail(job_id, worker_id, str(e), retry_delay=e.retry_after, error_code=503)
+        except Exception as e:
+            logger.exception(f"ジョブ処理中にエラーが発生しました: job_id={job_id}")
+            JobQueueService.fail(job_id, worker_id, f"{type(e).__name__}: {str(e)}", retry_delay=JOB_RETRY_DELAY_SECONDS)
+        else:
+            JobQueueService.complete(job_id, worker_id, result)
+            logger.info(f"ジョブ処理完了: job_id={job_id}")
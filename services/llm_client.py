@@ -0,0 +1,308 @@
+import os
+import time
+import asyncio
+import concurrent.futures
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional
+import openai
+from langchain_openai import ChatOpenAI
+from .rate_limiter import scheduler, openai_costs, OutboundScheduler, UpstreamThrottled, classify_rate_limit_error
+from .circuit_breaker import circuit_breakers, CircuitBreakerRegistry
+from .admission_control import admission_controller
+from .llm_usage import llm_usage
+
+logger = logging.getLogger(__name__)
+
+# LLM呼び出しの期限とヘッジ（投機的な重複リクエスト）の設定
+LLM_CALL_DEADLINE_SECONDS = float(os.getenv("LLM_CALL_DEADLINE_SECONDS", "90"))
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "true").lower() == "true"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_INITIAL_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_INITIAL_DELAY_SECONDS", "15"))
+LLM_HEDGE_MIN_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", "2"))
+LLM_HEDGE_MAX_RATIO = float(os.getenv("LLM_HEDGE_MAX_RATIO", "0.1"))
+LLM_HEDGE_BURST = float(os.getenv("LLM_HEDGE_BURST", "3"))
+LLM_LATENCY_WINDOW = int(os.getenv("LLM_LATENCY_WINDOW", "200"))
+LLM_LATENCY_MIN_SAMPLES = int(os.getenv("LLM_LATENCY_MIN_SAMPLES", "20"))
+
+
+class LLMTimeout(TimeoutError):
+    '''LLM呼び出しが期限内に完了しなかったことを表す例外'''
+
+    def __init__(self, kind: str, deadline: float):
+        self.kind = kind
+        self.deadline = deadline
+        super().__init__(f"LLM呼び出し（{kind}）が{deadline:g}秒以内に完了しませんでした")
+
+
+def is_llm_outage(exc: Exception) -> bool:
+    '''
+    概要: LLM呼び出しの例外がOpenAI側の障害（期限超過・接続エラー・5xx）によるものか判定する
+    用途: サーキットブレーカーの失敗として数える例外の判定。レート制限や不正なリクエスト（4xx）は障害として扱わない
+    '''
+    if isinstance(exc, UpstreamThrottled):
+        return False
+    if isinstance(exc, (LLMTimeout, openai.APIConnectionError)):
+        return True
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code >= 500
+    return False
+
+
+class LatencyTracker:
+    '''
+    概要: 直近の応答時間をスライディングウィンドウで保持し、パーセンタイルを返す
+    用途: ヘッジを送るまでの待ち時間を呼び出しの種類ごとの実測値から決める
+    '''
+
+    def __init__(self, window: int = LLM_LATENCY_WINDOW):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, latency: float):
+        with self._lock:
+            self._samples.append(latency)
+
+    def percentile(self, p: float) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < LLM_LATENCY_MIN_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+
+class _EventLoopThread:
+    '''
+    概要: LLM呼び出し専用のイベントループをバックグラウンドスレッドで動かす
+    用途: 同期コード（リクエストハンドラー・ジョブワーカー）から非同期呼び出しを行い、
+          ヘッジで不要になったリクエストを実際にキャンセル（HTTP接続を切断）できるようにする
+    '''
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="llm-event-loop", daemon=True).start()
+            return self._loop
+
+    def run(self, coro, timeout: float) -> Any:
+        future = asyncio.run_coroutine_threadsafe(coro, self._get_loop())
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+
+_event_loop = _EventLoopThread()
+
+
+class LLMClient:
+    '''
+    概要: 期限付き・ヘッジ付きのLLM呼び出しラッパー
+    用途: 要約・チャットの共通呼び出し口。レート制御の下で呼び出し、応答が遅い場合は
+          直近の応答時間のパーセンタイルを超えた時点で同じリクエストを重複送信し、先に返った方を採用する
+    '''
+
+    def __init__(self, model: str, temperature: float = 0, deadline: float = LLM_CALL_DEADLINE_SECONDS,
+                 hedge_enabled: bool = LLM_HEDGE_ENABLED):
+        # 429のリトライは共通スケジューラーのAIMD制御に任せるため、クライアント側のリトライは無効化
+        self.llm = ChatOpenAI(model=model, temperature=temperature, max_retries=0, timeout=deadline)
+        self.model = model
+        self.deadline = deadline
+        self.hedge_enabled = hedge_enabled
+        self.limiter = scheduler.get(OutboundScheduler.OPENAI)
+        self.breaker = circuit_breakers.get(CircuitBreakerRegistry.OPENAI)
+        self._lock = threading.Lock()
+        self._latency: Dict[str, LatencyTracker] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+        # ヘッジ率の上限：呼び出しごとにLLM_HEDGE_MAX_RATIO分のクレジットを貯め、ヘッジ1回で1消費する
+        self._hedge_credits = LLM_HEDGE_BURST
+
+    def _record(self, kind: str, key: str):
+        with self._lock:
+            stats = self._stats.setdefault(kind, {
+                "calls": 0, "hedged": 0, "hedge_wins": 0, "primary_wins": 0, "timeouts": 0,
+                "hedge_skipped_rate_cap": 0, "hedge_skipped_throttled": 0,
+            })
+            stats[key] += 1
+
+    def _tracker(self, kind: str) -> LatencyTracker:
+        with self._lock:
+            return self._latency.setdefault(kind, LatencyTracker())
+
+    def hedge_delay(self, kind: str) -> float:
+        '''ヘッジを送るまでの待ち時間（実測値が少ないうちは初期値を使用）'''
+        observed = self._tracker(kind).percentile(LLM_HEDGE_PERCENTILE)
+        if observed is None:
+            return LLM_HEDGE_INITIAL_DELAY_SECONDS
+        return max(LLM_HEDGE_MIN_DELAY_SECONDS, observed)
+
+    def _take_hedge_credit(self) -> bool:
+        with self._lock:
+            if self._hedge_credits >= 1:
+                self._hedge_credits -= 1
+                return True
+            return False
+
+    def _add_hedge_credit(self):
+        with self._lock:
+            self._hedge_credits = min(LLM_HEDGE_BURST, self._hedge_credits + LLM_HEDGE_MAX_RATIO)
+
+    async def _attempt(self, llm: Any, messages: List[Any], kind: str) -> Any:
+        started = time.perf_counter()
+        response = await llm.ainvoke(messages)
+        latency = time.perf_counter() - started
+        self._tracker(kind).add(latency)
+        llm_usage.record(kind, response, latency)
+        return response
+
+    async def _hedged_attempt(self, llm: Any, messages: List[Any], kind: str) -> Any:
+        '''ヘッジ用のリクエスト（レート制御の枠は呼び出し前に取得済み）。終了時に枠を返却する'''
+        try:
+            response = await self._attempt(llm, messages, kind)
+        except asyncio.CancelledError:
+            self.limiter.concurrency.release()
+            raise
+        except Exception as e:
+            throttled, retry_after = classify_rate_limit_error(e)
+            self.limiter.release(throttled=throttled, retry_after=retry_after)
+            raise
+        self.limiter.release()
+        return response
+
+    def _start_hedge(self, llm: Any, messages: List[Any], kind: str, costs: Dict[str, float]) -> Optional[asyncio.Future]:
+        '''ヘッジ率の上限とレート制御の枠を確認し、送れる場合のみヘッジを開始する'''
+        if not self._take_hedge_credit():
+            self._record(kind, "hedge_skipped_rate_cap")
+            return None
+        try:
+            # ヘッジもレート制御の対象とし、即座に枠を取得できない場合は送らない
+            self.limiter.acquire(costs, max_wait=0)
+        except UpstreamThrottled:
+            self._record(kind, "hedge_skipped_throttled")
+            return None
+        self._record(kind, "hedged")
+        return asyncio.ensure_future(self._hedged_attempt(llm, messages, kind))
+
+    async def _race(self, llm: Any, messages: List[Any], kind: str, costs: Dict[str, float], timeout: float,
+                    deadline: float) -> Any:
+        '''
+        概要: 一次リクエストを送り、ヘッジ待ち時間を超えたら重複リクエストを送って先に成功した方を返す
+        用途: 負けた方のリクエストはキャンセルする。両方失敗した場合は一次リクエストの例外を送出する。
+              timeoutは呼び出し全体の期限（deadline）までの残り時間
+        '''
+        loop = asyncio.get_running_loop()
+        expires_at = loop.time() + timeout
+        primary = asyncio.ensure_future(self._attempt(llm, messages, kind))
+        pending = {primary}
+        hedge = None
+        errors = {}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=min(self.hedge_delay(kind), timeout))
+            if not done and self.hedge_enabled and loop.time() < expires_at:
+                hedge = self._start_hedge(llm, messages, kind, costs)
+                if hedge is not None:
+                    pending.add(hedge)
+            while True:
+                for task in done:
+                    if task.exception() is None:
+                        if hedge is not None:
+                            self._record(kind, "hedge_wins" if task is hedge else "primary_wins")
+                        return task.result()
+                    errors[task] = task.exception()
+                if not pending:
+                    raise errors.get(primary) or next(iter(errors.values()))
+                remaining = expires_at - loop.time()
+                if remaining <= 0:
+                    self._record(kind, "timeouts")
+                    raise LLMTimeout(kind, deadline)
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def invoke(self, messages: List[Any], kind: str, deadline: Optional[float] = None,
+               response_format: Optional[Dict[str, Any]] = None, tools: Optional[List[Dict[str, Any]]] = None,
+               tool_choice: Optional[Any] = None) -> Any:
+        '''
+        概要: レート制御・期限・ヘッジを適用してLLMを呼び出す
+        用途: 期限を超えた場合はLLMTimeout、レート制限で実行できない場合はUpstreamThrottled、
+              OpenAIの障害で呼び出しを遮断中の場合はCircuitOpen（UpstreamThrottledの一種）を送出する。
+              response_formatを指定すると構造化出力（JSON Schema）を要求する。
+              tools・tool_choiceはプロンプトの先頭部分に含まれるため、共通プレフィックスを持つ呼び出しには同じtoolsを渡す
+        '''
+        deadline = deadline or self.deadline
+        options = {
+            key: value for key, value in
+            (("response_format", response_format), ("tools", tools), ("tool_choice", tool_choice))
+            if value is not None
+        }
+        llm = self.llm.bind(**options) if options else self.llm
+        costs = openai_costs(messages)
+        self._record(kind, "calls")
+        self._add_hedge_credit()
+        # 期限は429の再試行を含む呼び出し全体に適用する（再試行のたびに期限を延長しない）
+        expires_at = time.monotonic() + deadline
+
+        # 実行中の呼び出し数と、レート制御の枠を待った時間を流入制御に記録する
+        with admission_controller.track_llm_call() as started:
+            def run():
+                started()
+                remaining = expires_at - time.monotonic()
+                if remaining <= 0:
+                    self._record(kind, "timeouts")
+                    raise LLMTimeout(kind, deadline)
+                try:
+                    return _event_loop.run(self._race(llm, messages, kind, costs, remaining, deadline), timeout=remaining + 5)
+                except LLMTimeout:
+                    raise
+                except concurrent.futures.TimeoutError:
+                    # イベントループ側の期限判定より先にこちらが切れた場合
+                    self._record(kind, "timeouts")
+                    raise LLMTimeout(kind, deadline)
+
+            # 枠の待機・再試行前の待機も期限までの残り時間に収める（超える場合はUpstreamThrottled）
+            max_wait = min(self.limiter.max_wait, max(0.0, expires_at - time.monotonic()))
+            return self.breaker.call(lambda: self.limiter.call(run, costs=costs, max_wait=max_wait), is_failure=is_llm_outage)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {kind: dict(values) for kind, values in self._stats.items()}
+            credits = self._hedge_credits
+        for kind, values in stats.items():
+            tracker = self._tracker(kind)
+            values["latency_samples"] = len(tracker)
+            values["latency_p50"] = tracker.percentile(50)
+            values["latency_p99"] = tracker.percentile(99)
+            values["hedge_delay"] = round(self.hedge_delay(kind), 3)
+        return {"model": self.model, "deadline": self.deadline, "hedge_enabled": self.hedge_enabled,
+                "hedge_credits": round(credits, 2), "calls": stats}
+
+
+_clients: Dict[tuple, LLMClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_llm_client(model: str, temperature: float = 0) -> LLMClient:
+    '''モデルごとに共有のLLMClientを返す（応答時間の実測値とヘッジ率の上限をプロセス内で共有するため）'''
+    with _clients_lock:
+        key = (model, temperature)
+        if key not in _clients:
+            _clients[key] = LLMClient(model, temperature)
+        return _clients[key]
+
+
+def llm_clients_snapshot() -> List[Dict[str, Any]]:
+    with _clients_lock:
+        clients = list(_clients.values())
+    return [client.snapshot() for client in clients]
@@ -0,0 +1,76 @@
+import logging
+import threading
+from typing import Any, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def extract_token_usage(response: Any) -> Tuple[int, int, int]:
+    '''
+    概要: LLMの応答から入力トークン数・キャッシュ済み入力トークン数・出力トークン数を取り出す
+    用途: usage_metadataがない古い形式の応答ではresponse_metadataのtoken_usageを参照する
+    '''
+    usage = getattr(response, "usage_metadata", None) or {}
+    if usage:
+        details = usage.get("input_token_details") or {}
+        return usage.get("input_tokens", 0), details.get("cache_read", 0) or 0, usage.get("output_tokens", 0)
+    token_usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+    details = token_usage.get("prompt_tokens_details") or {}
+    return (
+        token_usage.get("prompt_tokens", 0),
+        details.get("cached_tokens", 0) or 0,
+        token_usage.get("completion_tokens", 0),
+    )
+
+
+class LLMUsageTracker:
+    '''
+    概要: LLM呼び出しの種類ごと（分析・要約・チャット）にトークン使用量と応答時間を集計する
+    用途: プロバイダ側のプロンプトキャッシュ（プレフィックスキャッシュ）のヒット率と、
+          ヒット時・非ヒット時の応答時間を比較してコストと遅延の削減効果を確認する
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def record(self, kind: str, response: Any, latency: float):
+        input_tokens, cached_tokens, output_tokens = extract_token_usage(response)
+        bucket = "hit" if cached_tokens else "miss"
+        with self._lock:
+            stats = self._stats.setdefault(kind, {
+                "calls": 0, "input_tokens": 0, "cached_tokens": 0, "output_tokens": 0,
+                "cache_hit_calls": 0, "hit_latency_total": 0.0, "miss_latency_total": 0.0,
+            })
+            stats["calls"] += 1
+            stats["input_tokens"] += input_tokens
+            stats["cached_tokens"] += cached_tokens
+            stats["output_tokens"] += output_tokens
+            stats["cache_hit_calls"] += 1 if cached_tokens else 0
+            stats[f"{bucket}_latency_total"] += latency
+        logger.info(
+            f"LLM呼び出し: kind={kind}, input_tokens={input_tokens}, cached_tokens={cached_tokens}, "
+            f"output_tokens={output_tokens}, latency={latency:.2f}s"
+        )
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            result = {}
+            for kind, stats in self._stats.items():
+                hits = stats["cache_hit_calls"]
+                misses = stats["calls"] - hits
+                result[kind] = {
+                    "calls": stats["calls"],
+                    "input_tokens": stats["input_tokens"],
+                    "cached_tokens": stats["cached_tokens"],
+                    "output_tokens": stats["output_tokens"],
+                    "cached_token_ratio": round(stats["cached_tokens"] / stats["input_tokens"], 4) if stats["input_tokens"] else 0.0,
+                    "cache_hit_calls": hits,
+                    "avg_latency_cache_hit": round(stats["hit_latency_total"] / hits, 3) if hits else None,
+                    "avg_latency_cache_miss": round(stats["miss_latency_total"] / misses, 3) if misses else None,
+                }
+            return result
+
+
+# プロセス共通のLLM使用量トラッカー
+llm_usage = LLMUsageTracker()
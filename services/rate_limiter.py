@@ -0,0 +1,363 @@
+import os
+import random
+import threading
+import time
+import logging
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+from .token_counter import count_message_tokens
+
+logger = logging.getLogger(__name__)
+
+# 上流ごとのレート制限設定（環境変数で上書き可能）
+YOUTUBE_QUOTA_UNITS_PER_DAY = float(os.getenv("YOUTUBE_QUOTA_UNITS_PER_DAY", "10000"))
+YOUTUBE_QUOTA_BURST = float(os.getenv("YOUTUBE_QUOTA_BURST", "100"))
+TRANSCRIPT_REQUESTS_PER_MINUTE = float(os.getenv("TRANSCRIPT_REQUESTS_PER_MINUTE", "60"))
+OPENAI_REQUESTS_PER_MINUTE = float(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "500"))
+OPENAI_TOKENS_PER_MINUTE = float(os.getenv("OPENAI_TOKENS_PER_MINUTE", "200000"))
+OPENAI_EXPECTED_COMPLETION_TOKENS = int(os.getenv("OPENAI_EXPECTED_COMPLETION_TOKENS", "1000"))
+
+# AIMD同時実行数・待機・リトライ設定
+RATE_LIMIT_MAX_WAIT_SECONDS = float(os.getenv("RATE_LIMIT_MAX_WAIT_SECONDS", "10"))
+RATE_LIMIT_MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "3"))
+RATE_LIMIT_BACKOFF_BASE_SECONDS = float(os.getenv("RATE_LIMIT_BACKOFF_BASE_SECONDS", "0.5"))
+RATE_LIMIT_BACKOFF_MAX_SECONDS = float(os.getenv("RATE_LIMIT_BACKOFF_MAX_SECONDS", "8"))
+
+
+class UpstreamThrottled(Exception):
+    """
+    概要: 上流APIのレート制限により処理できなかったことを示す例外
+    用途: 待機上限を超えた場合やリトライを使い切った場合に送出し、503とRetry-Afterに変換する
+    """
+
+    def __init__(self, upstream: str, retry_after: float, message: str = ""):
+        self.upstream = upstream
+        self.retry_after = max(1.0, retry_after)
+        super().__init__(message or f"{upstream}のレート制限に達しました。{self.retry_after:.0f}秒後に再試行してください")
+
+
+class TokenBucket:
+    """
+    概要: スレッドセーフなトークンバケット
+    用途: 単位時間あたりのリクエスト数・トークン数・クォータを平準化する
+    """
+
+    def __init__(self, rate_per_second: float, capacity: float):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    def try_acquire(self, cost: float) -> float:
+        """
+        概要: トークンの取得を試みる
+        用途: 取得できた場合は0を、できない場合は必要な待機秒数を返す
+        """
+        # バケット容量を超えるコストは容量分として扱う（永久に待たないため）
+        cost = min(cost, self.capacity)
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= cost:
+                self._tokens -= cost
+                return 0.0
+            return (cost - self._tokens) / self.rate if self.rate > 0 else float("inf")
+
+    def refund(self, cost: float):
+        """他のバケットで取得に失敗した場合に消費済みトークンを戻す"""
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + min(cost, self.capacity))
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                "available": round(self._tokens, 2),
+                "capacity": self.capacity,
+                "rate_per_second": round(self.rate, 4),
+            }
+
+
+class AIMDConcurrencyLimiter:
+    """
+    概要: AIMD（加算増加・乗算減少）方式の同時実行数リミッター
+    用途: 成功時は同時実行数を徐々に増やし、429を受けたら半減させる
+    """
+
+    def __init__(self, initial: int, minimum: int = 1, maximum: int = 32, decrease_factor: float = 0.5):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease_factor = decrease_factor
+        self._limit = float(max(minimum, min(initial, maximum)))
+        self._in_flight = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while self._in_flight >= int(self._limit):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            self._in_flight += 1
+            return True
+
+    def release(self):
+        with self._condition:
+            self._in_flight = max(0, self._in_flight - 1)
+            self._condition.notify()
+
+    def on_success(self):
+        with self._condition:
+            # 1ウィンドウ（limit回の成功）でおよそ1増える
+            self._limit = min(self.maximum, self._limit + 1.0 / self._limit)
+            self._condition.notify()
+
+    def on_throttled(self):
+        with self._condition:
+            self._limit = max(self.minimum, self._limit * self.decrease_factor)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                "limit": round(self._limit, 2),
+                "in_flight": self._in_flight,
+                "minimum": self.minimum,
+                "maximum": self.maximum,
+            }
+
+
+def parse_retry_after(value: Any) -> Optional[float]:
+    """Retry-Afterヘッダー（秒数のみ対応）を秒数に変換する"""
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_rate_limit_error(exc: Exception) -> Tuple[bool, Optional[float]]:
+    """
+    概要: 例外がレート制限（429）由来かどうかを判定する
+    用途: googleapiclientのHttpError、openaiのRateLimitError、youtube_transcript_apiのTooManyRequestsに対応する
+    """
+    if type(exc).__name__ in ("TooManyRequests", "RateLimitError"):
+        status = 429
+    else:
+        status = None
+
+    headers = None
+    # googleapiclient.errors.HttpError: e.resp.status / e.resp（dict互換）
+    resp = getattr(exc, "resp", None)
+    if resp is not None:
+        status = status or getattr(resp, "status", None)
+        headers = resp
+    # openai.APIStatusError: e.status_code / e.response.headers
+    response = getattr(exc, "response", None)
+    if response is not None and hasattr(response, "headers"):
+        status = status or getattr(response, "status_code", None)
+        headers = response.headers
+    status = status or getattr(exc, "status_code", None)
+
+    try:
+        is_rate_limited = int(status) == 429
+    except (TypeError, ValueError):
+        is_rate_limited = False
+
+    retry_after = None
+    if is_rate_limited and headers is not None:
+        try:
+            retry_after = parse_retry_after(headers.get("retry-after") or headers.get("Retry-After"))
+        except Exception:
+            retry_after = None
+    return is_rate_limited, retry_after
+
+
+class UpstreamLimiter:
+    """
+    概要: 上流API1つ分のレート制御
+    用途: トークンバケット・AIMD同時実行数・ジッター付きリトライをまとめて適用する
+    """
+
+    def __init__(self, name: str, buckets: Dict[str, TokenBucket], concurrency: AIMDConcurrencyLimiter,
+                 max_wait: float = RATE_LIMIT_MAX_WAIT_SECONDS, max_retries: int = RATE_LIMIT_MAX_RETRIES):
+        self.name = name
+        self.buckets = buckets
+        self.concurrency = concurrency
+        self.max_wait = max_wait
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "throttled_429": 0, "retries": 0, "rejected": 0, "queued_seconds": 0.0}
+        self._throttled_until = 0.0
+
+    def _record(self, key: str, value: float = 1):
+        with self._lock:
+            self._stats[key] += value
+
+    def _acquire_tokens(self, costs: Dict[str, float], deadline: float):
+        while True:
+            wait = max(0.0, self._throttled_until - time.monotonic())
+            acquired = []
+            if wait == 0.0:
+                for dimension, cost in costs.items():
+                    bucket = self.buckets.get(dimension)
+                    if bucket is None or cost <= 0:
+                        continue
+                    needed = bucket.try_acquire(cost)
+                    if needed > 0:
+                        wait = needed
+                        break
+                    acquired.append((bucket, cost))
+            if wait == 0.0:
+                return
+            # 一部のバケットだけ取得した状態で待たないように返却する
+            for bucket, cost in acquired:
+                bucket.refund(cost)
+            remaining = deadline - time.monotonic()
+            if wait > remaining:
+                self._record("rejected")
+                raise UpstreamThrottled(self.name, wait)
+            time.sleep(min(wait, 1.0))
+
+    def acquire(self, costs: Dict[str, float], max_wait: Optional[float] = None):
+        """
+        概要: トークンと同時実行枠を取得する（短時間キューイング）
+        用途: 待機上限を超える場合はUpstreamThrottledを送出する
+        """
+        started = time.monotonic()
+        deadline = started + (self.max_wait if max_wait is None else max_wait)
+        self._acquire_tokens(costs, deadline)
+        if not self.concurrency.acquire(max(0.0, deadline - time.monotonic())):
+            self._record("rejected")
+            raise UpstreamThrottled(self.name, 1.0)
+        self._record("queued_seconds", time.monotonic() - started)
+
+    def release(self, throttled: bool = False, retry_after: Optional[float] = None):
+        if throttled:
+            self.on_throttled(retry_after)
+        else:
+            self.concurrency.on_success()
+        self.concurrency.release()
+
+    def on_throttled(self, retry_after: Optional[float] = None):
+        """上流から429を受けた場合に同時実行数を半減し、Retry-Afterの間は新規送信を止める"""
+        self._record("throttled_429")
+        self.concurrency.on_throttled()
+        if retry_after:
+            with self._lock:
+                self._throttled_until = max(self._throttled_until, time.monotonic() + retry_after)
+
+    def backoff_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """フルジッター付き指数バックオフ。Retry-Afterがあればそれ以上待つ"""
+        delay = random.uniform(0, min(RATE_LIMIT_BACKOFF_MAX_SECONDS, RATE_LIMIT_BACKOFF_BASE_SECONDS * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def call(self, func: Callable[[], Any], costs: Optional[Dict[str, float]] = None,
+             max_wait: Optional[float] = None) -> Any:
+        """
+        概要: レート制御下で関数を実行する
+        用途: 429を受けた場合はRetry-Afterを尊重したジッター付きバックオフで再試行する。max_waitは枠の待機と再試行前の待機の
+              合計の上限で、Retry-Afterまで待つと上限を超える場合は待たずにUpstreamThrottledを送出する
+        """
+        costs = costs or {"requests": 1}
+        self._record("calls")
+        deadline = time.monotonic() + (self.max_wait if max_wait is None else max_wait)
+        attempt = 0
+        while True:
+            self.acquire(costs, max(0.0, deadline - time.monotonic()))
+            try:
+                result = func()
+            except Exception as e:
+                is_rate_limited, retry_after = classify_rate_limit_error(e)
+                self.release(throttled=is_rate_limited, retry_after=retry_after)
+                if not is_rate_limited:
+                    raise
+                if attempt >= self.max_retries:
+                    raise UpstreamThrottled(self.name, retry_after or self.backoff_delay(attempt)) from e
+                delay = self.backoff_delay(attempt, retry_after)
+                if delay > deadline - time.monotonic():
+                    self._record("rejected")
+                    raise UpstreamThrottled(self.name, retry_after or delay) from e
+                # Retry-Afterの残りは次のacquireで待つ（on_throttledで新規送信を止めているため、早く再試行しても送信されない）
+                delay = min(delay, RATE_LIMIT_BACKOFF_MAX_SECONDS)
+                logger.warning(f"{self.name}: レート制限を検知しました。{delay:.2f}秒後に再試行します (attempt={attempt + 1})")
+                self._record("retries")
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self.release()
+            return result
+
+    def available(self, dimension: str) -> float:
+        """指定したバケットの現在の残量を返す（バックグラウンド処理が対話的リクエスト用の枠を残すために使用）"""
+        bucket = self.buckets.get(dimension)
+        return bucket.snapshot()["available"] if bucket else float("inf")
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            throttled_for = max(0.0, self._throttled_until - time.monotonic())
+        stats["queued_seconds"] = round(stats["queued_seconds"], 3)
+        return {
+            "throttled": throttled_for > 0 or any(b.snapshot()["available"] < 1 for b in self.buckets.values()),
+            "retry_after_remaining": round(throttled_for, 2),
+            "buckets": {name: bucket.snapshot() for name, bucket in self.buckets.items()},
+            "concurrency": self.concurrency.snapshot(),
+            "stats": stats,
+        }
+
+
+class OutboundScheduler:
+    """
+    概要: 上流API（YouTube Data API、文字起こし取得、OpenAI）共通のレート制御スケジューラー
+    用途: プロセス内の全リクエストで上流ごとのリミッターを共有する
+    """
+
+    YOUTUBE_DATA_API = "youtube_data_api"
+    YOUTUBE_TRANSCRIPT = "youtube_transcript"
+    OPENAI = "openai"
+
+    def __init__(self):
+        self.limiters: Dict[str, UpstreamLimiter] = {
+            self.YOUTUBE_DATA_API: UpstreamLimiter(
+                self.YOUTUBE_DATA_API,
+                {"quota_units": TokenBucket(YOUTUBE_QUOTA_UNITS_PER_DAY / 86400.0, YOUTUBE_QUOTA_BURST)},
+                AIMDConcurrencyLimiter(initial=4, maximum=int(os.getenv("YOUTUBE_MAX_CONCURRENCY", "8"))),
+            ),
+            self.YOUTUBE_TRANSCRIPT: UpstreamLimiter(
+                self.YOUTUBE_TRANSCRIPT,
+                {"requests": TokenBucket(TRANSCRIPT_REQUESTS_PER_MINUTE / 60.0, max(1.0, TRANSCRIPT_REQUESTS_PER_MINUTE / 6))},
+                AIMDConcurrencyLimiter(initial=4, maximum=int(os.getenv("TRANSCRIPT_MAX_CONCURRENCY", "8"))),
+            ),
+            self.OPENAI: UpstreamLimiter(
+                self.OPENAI,
+                {
+                    "requests": TokenBucket(OPENAI_REQUESTS_PER_MINUTE / 60.0, max(1.0, OPENAI_REQUESTS_PER_MINUTE / 6)),
+                    "tokens": TokenBucket(OPENAI_TOKENS_PER_MINUTE / 60.0, max(1.0, OPENAI_TOKENS_PER_MINUTE / 6)),
+                },
+                AIMDConcurrencyLimiter(initial=8, maximum=int(os.getenv("OPENAI_MAX_CONCURRENCY", "32"))),
+            ),
+        }
+
+    def get(self, name: str) -> UpstreamLimiter:
+        return self.limiters[name]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {name: limiter.snapshot() for name, limiter in self.limiters.items()}
+
+
+def openai_costs(messages: Iterable[Any]) -> Dict[str, float]:
+    """OpenAI呼び出し1回分のコスト（リクエスト数と入出力トークン数の見積もり）を返す"""
+    return {"requests": 1, "tokens": count_message_tokens(messages) + OPENAI_EXPECTED_COMPLETION_TOKENS}
+
+
+# プロセス共通のスケジューラー
+scheduler = OutboundScheduler()
@@ -0,0 +1,568 @@
+import os
+import re
+import json
+import math
+import time
+import uuid
+import shutil
+import logging
+import threading
+from array import array
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+from scipy import sparse
+from database.db_service import DatabaseService
+from .text_tokenizer import tokenize
+
+try:
+    import fcntl
+except ImportError:  # Windows（ローカル開発）ではワーカーを1プロセスで動かすため、プロセス間のロックは行わない
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# 関連動画インデックス設定
+RELATED_INDEX_ENABLED = os.getenv("RELATED_INDEX_ENABLED", "true").lower() == "true"
+RELATED_INDEX_PATH = os.getenv("RELATED_INDEX_PATH", "/tmp/youtube_content_processor_related_index")
+RELATED_REFRESH_INTERVAL_SECONDS = float(os.getenv("RELATED_REFRESH_INTERVAL_SECONDS", "60"))
+RELATED_MERGE_THRESHOLD = int(os.getenv("RELATED_MERGE_THRESHOLD", "200"))  # 未統合の要約がこの件数に達したら再構築する
+RELATED_MERGE_INTERVAL_SECONDS = float(os.getenv("RELATED_MERGE_INTERVAL_SECONDS", "600"))
+RELATED_BATCH_WINDOW_SECONDS = float(os.getenv("RELATED_BATCH_WINDOW_MS", "5")) / 1000
+RELATED_MIN_SCORE = float(os.getenv("RELATED_MIN_SCORE", "0.05"))
+
+# 項目ごとの重み（キーワード・トピックの一致を概要の一致より重視する）
+FIELD_WEIGHTS = {
+    "keywords": 2.0,
+    "main_topics": 2.0,
+    "sub_title": 1.5,
+    "overview": 1.0,
+}
+
+CURRENT_FILE = "CURRENT"
+LOCK_FILE = ".lock"
+# バージョンのディレクトリ名（作成時刻のナノ秒-プロセスID）。名前の順が作成順になる
+VERSION_PATTERN = re.compile(r"^\d{20}-\d+$")
+ARRAY_NAMES = ("rows_data", "rows_indices", "rows_indptr", "postings_data", "postings_indices", "postings_indptr", "idf")
+
+
+class RelatedIndexNotReady(Exception):
+    """関連動画インデックスの読み込み・初回作成が完了していないことを表す例外"""
+
+
+def summary_term_weights(summary: Any) -> Dict[str, float]:
+    '''
+    概要: 要約から語と重み（項目の重みを掛けた出現回数の対数）を計算する
+    用途: サブタイトル・概要・キーワード・主要トピックを対象とする。辞書・属性のどちらの形式の要約も受け付ける
+    '''
+    counts: Dict[str, float] = {}
+    for field, field_weight in FIELD_WEIGHTS.items():
+        value = summary.get(field) if isinstance(summary, dict) else getattr(summary, field, None)
+        text = " ".join(str(item) for item in value if item) if isinstance(value, list) else (value or "")
+        for term in tokenize(text):
+            counts[term] = counts.get(term, 0.0) + field_weight
+    return {term: 1 + math.log(count) for term, count in counts.items()}
+
+
+def _normalize_rows(matrix: sparse.csr_matrix) -> sparse.csr_matrix:
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.csr_matrix(sparse.diags(1 / norms) @ matrix)
+
+
+def _index_dtype(nnz: int):
+    return np.int32 if nnz < 2 ** 31 else np.int64
+
+
+def _read_current(path: str) -> Optional[str]:
+    try:
+        with open(os.path.join(path, CURRENT_FILE), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+@contextmanager
+def _index_lock(path: str, blocking: bool = True) -> Iterator[bool]:
+    '''
+    概要: インデックスの作成・統合・保存を行うプロセスを1つに限定するファイルロック（取得できたかを返す）
+    用途: 同じRELATED_INDEX_PATHを共有する複数のuvicornワーカーが同時にDBから作成したり、保存し合ったりしないようにする
+    '''
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, LOCK_FILE), "a") as lock_file:
+        if fcntl is None:
+            yield True
+            return
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _is_older_version(name: str, reference: str) -> bool:
+    '''nameがreferenceより前に保存されたバージョンのディレクトリか（以前の形式の名前のディレクトリも古いものとして扱う）'''
+    if name == reference or name.startswith(".") or name.startswith(CURRENT_FILE):
+        return False
+    if not VERSION_PATTERN.match(name):
+        return True
+    return VERSION_PATTERN.match(reference) is not None and name < reference
+
+
+class _Snapshot:
+    '''
+    概要: 確定済みのインデックス（不変）
+    用途: rowsは動画ごとの語の重み（IDF適用前）、postingsはIDFを掛けて正規化した行列の転置（語×動画）。
+          postingsとの積で、クエリの語を含む動画だけを走査してコサイン類似度を求める
+    '''
+
+    def __init__(self, terms: List[str], video_ids: List[str], rows: sparse.csr_matrix,
+                 postings: sparse.csr_matrix, idf: np.ndarray, last_summary_id: int, version: Optional[str] = None):
+        self.terms = terms
+        self.vocabulary = {term: i for i, term in enumerate(terms)}
+        self.video_ids = video_ids
+        self.row_of = {video_id: i for i, video_id in enumerate(video_ids)}
+        self.rows = rows
+        self.postings = postings
+        self.idf = idf
+        self.last_summary_id = last_summary_id
+        # 保存先のバージョン（未保存の場合はNone）
+        self.version = version
+
+    @classmethod
+    def build(cls, terms: List[str], video_ids: List[str], rows: sparse.csr_matrix, last_summary_id: int) -> "_Snapshot":
+        rows.sum_duplicates()
+        document_frequency = np.bincount(rows.indices, minlength=len(terms))
+        idf = (np.log((1 + len(video_ids)) / (1 + document_frequency)) + 1).astype(np.float32)
+        weighted = _normalize_rows(sparse.csr_matrix(rows @ sparse.diags(idf))).astype(np.float32)
+        return cls(terms, video_ids, rows, weighted.T.tocsr(), idf, last_summary_id)
+
+    def query_vector(self, weights: Dict[str, float]) -> Tuple[List[int], List[float]]:
+        '''語の重みをIDF適用・正規化済みのベクトルに変換する（インデックスにない語は照合できないため除く）'''
+        columns = [self.vocabulary[term] for term in weights if term in self.vocabulary]
+        values = np.array([weights[self.terms[column]] for column in columns], dtype=np.float32) * self.idf[columns]
+        norm = float(np.sqrt((values ** 2).sum())) or 1.0
+        return columns, list(values / norm)
+
+    def row_weights(self, row: int) -> Dict[str, float]:
+        start, end = self.rows.indptr[row], self.rows.indptr[row + 1]
+        return {self.terms[column]: float(value) for column, value in zip(self.rows.indices[start:end], self.rows.data[start:end])}
+
+    def save(self, path: str):
+        '''
+        概要: インデックスをnumpyの配列ファイル（.npy）として保存する
+        用途: 新しいディレクトリに書き込んでからCURRENTを置き換えるため、読み込み中の他プロセスに影響しない。
+              呼び出し側で_index_lockを取得して実行する（保存は常に1プロセスずつ行われる）
+        '''
+        os.makedirs(path, exist_ok=True)
+        previous = _read_current(path)
+        pid = os.getpid()
+        version = f"{time.time_ns():020d}-{pid}"
+        if previous and VERSION_PATTERN.match(previous) and version <= previous:
+            # 時刻が巻き戻った場合も、名前の順が保存順になるようにする
+            version = f"{int(previous.split('-')[0]) + 1:020d}-{pid}"
+        # ロックの取得中に残っている一時ファイルは、保存の途中で停止したプロセスのもの
+        for name in os.listdir(path):
+            if name.startswith(".tmp-"):
+                shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+            elif name.startswith(f"{CURRENT_FILE}.tmp"):
+                os.remove(os.path.join(path, name))
+        temp_dir = os.path.join(path, f".tmp-{version}")
+        os.makedirs(temp_dir)
+        arrays = {
+            "rows_data": self.rows.data, "rows_indices": self.rows.indices, "rows_indptr": self.rows.indptr,
+            "postings_data": self.postings.data, "postings_indices": self.postings.indices,
+            "postings_indptr": self.postings.indptr, "idf": self.idf,
+        }
+        for name, values in arrays.items():
+            np.save(os.path.join(temp_dir, f"{name}.npy"), np.ascontiguousarray(values))
+        with open(os.path.join(temp_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"terms": self.terms, "video_ids": self.video_ids, "last_summary_id": self.last_summary_id}, f, ensure_ascii=False)
+        os.rename(temp_dir, os.path.join(path, version))
+        current_temp = os.path.join(path, f"{CURRENT_FILE}.tmp-{pid}-{uuid.uuid4().hex[:8]}")
+        with open(current_temp, "w", encoding="utf-8") as f:
+            f.write(version)
+        os.replace(current_temp, os.path.join(path, CURRENT_FILE))
+        self.version = version
+        # 置き換えたバージョンより古いバージョンのみを削除する。置き換えたバージョンは、直前にCURRENTを読んだ他プロセスが
+        # 読み込めるよう残す（読み込み済みのプロセスはメモリマップを保持しているため、削除しても影響しない）
+        if previous:
+            for name in os.listdir(path):
+                if _is_older_version(name, previous) and os.path.isdir(os.path.join(path, name)):
+                    shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["_Snapshot"]:
+        '''保存済みのインデックスをメモリマップで読み込む（配列はページ単位で必要な部分だけ読み込まれる）'''
+        version = _read_current(path)
+        if version is None:
+            return None
+        directory = os.path.join(path, version)
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in ARRAY_NAMES}
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        shape = (len(meta["video_ids"]), len(meta["terms"]))
+        rows = sparse.csr_matrix((arrays["rows_data"], arrays["rows_indices"], arrays["rows_indptr"]), shape=shape, copy=False)
+        postings = sparse.csr_matrix(
+            (arrays["postings_data"], arrays["postings_indices"], arrays["postings_indptr"]), shape=shape[::-1], copy=False
+        )
+        return cls(meta["terms"], meta["video_ids"], rows, postings, arrays["idf"], meta["last_summary_id"], version)
+
+
+def _rows_from_weights(entries: Iterable[Dict[str, float]], vocabulary: Dict[str, int], terms: List[str]) -> sparse.csr_matrix:
+    '''語の重みの辞書の列をCSR行列に変換する（未知の語は語彙に追加する）'''
+    data, indices, indptr = array("f"), array("q"), array("q", [0])
+    for weights in entries:
+        for term, weight in weights.items():
+            column = vocabulary.get(term)
+            if column is None:
+                column = vocabulary[term] = len(terms)
+                terms.append(term)
+            indices.append(column)
+            data.append(weight)
+        indptr.append(len(indices))
+    dtype = _index_dtype(len(indices))
+    return sparse.csr_matrix(
+        (np.frombuffer(data, dtype=np.float32), np.frombuffer(indices, dtype=np.int64).astype(dtype),
+         np.frombuffer(indptr, dtype=np.int64).astype(dtype)),
+        shape=(len(indptr) - 1, len(terms))
+    )
+
+
+class RelatedVideoIndex:
+    '''
+    概要: 保存済み要約のTF-IDFベクトルによる関連動画インデックス
+    用途: LLMや埋め込みAPIを使わずに、要約の内容が似ている動画を返す。新しい要約は未統合の差分として即座に検索対象とし、
+          一定件数・一定時間ごとに確定済みのインデックスへ統合して保存する。保存したインデックスはメモリマップで読み込むため、
+          ワーカーの起動時に再計算しない。同時に届いた問い合わせはまとめて1回の行列積で計算する。
+          保存先を共有する複数のプロセスでは、作成・統合はファイルロックを取得した1プロセスのみが行い、他のプロセスは保存された
+          インデックスを読み込む
+    '''
+
+    def __init__(self, path: str = RELATED_INDEX_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+        self._snapshot: Optional[_Snapshot] = None
+        # 未統合の要約（video_id → 語の重み）と、それらの基準となる要約ID
+        self._pending: Dict[str, Dict[str, float]] = {}
+        # 未統合の要約のうちDBから取り込んだもの（video_id → 要約ID。他プロセスの統合結果に含まれるかの判定に使う）
+        self._pending_ids: Dict[str, int] = {}
+        self._pending_version = 0
+        # 差分の行列のキャッシュ（差分のバージョン、基準のインデックス、video_idの列、行列）
+        self._pending_matrix: Optional[Tuple[int, _Snapshot, List[str], sparse.csr_matrix]] = None
+        self._last_summary_id = 0
+        self._last_merged_at = time.monotonic()
+        self._ready = threading.Event()
+        self._batch: List[Tuple[str, int, Future]] = []
+        self._batch_lock = threading.Lock()
+        self._stats = {"queries": 0, "batches": 0, "merges": 0}
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def _load_saved(self) -> Optional[_Snapshot]:
+        try:
+            return _Snapshot.load(self.path)
+        except Exception:
+            logger.exception("関連動画インデックスの読み込みに失敗したため、作成し直します")
+            return None
+
+    def initialize(self):
+        '''
+        概要: 保存済みのインデックスを読み込み、なければDBの全要約から作成する
+        用途: 複数のワーカーが同時に起動した場合も、DBからの作成はロックを取得した1プロセスのみが行い、
+              他のプロセスはロックの解放を待って作成されたインデックスを読み込む
+        '''
+        snapshot = self._load_saved()
+        if snapshot is None:
+            with _index_lock(self.path):
+                snapshot = self._load_saved()
+                if snapshot is None:
+                    started = time.perf_counter()
+                    snapshot = self._build_from_db()
+                    snapshot.save(self.path)
+                    logger.info(f"関連動画インデックスを作成しました: {len(snapshot.video_ids)}件 ({time.perf_counter() - started:.1f}s)")
+                else:
+                    logger.info(f"他のプロセスが作成した関連動画インデックスを読み込みました: {len(snapshot.video_ids)}件")
+        else:
+            logger.info(f"関連動画インデックスを読み込みました: {len(snapshot.video_ids)}件")
+        self._adopt(snapshot)
+        self._ready.set()
+        self.refresh()
+
+    def _adopt(self, snapshot: _Snapshot):
+        '''確定済みのインデックスを置き換え、そのインデックスに含まれる要約を未統合の差分から除く'''
+        with self._lock:
+            self._snapshot = snapshot
+            covered = [video_id for video_id, summary_id in self._pending_ids.items() if summary_id <= snapshot.last_summary_id]
+            for video_id in covered:
+                del self._pending[video_id]
+                del self._pending_ids[video_id]
+            self._last_summary_id = max(self._last_summary_id, snapshot.last_summary_id)
+            self._pending_version += 1
+        self._last_merged_at = time.monotonic()
+
+    def _reload_if_changed(self) -> bool:
+        '''他のプロセスが統合・保存したインデックスがあれば読み込む（読み込んだ場合はTrueを返す）'''
+        with self._lock:
+            snapshot = self._snapshot
+        if snapshot is None or _read_current(self.path) in (None, snapshot.version):
+            return False
+        loaded = self._load_saved()
+        if loaded is None or loaded.last_summary_id < snapshot.last_summary_id:
+            return False
+        self._adopt(loaded)
+        logger.info(f"他のプロセスが統合した関連動画インデックスを読み込みました: {len(loaded.video_ids)}件")
+        return True
+
+    def _build_from_db(self) -> _Snapshot:
+        video_ids: List[str] = []
+        terms: List[str] = []
+        last_summary_id = 0
+
+        def entries():
+            nonlocal last_summary_id
+            for row in DatabaseService.iter_summaries_for_related_index(latest_only=True):
+                video_ids.append(row.video_id)
+                last_summary_id = max(last_summary_id, row.id)
+                yield summary_term_weights(row)
+
+        rows = _rows_from_weights(entries(), {}, terms)
+        return _Snapshot.build(terms, video_ids, rows, last_summary_id)
+
+    def add(self, video_id: str, summary: Any, summary_id: Optional[int] = None):
+        '''新しい要約を未統合の差分に加える（同じ動画の以前の要約は検索対象から外れる）'''
+        weights = summary_term_weights(summary)
+        with self._lock:
+            self._pending[video_id] = weights
+            if summary_id is None:
+                self._pending_ids.pop(video_id, None)
+            else:
+                self._pending_ids[video_id] = summary_id
+            self._pending_version += 1
+
+    def refresh(self) -> int:
+        '''
+        概要: 前回以降にDBへ保存された要約を差分に取り込み、必要なら確定済みのインデックスへ統合する
+        用途: 他のプロセス（ワーカー）で保存された要約や、他のプロセスが統合したインデックスも取り込む。取り込んだ件数を返す
+        '''
+        self._reload_if_changed()
+        added = 0
+        last_summary_id = self._last_summary_id
+        for row in DatabaseService.iter_summaries_for_related_index(after_id=last_summary_id):
+            self.add(row.video_id, row, row.id)
+            last_summary_id = row.id
+            added += 1
+        with self._lock:
+            self._last_summary_id = max(self._last_summary_id, last_summary_id)
+            pending = len(self._pending)
+            indexed = len(self._snapshot.video_ids) if self._snapshot else 0
+        # 差分の語は確定済みの語彙にない語を照合できないため、確定済みの件数が差分より少ない場合（初回など）もすぐに統合する
+        if pending >= min(RELATED_MERGE_THRESHOLD, indexed + 1) or (
+            pending and time.monotonic() - self._last_merged_at >= RELATED_MERGE_INTERVAL_SECONDS
+        ):
+            self.merge()
+        return added
+
+    def merge(self):
+        '''
+        概要: 未統合の差分を確定済みのインデックスに統合し、IDFを再計算して保存する
+        用途: 置き換えられた動画の古い行は除く。計算中に追加された差分は次回の統合に回す。
+              他のプロセスが統合中の場合は何もしない（その結果は次回のrefreshで読み込む）
+        '''
+        with _index_lock(self.path, blocking=False) as acquired:
+            if acquired:
+                self._merge_locked()
+
+    def _merge_locked(self):
+        # 他のプロセスが統合・保存したインデックスがあれば、それを基準に残りの差分を統合する
+        self._reload_if_changed()
+        with self._lock:
+            snapshot = self._snapshot
+            pending = dict(self._pending)
+            last_summary_id = self._last_summary_id
+        if snapshot is None or not pending:
+            return
+        started = time.perf_counter()
+        kept = [row for row, video_id in enumerate(snapshot.video_ids) if video_id not in pending]
+        terms = list(snapshot.terms)
+        vocabulary = dict(snapshot.vocabulary)
+        added_rows = _rows_from_weights(pending.values(), vocabulary, terms)
+        base_rows = snapshot.rows[kept]
+        base_rows.resize((len(kept), len(terms)))
+        rows = sparse.vstack([base_rows, added_rows], format="csr")
+        dtype = _index_dtype(rows.nnz)
+        rows.indices, rows.indptr = rows.indices.astype(dtype), rows.indptr.astype(dtype)
+        video_ids = [snapshot.video_ids[row] for row in kept] + list(pending)
+        merged = _Snapshot.build(terms, video_ids, rows, last_summary_id)
+        merged.save(self.path)
+        with self._lock:
+            self._snapshot = merged
+            for video_id, weights in pending.items():
+                if self._pending.get(video_id) is weights:
+                    del self._pending[video_id]
+                    self._pending_ids.pop(video_id, None)
+            self._pending_version += 1
+            self._stats["merges"] += 1
+        self._last_merged_at = time.monotonic()
+        logger.info(f"関連動画インデックスを統合しました: {len(video_ids)}件 ({time.perf_counter() - started:.1f}s)")
+
+    def _pending_vectors(self) -> Tuple[_Snapshot, Dict[str, Dict[str, float]], List[str], sparse.csr_matrix]:
+        '''未統合の差分を確定済みの語彙・IDFで正規化した行列（差分どうしの照合用）。差分が変わるまで再利用する'''
+        with self._lock:
+            snapshot, pending, version, cached = self._snapshot, dict(self._pending), self._pending_version, self._pending_matrix
+        if snapshot is None:
+            raise RelatedIndexNotReady("関連動画インデックスを準備中です")
+        if cached is not None and cached[0] == version and cached[1] is snapshot:
+            return snapshot, pending, cached[2], cached[3]
+        video_ids = list(pending)
+        data, indices, indptr = [], [], [0]
+        for video_id in video_ids:
+            columns, values = snapshot.query_vector(pending[video_id])
+            indices.extend(columns)
+            data.extend(values)
+            indptr.append(len(indices))
+        matrix = sparse.csr_matrix(
+            (np.array(data, dtype=np.float32), np.array(indices, dtype=np.int64), np.array(indptr, dtype=np.int64)),
+            shape=(len(video_ids), len(snapshot.terms))
+        )
+        with self._lock:
+            self._pending_matrix = (version, snapshot, video_ids, matrix)
+        return snapshot, pending, video_ids, matrix
+
+    def related_batch(self, video_ids: List[str], limit: int = 10) -> List[Optional[List[Tuple[str, float]]]]:
+        '''
+        概要: 複数の動画の関連動画をまとめて計算する
+        用途: クエリの行列（問い合わせ数×語）と転置済みのインデックス（語×動画）の疎行列積で類似度を求め、
+              行ごとにargpartitionで上位を取り出す。インデックスにない動画はNoneを返す
+        '''
+        snapshot, pending, pending_ids, pending_matrix = self._pending_vectors()
+
+        found = []
+        data, indices, indptr = [], [], [0]
+        for video_id in video_ids:
+            if video_id in pending:
+                weights = pending[video_id]
+            elif video_id in snapshot.row_of:
+                weights = snapshot.row_weights(snapshot.row_of[video_id])
+            else:
+                found.append(False)
+                indptr.append(len(indices))
+                continue
+            columns, values = snapshot.query_vector(weights)
+            indices.extend(columns)
+            data.extend(values)
+            indptr.append(len(indices))
+            found.append(True)
+        queries = sparse.csr_matrix(
+            (np.array(data, dtype=np.float32), np.array(indices, dtype=np.int64), np.array(indptr, dtype=np.int64)),
+            shape=(len(video_ids), len(snapshot.terms))
+        )
+        base_scores = (queries @ snapshot.postings).tocsr()
+        pending_scores = (queries @ pending_matrix.T).toarray() if pending_ids else None
+
+        results: List[Optional[List[Tuple[str, float]]]] = []
+        for i, video_id in enumerate(video_ids):
+            if not found[i]:
+                results.append(None)
+                continue
+            start, end = base_scores.indptr[i], base_scores.indptr[i + 1]
+            candidates = [
+                (snapshot.video_ids[column], float(score))
+                for column, score in self._top(base_scores.indices[start:end], base_scores.data[start:end], limit + 1 + len(pending))
+                if snapshot.video_ids[column] not in pending
+            ]
+            if pending_scores is not None:
+                candidates.extend(
+                    (pending_ids[column], float(score))
+                    for column, score in self._top(np.arange(len(pending_ids)), pending_scores[i], limit + 1)
+                )
+            candidates = [item for item in candidates if item[0] != video_id and item[1] >= RELATED_MIN_SCORE]
+            candidates.sort(key=lambda item: (-item[1], item[0]))
+            results.append([(related_id, round(score, 4)) for related_id, score in candidates[:limit]])
+        with self._lock:
+            self._stats["queries"] += len(video_ids)
+            self._stats["batches"] += 1
+        return results
+
+    @staticmethod
+    def _top(columns: np.ndarray, scores: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        if len(scores) > k:
+            selected = np.argpartition(-scores, k)[:k]
+            columns, scores = columns[selected], scores[selected]
+        return list(zip(columns.tolist(), scores.tolist()))
+
+    def related(self, video_id: str, limit: int = 10, timeout: float = 10.0) -> Optional[List[Tuple[str, float]]]:
+        '''
+        概要: 1件の動画の関連動画を返す
+        用途: 最初の問い合わせがRELATED_BATCH_WINDOW_MSだけ待つ間に届いた問い合わせをまとめ、related_batchで一度に計算する
+        '''
+        if not self.ready:
+            raise RelatedIndexNotReady("関連動画インデックスを準備中です")
+        future: Future = Future()
+        with self._batch_lock:
+            self._batch.append((video_id, limit, future))
+            leader = len(self._batch) == 1
+        if leader:
+            time.sleep(RELATED_BATCH_WINDOW_SECONDS)
+            with self._batch_lock:
+                batch, self._batch = self._batch, []
+            try:
+                results = self.related_batch([item[0] for item in batch], max(item[1] for item in batch))
+                for (_, item_limit, item_future), result in zip(batch, results):
+                    item_future.set_result(result[:item_limit] if result is not None else None)
+            except Exception as e:
+                for _, _, item_future in batch:
+                    item_future.set_exception(e)
+        return future.result(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            snapshot = self._snapshot
+            return {
+                "ready": self.ready,
+                "videos": len(snapshot.video_ids) if snapshot else 0,
+                "terms": len(snapshot.terms) if snapshot else 0,
+                "nnz": int(snapshot.rows.nnz) if snapshot else 0,
+                "pending": len(self._pending),
+                "last_summary_id": self._last_summary_id,
+                **self._stats,
+            }
+
+    def start(self, interval: float = RELATED_REFRESH_INTERVAL_SECONDS):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="related-index", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 5.0):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _run(self, interval: float):
+        try:
+            self.initialize()
+        except Exception:
+            logger.exception("関連動画インデックスの初期化中にエラーが発生しました")
+        while not self._stop_event.wait(interval):
+            try:
+                if not self.ready:
+                    self.initialize()
+                else:
+                    self.refresh()
+            except Exception:
+                logger.exception("関連動画インデックスの更新中にエラーが発生しました")
+
+
+# プロセス共通の関連動画インデックス
+related_index = RelatedVideoIndex()
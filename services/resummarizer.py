@@ -0,0 +1,105 @@
+import os
+import time
+import threading
+import logging
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+from database.db_service import DatabaseService
+from database.job_service import JobQueueService
+from .rate_limiter import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# 再要約設定
+RESUMMARIZE_ENABLED = os.getenv("RESUMMARIZE_ENABLED", "false").lower() == "true"
+RESUMMARIZE_MAX_PER_HOUR = float(os.getenv("RESUMMARIZE_MAX_PER_HOUR", "30"))
+RESUMMARIZE_INTERVAL_SECONDS = int(os.getenv("RESUMMARIZE_INTERVAL_SECONDS", "300"))
+RESUMMARIZE_JOB_PRIORITY = -20  # 対話的リクエスト・事前要約より後に処理する
+RESUMMARIZE_REQUEST_MEMORY = 10000  # 読み取り時の再要約要求を重複排除するために記憶する動画数
+
+
+class ResummarizeScheduler:
+    """
+    概要: 古いプロンプト・モデルで生成された要約を少しずつ再生成するバックグラウンドスレッド
+    用途: プロンプト変更時にキャッシュを一斉に破棄せず、上限付きのペースで再要約ジョブを登録する。
+          新しい要約が保存されるまでは古い要約を返し続ける
+    """
+
+    def __init__(self, version_provider: Callable[[], Dict[str, str]],
+                 max_per_hour: float = RESUMMARIZE_MAX_PER_HOUR,
+                 interval: int = RESUMMARIZE_INTERVAL_SECONDS):
+        self.version_provider = version_provider
+        self.interval = interval
+        # 1時間あたりの登録数の上限（バーストは1間隔分まで）
+        self.bucket = TokenBucket(max_per_hour / 3600.0, max(1.0, max_per_hour * interval / 3600.0))
+        self._lock = threading.Lock()
+        self._requested: "OrderedDict[str, float]" = OrderedDict()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self) -> int:
+        """
+        概要: 再要約対象を抽出し、レート上限の範囲でジョブを登録する
+        用途: 登録した件数を返す
+        """
+        budget = int(self.bucket.snapshot()["available"])
+        if budget <= 0:
+            return 0
+        version = self.version_provider()
+        stale_video_ids = DatabaseService.find_stale_video_ids(version["prompt_hash"], version["model_name"], limit=budget)
+        enqueued = 0
+        for video_id in stale_video_ids:
+            if self.bucket.try_acquire(1) > 0:
+                break
+            JobQueueService.enqueue(video_id, priority=RESUMMARIZE_JOB_PRIORITY, refresh=True)
+            enqueued += 1
+        if enqueued:
+            logger.info(f"再要約ジョブを登録しました: {enqueued}件")
+        return enqueued
+
+    def request(self, video_id: str, strategy: str = "default") -> bool:
+        """
+        概要: 読み取り時に古いと判定された要約の再要約ジョブを、run_onceと同じ上限（RESUMMARIZE_MAX_PER_HOUR）の範囲で登録する
+        用途: 上限に達している場合は登録せずFalseを返す（プロンプト・モデルが古い要約は後でrun_onceが拾う）。
+              同じ動画への読み取りが続いても、登録は確認間隔（RESUMMARIZE_INTERVAL_SECONDS）ごとに1回までとする
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._requested.get(video_id, 0.0) > now:
+                return False
+            if self.bucket.try_acquire(1) > 0:
+                return False
+            self._requested[video_id] = now + self.interval
+            self._requested.move_to_end(video_id)
+            while len(self._requested) > RESUMMARIZE_REQUEST_MEMORY:
+                self._requested.popitem(last=False)
+        try:
+            JobQueueService.enqueue(video_id, strategy, priority=RESUMMARIZE_JOB_PRIORITY, refresh=True)
+        except Exception:
+            # 登録できなかった分は上限の枠を戻し、次の読み取りで再度要求できるようにする
+            self.bucket.refund(1)
+            with self._lock:
+                self._requested.pop(video_id, None)
+            raise
+        logger.info(f"読み取り時に古い要約の再要約ジョブを登録しました: video_id={video_id}")
+        return True
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="resummarizer", daemon=True)
+        self._thread.start()
+        logger.info(f"再要約スケジューラーを起動しました: interval={self.interval}s")
+
+    def stop(self, timeout: Optional[float] = 5.0):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("再要約ジョブの登録中にエラーが発生しました")
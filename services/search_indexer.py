@@ -0,0 +1,28 @@
+import sys
+import argparse
+import logging
+from typing import List, Optional
+from dotenv import load_dotenv
+from database.db_models import create_tables
+from database.search_service import SearchService
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="保存済みの要約を検索インデックス（summary_terms）に登録する")
+    parser.add_argument("--batch-size", type=int, default=500, help="1回のコミットで登録する要約の件数")
+    parser.add_argument("--reindex", action="store_true", help="登録済みの動画も再計算する（重みやトークン分割を変更した場合）")
+    args = parser.parse_args(argv)
+
+    create_tables()
+    indexed = SearchService.backfill(batch_size=args.batch_size, reindex=args.reindex)
+    print(f"検索インデックスに登録しました: {indexed}件")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,241 @@
+import os
+import sys
+import hmac
+import json
+import zlib
+import argparse
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import orjson
+from dotenv import load_dotenv
+from database.db_models import create_tables
+from database.db_service import DatabaseService, summary_to_document
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# 要約の一括エクスポート設定
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))  # サーバーサイドカーソルから一度に取得する行数
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "1000"))  # 列指向形式の1チャンクあたりの行数
+EXPORT_GZIP_LEVEL = int(os.getenv("EXPORT_GZIP_LEVEL", "6"))
+# HTTPエクスポート（GET /export/summaries）の認証トークン。未設定の場合はHTTPエクスポートを無効にする（CLIは常に利用可能）
+EXPORT_API_TOKEN = os.getenv("EXPORT_API_TOKEN", "")
+EXPORT_MAX_CONCURRENT_STREAMS = int(os.getenv("EXPORT_MAX_CONCURRENT_STREAMS", "2"))  # 同時に実行できるHTTPエクスポートの数
+# この秒数より前に作成された要約のみをエクスポートする（作成からコミットまでの間の行をウォーターマークで飛ばさないため）
+EXPORT_WATERMARK_LAG_SECONDS = float(os.getenv("EXPORT_WATERMARK_LAG_SECONDS", "5"))
+
+EXPORT_FORMAT_NDJSON = "ndjson"
+EXPORT_FORMAT_COLUMNAR = "columnar"
+EXPORT_FORMATS = (EXPORT_FORMAT_NDJSON, EXPORT_FORMAT_COLUMNAR)
+
+# 列指向形式の列（要約の各項目は"summary."を付けずに展開する）
+COLUMNAR_COLUMNS = [
+    "id", "video_id", "title", "description", "channel_title", "channel_id",
+    "sub_title", "overview", "main_topics", "key_points", "keywords", "action_items",
+    "model_name", "prompt_hash", "created_at",
+]
+
+Watermark = Tuple[datetime, int]
+
+
+def parse_watermark(value: Optional[str]) -> Optional[Watermark]:
+    '''
+    概要: ウォーターマーク文字列を(created_at, id)に変換する
+    用途: "2025-01-01T00:00:00_123"（前回のエクスポートが返した値）または日時のみ（その日時以降の全件）を受け付ける。
+          タイムゾーン付きの日時はUTCに変換する（created_atはUTCで保存されている）
+    '''
+    if not value:
+        return None
+    created_at, _, row_id = value.partition("_")
+    parsed = datetime.fromisoformat(created_at)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed, int(row_id) if row_id else 0
+
+
+def format_watermark(watermark: Optional[Watermark]) -> Optional[str]:
+    if watermark is None:
+        return None
+    created_at, row_id = watermark
+    return f"{created_at.isoformat()}_{row_id}"
+
+
+def row_to_export_record(row: Any) -> Dict[str, Any]:
+    '''要約レコードをエクスポート用の辞書に変換する（GET /summaries/{video_id}と同じ形式に行IDを加える）'''
+    return {"id": row.id, **summary_to_document(row)}
+
+
+def iter_ndjson(records: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    '''1行1レコードのJSON（NDJSON）を返す'''
+    for record in records:
+        yield orjson.dumps(record) + b"\n"
+
+
+def iter_columnar(records: Iterable[Dict[str, Any]], chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[bytes]:
+    '''
+    概要: chunk_rows件ごとに列単位の配列へ詰め替えたチャンクを1行のJSONとして返す
+    用途: Parquetの行グループに相当する単位で、pandas.DataFrame(chunk["columns"])などにそのまま読み込める。
+          保持するのは1チャンク分のみのため、メモリ使用量はテーブルの大きさによらない
+    '''
+    columns: Dict[str, List[Any]] = {name: [] for name in COLUMNAR_COLUMNS}
+    rows = 0
+    for record in records:
+        flat = {**record, **record["summary"]}
+        for name in COLUMNAR_COLUMNS:
+            columns[name].append(flat.get(name))
+        rows += 1
+        if rows >= chunk_rows:
+            yield orjson.dumps({"rows": rows, "columns": columns}) + b"\n"
+            columns = {name: [] for name in COLUMNAR_COLUMNS}
+            rows = 0
+    if rows:
+        yield orjson.dumps({"rows": rows, "columns": columns}) + b"\n"
+
+
+def gzip_stream(chunks: Iterable[bytes], level: int = EXPORT_GZIP_LEVEL) -> Iterator[bytes]:
+    '''入力を逐次gzip圧縮して返す（全体をメモリに載せない）'''
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+class SummaryExport:
+    '''
+    概要: 要約の一括エクスポート（開始時点で確定したウォーターマークと、出力のバイト列のイテレーター）
+    用途: watermarkを次回のsinceに渡すと、前回以降に保存された要約のみを取得できる（対象がなければsinceのまま）
+    '''
+
+    def __init__(self, since: Optional[Watermark] = None, export_format: str = EXPORT_FORMAT_NDJSON,
+                 compress: bool = True, batch_size: int = EXPORT_BATCH_SIZE):
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"未対応のエクスポート形式です: {export_format}")
+        self.since = since
+        self.export_format = export_format
+        self.compress = compress
+        self.batch_size = batch_size
+        # エクスポート中に追加された要約と、作成から間もない（まだコミットされていない行がありうる）要約は次回に回す
+        self.until = DatabaseService.get_export_watermark(
+            since, before=datetime.utcnow() - timedelta(seconds=EXPORT_WATERMARK_LAG_SECONDS)
+        )
+        self.watermark = self.until or since
+
+    @property
+    def is_empty(self) -> bool:
+        return self.until is None
+
+    @property
+    def filename(self) -> str:
+        stamp = (self.watermark[0] if self.watermark else datetime.utcnow()).strftime("%Y%m%dT%H%M%S")
+        return f"video_summaries_{stamp}.{self.export_format}" + (".gz" if self.compress else "")
+
+    @property
+    def media_type(self) -> str:
+        return "application/gzip" if self.compress else "application/x-ndjson"
+
+    def __iter__(self) -> Iterator[bytes]:
+        if self.is_empty:
+            records: Iterable[Dict[str, Any]] = iter(())
+        else:
+            rows = DatabaseService.iter_summaries_for_export(self.since, self.until, self.batch_size)
+            records = (row_to_export_record(row) for row in rows)
+        encoded = iter_ndjson(records) if self.export_format == EXPORT_FORMAT_NDJSON else iter_columnar(records)
+        return gzip_stream(encoded) if self.compress else encoded
+
+
+def is_authorized_export(authorization: Optional[str]) -> bool:
+    '''AuthorizationヘッダーがBearer <EXPORT_API_TOKEN>と一致するか（トークン未設定の場合は常にFalse）'''
+    if not EXPORT_API_TOKEN or not authorization:
+        return False
+    return hmac.compare_digest(authorization.encode("utf-8"), f"Bearer {EXPORT_API_TOKEN}".encode("utf-8"))
+
+
+class ExportStreamSlots:
+    '''
+    概要: HTTPエクスポートの同時実行数の上限
+    用途: エクスポート中はダウンロードが終わるまでサーバーサイドカーソル（DB接続）を保持するため、同時に実行する数を制限する
+    '''
+
+    def __init__(self, limit: int = EXPORT_MAX_CONCURRENT_STREAMS):
+        self._semaphore = threading.BoundedSemaphore(limit)
+
+    def try_acquire(self) -> bool:
+        return self._semaphore.acquire(blocking=False)
+
+    def release(self):
+        self._semaphore.release()
+
+    def stream(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        '''
+        概要: 出力が終わった時点で枠を戻すイテレーターを返す
+        用途: クライアントの切断で中断された場合や、送信が始まる前に破棄された場合も枠を戻すよう、
+              ジェネレーターを開始済みの状態で返す（開始前のジェネレーターは破棄時にfinallyが実行されないため）
+        '''
+        def generate() -> Iterator[bytes]:
+            try:
+                yield b""
+                yield from chunks
+            finally:
+                self.release()
+
+        stream = generate()
+        next(stream)
+        return stream
+
+
+# プロセス共通のHTTPエクスポートの同時実行数の上限
+export_stream_slots = ExportStreamSlots()
+
+
+def load_state(path: str) -> Optional[str]:
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f).get("watermark")
+
+
+def save_state(path: str, watermark: Optional[str]):
+    # 書き込み途中で中断しても前回の状態が残るよう、一時ファイルに書いてから置き換える
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump({"watermark": watermark, "exported_at": datetime.utcnow().isoformat()}, f)
+    os.replace(temp_path, path)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="保存済みの要約をNDJSONまたは列指向のチャンクで一括エクスポートする")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default=EXPORT_FORMAT_NDJSON, help="出力形式")
+    parser.add_argument("--since", help="このウォーターマーク（または日時）より後に保存された要約のみを出力する")
+    parser.add_argument("--state-file", help="ウォーターマークを読み書きするファイル。指定すると前回の続きから出力し、完了後に更新する")
+    parser.add_argument("--output", "-o", help="出力先のファイルパス（省略時は自動命名、\"-\"で標準出力）")
+    parser.add_argument("--no-gzip", action="store_true", help="gzip圧縮せずに出力する")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE, help="DBから一度に取得する行数")
+    args = parser.parse_args(argv)
+
+    since = args.since or (load_state(args.state_file) if args.state_file else None)
+    create_tables()
+    export = SummaryExport(parse_watermark(since), args.format, compress=not args.no_gzip, batch_size=args.batch_size)
+    if export.is_empty:
+        print("新しい要約はありません", file=sys.stderr)
+        return 0
+
+    output = args.output or export.filename
+    written = 0
+    with (open(sys.stdout.fileno(), "wb", closefd=False) if output == "-" else open(output, "wb")) as f:
+        for chunk in export:
+            f.write(chunk)
+            written += len(chunk)
+    if args.state_file:
+        save_state(args.state_file, format_watermark(export.watermark))
+    print(f"エクスポートしました: output={output}, bytes={written}, watermark={format_watermark(export.watermark)}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,48 @@
+import re
+import unicodedata
+from typing import List
+
+# 文字種ごとの連続部分（英数字・漢字・カタカナ・ひらがな）
+TOKEN_RUN_PATTERN = re.compile(
+    r"(?P<ascii>[a-z0-9][a-z0-9+#.'\-]*)"
+    r"|(?P<kanji>[㐀-䶿一-鿿豈-﫿々〆ヵヶ]+)"
+    r"|(?P<katakana>[ァ-ヺー]+)"
+    r"|(?P<hiragana>[ぁ-ゖ]+)"
+)
+
+MAX_TERM_LENGTH = 64
+
+ENGLISH_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "how", "in", "is", "it", "of",
+    "on", "or", "that", "the", "this", "to", "was", "what", "with", "you", "your",
+}
+
+
+def normalize_text(text: str) -> str:
+    '''全角英数字・半角カナをNFKCで統一し、小文字化する'''
+    return unicodedata.normalize("NFKC", text or "").lower()
+
+
+def _bigrams(run: str) -> List[str]:
+    if len(run) == 1:
+        return [run]
+    return [run[i:i + 2] for i in range(len(run) - 1)]
+
+
+def tokenize(text: str) -> List[str]:
+    '''
+    概要: 検索・類似度計算用に文字列を語（トークン）の列に分割する
+    用途: 英数字は単語単位、漢字・カタカナは分かち書きせずに文字bigramで分割する（形態素解析の辞書が不要）。
+          ひらがなだけの部分は助詞・送り仮名が大半のため除き、英語のストップワードと1文字の英数字も除く
+    '''
+    tokens: List[str] = []
+    for match in TOKEN_RUN_PATTERN.finditer(normalize_text(text)):
+        kind = match.lastgroup
+        run = match.group()
+        if kind == "ascii":
+            run = run.strip(".'-")
+            if len(run) >= 2 and run not in ENGLISH_STOPWORDS:
+                tokens.append(run[:MAX_TERM_LENGTH])
+        elif kind in ("kanji", "katakana"):
+            tokens.extend(_bigrams(run))
+    return tokens
@@ -0,0 +1,47 @@
+import logging
+from typing import Any, Iterable
+
+logger = logging.getLogger(__name__)
+
+# GPT-4.1系で使用されるエンコーディング
+TIKTOKEN_ENCODING = "o200k_base"
+
+_encoding = None
+_encoding_failed = False
+
+
+def _get_encoding():
+    global _encoding, _encoding_failed
+    if _encoding is None and not _encoding_failed:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding(TIKTOKEN_ENCODING)
+        except Exception as e:
+            # オフライン環境などでエンコーディングを取得できない場合は概算にフォールバック
+            logger.warning(f"tiktokenエンコーディングの取得に失敗しました。概算値を使用します: {str(e)}")
+            _encoding_failed = True
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """
+    概要: テキストのトークン数を数える
+    用途: レート制御のコスト見積もりや前処理の効果測定に使用する
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is None:
+        # 日本語はおおよそ1文字1トークン、英語は4文字1トークン程度
+        ascii_chars = sum(1 for c in text if ord(c) < 128)
+        return (len(text) - ascii_chars) + ascii_chars // 4 + 1
+    return len(encoding.encode(text))
+
+
+def count_message_tokens(messages: Iterable[Any]) -> int:
+    """LangChainのメッセージ列のトークン数を概算する（メッセージごとのオーバーヘッド込み）"""
+    total = 0
+    for message in messages:
+        content = getattr(message, "content", message)
+        total += count_tokens(content if isinstance(content, str) else str(content)) + 4
+    return total
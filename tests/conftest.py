@@ -0,0 +1,20 @@
+import os
+import sys
+import tempfile
+import pytest
+
+# リポジトリ直下のパッケージ（agents・services・database）を読み込めるようにする
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# データベース接続はインポート時に確定するため、モジュールを読み込む前にテスト用のSQLiteファイルを指定する
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='ycp_test_'), 'test.db')}"
+
+
+@pytest.fixture
+def database():
+    '''テストごとに空のテーブルを作成し、終了後に削除する'''
+    from database.db_models import Base, engine, create_tables
+
+    create_tables()
+    yield
+    Base.metadata.drop_all(bind=engine)
@@ -0,0 +1,108 @@
+import time
+import pytest
+from services.admission_control import AdmissionController, Overloaded
+
+
+def make_controller(**kwargs):
+    options = {"enabled": True, "target_wait": 0.05, "max_in_flight": 2, "window": 10}
+    options.update(kwargs)
+    return AdmissionController(**options)
+
+
+def test_admits_when_idle():
+    controller = make_controller()
+    controller.admit("summarize")
+    snapshot = controller.snapshot()
+    assert not snapshot["overloaded"]
+    assert snapshot["routes"]["summarize"]["admitted"] == 1
+
+
+def test_rejects_when_in_flight_limit_is_reached():
+    controller = make_controller()
+    with controller.track_llm_call() as started_a, controller.track_llm_call() as started_b:
+        started_a()
+        started_b()
+        with pytest.raises(Overloaded) as excinfo:
+            controller.admit("chat")
+        assert excinfo.value.retry_after >= 1.0
+        assert controller.snapshot()["in_flight_llm_calls"] == 2
+    controller.admit("chat")
+
+
+def test_rejects_while_a_call_waits_longer_than_target():
+    controller = make_controller()
+    with controller.track_llm_call():
+        time.sleep(0.1)
+        # 枠を待っている呼び出しの待ち時間も判定に含める
+        with pytest.raises(Overloaded):
+            controller.admit("summarize")
+
+
+def test_recent_wait_samples_keep_rejecting_until_window_passes():
+    controller = make_controller(window=0.2)
+    with controller.track_llm_call() as started:
+        time.sleep(0.1)
+        started()
+    assert controller.snapshot()["wait_samples"] == 1
+    with pytest.raises(Overloaded):
+        controller.admit("summarize")
+    time.sleep(0.25)
+    controller.admit("summarize")
+
+
+def test_disabled_controller_admits_everything():
+    controller = make_controller(enabled=False, max_in_flight=0)
+    controller.admit("summarize")
+    assert not controller.snapshot()["overloaded"]
+
+
+def test_diverted_and_rejected_are_counted_per_route():
+    controller = make_controller()
+    controller.record_diverted("summarize")
+    controller.record_rejected("summarize")
+    controller.record_rejected("chat")
+    routes = controller.snapshot()["routes"]
+    assert routes["summarize"] == {"admitted": 0, "diverted": 1, "rejected": 1}
+    assert routes["chat"]["rejected"] == 1
+
+
+def test_rejects_when_job_queue_is_full(database):
+    from database.job_service import JobQueueService
+
+    controller = make_controller(max_queued_jobs=3, job_backlog=lambda: JobQueueService.backlog(min_priority=10))
+    controller.admit("summarize", queued=True)
+    for i in range(3):
+        JobQueueService.enqueue(f"vid{i}", priority=10)
+    # 後回しにされる低優先度のジョブは数えない
+    JobQueueService.enqueue("background", priority=-10)
+    controller.backlog_refresh = 0
+    with pytest.raises(Overloaded) as excinfo:
+        controller.admit("summarize", queued=True)
+    assert excinfo.value.queue_full
+    assert controller.snapshot()["queued_jobs"] == 3
+    # ジョブキューを使わない処理はジョブの滞留では拒否しない
+    controller.admit("chat")
+
+
+def test_rejects_when_oldest_job_waits_too_long():
+    controller = make_controller(max_queue_age=30, job_backlog=lambda: (1, 45.0))
+    with pytest.raises(Overloaded) as excinfo:
+        controller.admit("summarize", queued=True)
+    assert excinfo.value.queue_full
+    assert excinfo.value.retry_after == 45.0
+
+
+def test_burst_is_counted_before_backlog_refresh():
+    controller = make_controller(max_queued_jobs=2, backlog_refresh=60, job_backlog=lambda: (0, 0.0))
+    controller.admit("summarize", queued=True)
+    controller.admit("summarize", queued=True)
+    with pytest.raises(Overloaded):
+        controller.admit("summarize", queued=True)
+
+
+def test_backlog_failure_keeps_admitting():
+    def broken():
+        raise RuntimeError("database is down")
+
+    controller = make_controller(job_backlog=broken)
+    controller.admit("summarize", queued=True)
@@ -0,0 +1,128 @@
+import sqlite3
+import time
+import pytest
+from services import cache as cache_module
+from services.cache import CacheBackend, InMemoryCache, SQLiteCache
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_cache(request, tmp_path, monkeypatch):
+    '''同じテストを両方のバックエンドで実行する（max_bytesを指定して生成する関数を返す）'''
+    # 読み取りのたびに最終アクセス時刻を更新し、SQLiteでもテスト内でLRUの順序が変わるようにする
+    monkeypatch.setattr(cache_module, "SQLITE_TOUCH_INTERVAL_SECONDS", -1)
+
+    def make(max_bytes=1024 * 1024):
+        if request.param == "memory":
+            return InMemoryCache(max_bytes=max_bytes)
+        return SQLiteCache(path=str(tmp_path / "cache.sqlite3"), max_bytes=max_bytes)
+
+    return make
+
+
+def test_get_returns_stored_value(make_cache):
+    cache = make_cache()
+    value = {"title": "動画", "items": [1, 2, 3]}
+    cache.set("video_info", "vid1", value)
+    assert cache.get("video_info", "vid1") == value
+    assert cache.get("video_info", "vid2") is None
+    # 名前空間が異なれば別の項目として扱う
+    assert cache.get("transcript", "vid1") is None
+    stats = cache.stats()
+    assert (stats["entries"], stats["hits"], stats["misses"]) == (1, 1, 2)
+
+
+def test_set_overwrites_and_delete_removes(make_cache):
+    cache = make_cache()
+    cache.set("summary", "vid1", "short")
+    cache.set("summary", "vid1", "a longer value")
+    assert cache.get("summary", "vid1") == "a longer value"
+    assert cache.stats()["size_bytes"] == len('"a longer value"')
+    cache.delete("summary", "vid1")
+    assert cache.get("summary", "vid1") is None
+    assert cache.stats()["size_bytes"] == 0
+
+
+def test_expired_entries_are_not_returned(make_cache):
+    cache = make_cache()
+    cache.set("transcript", "vid1", "text", ttl=0.05)
+    cache.set("transcript", "vid2", "text")
+    time.sleep(0.1)
+    assert cache.get("transcript", "vid1") is None
+    assert cache.get("transcript", "vid2") == "text"
+    assert cache.stats()["entries"] == 1
+
+
+def test_least_recently_used_entry_is_evicted(make_cache):
+    # 1項目は12バイト（"xxxxxxxxxx"）。3項目までしか入らない
+    cache = make_cache(max_bytes=36)
+    for key in ("a", "b", "c"):
+        cache.set("summary", key, "x" * 10)
+        time.sleep(0.01)
+    assert cache.get("summary", "a") is not None
+    time.sleep(0.01)
+    cache.set("summary", "d", "x" * 10)
+    assert cache.get("summary", "b") is None
+    assert all(cache.get("summary", key) is not None for key in ("a", "c", "d"))
+    stats = cache.stats()
+    assert (stats["size_bytes"], stats["evictions"]) == (36, 1)
+
+
+def test_sqlite_evicts_expired_entries_before_live_ones(tmp_path):
+    cache = SQLiteCache(path=str(tmp_path / "cache.sqlite3"), max_bytes=36)
+    cache.set("summary", "a", "x" * 10)
+    cache.set("summary", "b", "x" * 10, ttl=0.05)
+    cache.set("summary", "c", "x" * 10)
+    time.sleep(0.1)
+    cache.set("summary", "d", "x" * 10)
+    assert all(cache.get("summary", key) is not None for key in ("a", "c", "d"))
+
+
+def test_oversized_value_is_not_stored(make_cache):
+    cache = make_cache(max_bytes=8)
+    cache.set("summary", "vid1", "x" * 10)
+    assert cache.get("summary", "vid1") is None
+    assert cache.stats()["size_bytes"] == 0
+
+
+def test_clear_removes_everything(make_cache):
+    cache = make_cache()
+    cache.set("summary", "vid1", "value")
+    cache.set("transcript", "vid1", "value")
+    cache.clear()
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["size_bytes"] == 0
+
+
+def test_sqlite_total_size_is_shared_between_processes(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    first, second = SQLiteCache(path=path), SQLiteCache(path=path)
+    first.set("summary", "vid1", "x" * 10)
+    second.set("summary", "vid2", "x" * 20)
+    second.set("summary", "vid1", "x" * 5)
+    first.delete("summary", "vid2")
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT SUM(size) FROM cache_entries").fetchone()[0] == 7
+    assert first.stats()["size_bytes"] == second.stats()["size_bytes"] == 7
+
+
+def test_sqlite_total_size_includes_existing_entries(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    # 合計サイズのテーブルがない以前の形式のキャッシュファイル
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE cache_entries (namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, size INTEGER NOT NULL, "
+        "expires_at REAL, accessed_at REAL NOT NULL, PRIMARY KEY (namespace, key))"
+    )
+    conn.execute("INSERT INTO cache_entries VALUES ('summary', 'vid1', ?, 5, NULL, 0)", ('"xxx"',))
+    conn.commit()
+    conn.close()
+    assert SQLiteCache(path=path).stats()["size_bytes"] == 5
+
+
+def test_backend_missing_methods_cannot_be_instantiated():
+    class PartialCache(CacheBackend):
+        def get(self, namespace, key):
+            return None
+
+    with pytest.raises(TypeError):
+        PartialCache()
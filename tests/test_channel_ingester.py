@@ -0,0 +1,102 @@
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+from database.ingestion_service import IngestionService
+from services.channel_ingester import ChannelIngester, is_youtube_api_outage
+from services.circuit_breaker import CircuitBreaker, CircuitBreakerRegistry, circuit_breakers
+
+
+class FakeRequest:
+    def __init__(self, calls, response):
+        self.calls = calls
+        self.response = response
+
+    def execute(self):
+        self.calls.append(self)
+        if isinstance(self.response, Exception):
+            raise self.response
+        return self.response
+
+
+class FakeEndpoint:
+    def __init__(self, calls, response):
+        self.calls = calls
+        self.response = response
+
+    def list(self, **kwargs):
+        return FakeRequest(self.calls, self.response)
+
+
+class FakeYouTube:
+    '''チャンネルのアップロードプレイリストを返し、プレイリストは空の1ページを返すYouTube Data APIの代わり'''
+
+    def __init__(self, playlist_response=None):
+        self.calls = []
+        self.playlist_response = playlist_response if playlist_response is not None else {"items": []}
+
+    def channels(self):
+        return FakeEndpoint(self.calls, {"items": [{"id": "UCabc", "contentDetails": {"relatedPlaylists": {"uploads": "UUabc"}}}]})
+
+    def playlistItems(self):
+        return FakeEndpoint(self.calls, self.playlist_response)
+
+
+def http_error(status):
+    return HttpError(httplib2.Response({"status": status}), b"")
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    '''テストごとに新しいYouTube Data APIのサーキットブレーカーを使う（プロセス共通の状態を汚さない）'''
+    fresh = CircuitBreaker(CircuitBreakerRegistry.YOUTUBE_DATA_API, failure_threshold=2, recovery_seconds=60)
+    monkeypatch.setitem(circuit_breakers.breakers, CircuitBreakerRegistry.YOUTUBE_DATA_API, fresh)
+    return fresh
+
+
+def test_resolving_uploads_playlist_records_quota(database, breaker):
+    youtube = FakeYouTube()
+    run, = ChannelIngester(dry_run=True, youtube=youtube).ingest(["UCabc"])
+    assert run["status"] == "completed"
+    # channels.list（プレイリストの解決）とplaylistItems.listの2ユニット
+    assert len(youtube.calls) == 2
+    assert run["quota_units_used"] == 2
+
+
+def test_open_circuit_stops_ingestion(database, breaker):
+    breaker.record_failure()
+    breaker.record_failure()
+    youtube = FakeYouTube()
+    run, = ChannelIngester(dry_run=True, youtube=youtube).ingest(["playlist:PLxyz"])
+    assert run["status"] == "stopped"
+    assert youtube.calls == []
+
+
+def test_upstream_outage_opens_the_shared_breaker(database, breaker):
+    youtube = FakeYouTube(playlist_response=http_error(503))
+    ingester = ChannelIngester(dry_run=True, youtube=youtube)
+    for _ in range(2):
+        assert ingester.ingest(["playlist:PLxyz"])[0]["status"] == "failed"
+    assert breaker.is_open
+    assert ingester.ingest(["playlist:PLxyz"])[0]["status"] == "stopped"
+    assert len(youtube.calls) == 2
+
+
+def test_is_youtube_api_outage():
+    assert is_youtube_api_outage(http_error(500))
+    assert is_youtube_api_outage(ConnectionError())
+    assert not is_youtube_api_outage(http_error(403))
+
+
+def test_lease_has_a_single_holder(database):
+    assert IngestionService.acquire_lease("ingestion", "worker-a", 60)
+    assert not IngestionService.acquire_lease("ingestion", "worker-b", 60)
+    # 担当中のプロセスは期限を延長できる
+    assert IngestionService.acquire_lease("ingestion", "worker-a", 60)
+    IngestionService.release_lease("ingestion", "worker-a")
+    assert IngestionService.acquire_lease("ingestion", "worker-b", 60)
+
+
+def test_expired_lease_is_taken_over(database):
+    assert IngestionService.acquire_lease("ingestion", "worker-a", -1)
+    assert IngestionService.acquire_lease("ingestion", "worker-b", 60)
+    assert not IngestionService.acquire_lease("ingestion", "worker-a", 60)
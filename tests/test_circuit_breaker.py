@@ -0,0 +1,94 @@
+import time
+import pytest
+from services.circuit_breaker import CircuitBreaker, CircuitOpen, STATE_CLOSED, STATE_OPEN, STATE_HALF_OPEN
+from services.rate_limiter import UpstreamThrottled
+
+RECOVERY_SECONDS = 0.05
+
+
+def make_breaker(**kwargs):
+    return CircuitBreaker("test", failure_threshold=2, recovery_seconds=RECOVERY_SECONDS, half_open_max_calls=1, **kwargs)
+
+
+def fail():
+    raise ConnectionError("down")
+
+
+def trip(breaker):
+    for _ in range(breaker.failure_threshold):
+        with pytest.raises(ConnectionError):
+            breaker.call(fail)
+
+
+def test_opens_after_consecutive_failures():
+    breaker = make_breaker()
+    with pytest.raises(ConnectionError):
+        breaker.call(fail)
+    assert breaker.state == STATE_CLOSED
+    with pytest.raises(ConnectionError):
+        breaker.call(fail)
+    assert breaker.state == STATE_OPEN
+    with pytest.raises(CircuitOpen) as excinfo:
+        breaker.call(lambda: "ok")
+    # 遮断は503とRetry-Afterに変換される例外として送出する
+    assert isinstance(excinfo.value, UpstreamThrottled)
+    assert breaker.snapshot()["stats"]["rejected"] == 1
+
+
+def test_success_resets_the_failure_count():
+    breaker = make_breaker()
+    with pytest.raises(ConnectionError):
+        breaker.call(fail)
+    assert breaker.call(lambda: "ok") == "ok"
+    with pytest.raises(ConnectionError):
+        breaker.call(fail)
+    assert breaker.state == STATE_CLOSED
+
+
+def test_half_open_probe_success_closes():
+    breaker = make_breaker()
+    trip(breaker)
+    time.sleep(RECOVERY_SECONDS * 2)
+    assert breaker.state == STATE_HALF_OPEN
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.state == STATE_CLOSED
+
+
+def test_half_open_probe_failure_reopens():
+    breaker = make_breaker()
+    trip(breaker)
+    time.sleep(RECOVERY_SECONDS * 2)
+    with pytest.raises(ConnectionError):
+        breaker.call(fail)
+    assert breaker.state == STATE_OPEN
+    assert breaker.snapshot()["stats"]["opened"] == 2
+
+
+def test_half_open_allows_limited_probes():
+    breaker = make_breaker()
+    trip(breaker)
+    time.sleep(RECOVERY_SECONDS * 2)
+    with breaker.guard():
+        # 試行中は他の呼び出しを通さない
+        with pytest.raises(CircuitOpen):
+            breaker.call(lambda: "ok")
+    assert breaker.state == STATE_CLOSED
+
+
+def test_responses_that_are_not_failures_do_not_open():
+    breaker = make_breaker()
+    for _ in range(breaker.failure_threshold * 2):
+        with pytest.raises(ValueError):
+            breaker.call(lambda: int("not a number"), is_failure=lambda exc: not isinstance(exc, ValueError))
+    assert breaker.state == STATE_CLOSED
+
+
+def test_check_does_not_consume_the_probe():
+    breaker = make_breaker()
+    trip(breaker)
+    with pytest.raises(CircuitOpen):
+        breaker.check()
+    time.sleep(RECOVERY_SECONDS * 2)
+    breaker.check()
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.state == STATE_CLOSED
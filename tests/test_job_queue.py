@@ -0,0 +1,114 @@
+import time
+import pytest
+from sqlalchemy.exc import OperationalError
+from database.job_service import JobQueueService, JOB_MAX_ATTEMPTS
+from services.job_worker import SummaryWorkerPool, PermanentJobError
+from services.rate_limiter import UpstreamThrottled
+
+
+def claim(worker_id, visibility_timeout=600):
+    return JobQueueService.claim_next(worker_id, visibility_timeout)
+
+
+def test_enqueue_is_idempotent_per_video_and_strategy(database):
+    job = JobQueueService.enqueue("vid1")
+    assert JobQueueService.enqueue("vid1")["job_id"] == job["job_id"]
+    assert JobQueueService.enqueue("vid1", strategy="detailed")["job_id"] != job["job_id"]
+
+
+def test_claim_takes_highest_priority_and_hides_the_job(database):
+    JobQueueService.enqueue("low", priority=-10)
+    JobQueueService.enqueue("high", priority=5)
+    first = claim("worker-a")
+    assert (first["video_id"], first["status"], first["attempts"]) == ("high", "running", 1)
+    assert claim("worker-b")["video_id"] == "low"
+    # 可視性タイムアウトの間は他のワーカーに取得されない
+    assert claim("worker-c") is None
+
+
+def test_job_is_reclaimed_after_visibility_timeout(database):
+    job = JobQueueService.enqueue("vid1")
+    assert claim("worker-a", visibility_timeout=0)["job_id"] == job["job_id"]
+    reclaimed = claim("worker-b")
+    assert (reclaimed["job_id"], reclaimed["attempts"]) == (job["job_id"], 2)
+    # タイムアウトした元のワーカーの完了は記録しない
+    JobQueueService.complete(job["job_id"], "worker-a", {"summary": "stale"})
+    assert JobQueueService.get_job(job["job_id"])["status"] == "running"
+    JobQueueService.complete(job["job_id"], "worker-b", {"summary": "ok"})
+    finished = JobQueueService.get_job(job["job_id"])
+    assert (finished["status"], finished["result"]) == ("succeeded", {"summary": "ok"})
+
+
+def test_job_that_keeps_timing_out_fails(database):
+    job = JobQueueService.enqueue("vid1")
+    for _ in range(JOB_MAX_ATTEMPTS):
+        assert claim("worker-a", visibility_timeout=0) is not None
+    assert claim("worker-a") is None
+    failed = JobQueueService.get_job(job["job_id"])
+    assert (failed["status"], failed["error_code"]) == ("failed", 504)
+
+
+def test_retryable_failure_is_requeued_until_max_attempts(database):
+    job = JobQueueService.enqueue("vid1")
+    for attempt in range(1, JOB_MAX_ATTEMPTS + 1):
+        claimed = claim("worker-a")
+        assert claimed["attempts"] == attempt
+        JobQueueService.fail(job["job_id"], "worker-a", "temporary error")
+    failed = JobQueueService.get_job(job["job_id"])
+    assert (failed["status"], failed["attempts"], failed["error"]) == ("failed", JOB_MAX_ATTEMPTS, "temporary error")
+    # 失敗済みのジョブは再登録できる
+    requeued = JobQueueService.enqueue("vid1")
+    assert (requeued["job_id"], requeued["status"], requeued["attempts"]) == (job["job_id"], "queued", 0)
+
+
+def test_retry_delay_hides_the_job(database):
+    job = JobQueueService.enqueue("vid1")
+    claim("worker-a")
+    JobQueueService.fail(job["job_id"], "worker-a", "throttled", retry_delay=60)
+    assert JobQueueService.get_job(job["job_id"])["status"] == "queued"
+    assert claim("worker-a") is None
+
+
+@pytest.mark.parametrize("error, status, error_code", [
+    (PermanentJobError("文字起こしがありません", status_code=404), "failed", 404),
+    (UpstreamThrottled("openai", 30), "queued", 503),
+    (RuntimeError("boom"), "queued", 500),
+])
+def test_worker_records_handler_errors(database, error, status, error_code):
+    def handler(job):
+        raise error
+
+    job = JobQueueService.enqueue("vid1")
+    SummaryWorkerPool(handler)._process("worker-a", claim("worker-a"))
+    recorded = JobQueueService.get_job(job["job_id"])
+    assert (recorded["status"], recorded["error_code"]) == (status, error_code)
+
+
+def test_worker_completes_successful_job(database):
+    job = JobQueueService.enqueue("vid1")
+    SummaryWorkerPool(lambda claimed: {"video_id": claimed["video_id"]})._process("worker-a", claim("worker-a"))
+    recorded = JobQueueService.get_job(job["job_id"])
+    assert (recorded["status"], recorded["result"]) == ("succeeded", {"video_id": "vid1"})
+
+
+def test_wait_for_job_returns_finished_job(database):
+    job = JobQueueService.enqueue("vid1")
+    claim("worker-a")
+    JobQueueService.complete(job["job_id"], "worker-a", {"summary": "ok"})
+    assert JobQueueService.wait_for_job(job["job_id"], timeout=1)["status"] == "succeeded"
+
+
+def test_wait_for_job_returns_none_when_job_is_missing(database):
+    assert JobQueueService.wait_for_job("missing", timeout=1) is None
+
+
+def test_wait_for_job_returns_none_on_database_error(database, monkeypatch):
+    job = JobQueueService.enqueue("vid1")
+
+    def unavailable(job_id):
+        raise OperationalError("SELECT", {}, Exception("database is locked"))
+
+    monkeypatch.setattr(JobQueueService, "get_job", staticmethod(unavailable))
+    started = time.monotonic()
+    assert JobQueueService.wait_for_job(job["job_id"], timeout=5) is None
+    assert time.monotonic() - started < 1
@@ -0,0 +1,62 @@
+import asyncio
+import time
+import pytest
+from services import llm_client as llm_client_module
+from services.circuit_breaker import CircuitBreaker
+from services.llm_client import LLMClient, LLMTimeout
+
+
+class RateLimitError(Exception):
+    '''openaiのRateLimitErrorと同じ形（429）の例外'''
+
+    def __init__(self):
+        super().__init__("rate limited")
+        self.status_code = 429
+
+
+class FakeChatModel:
+    '''指定した回数だけ429を返し、その後は応答しないLLMの代わり'''
+
+    def __init__(self, throttled_calls, latency):
+        self.throttled_calls = throttled_calls
+        self.latency = latency
+        self.calls = 0
+
+    def bind(self, **options):
+        return self
+
+    async def ainvoke(self, messages):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if self.calls <= self.throttled_calls:
+            raise RateLimitError()
+        await asyncio.sleep(60)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setattr("services.rate_limiter.RATE_LIMIT_BACKOFF_BASE_SECONDS", 0.01)
+    client = LLMClient("gpt-4o-mini", hedge_enabled=False)
+    client.breaker = CircuitBreaker("openai_test")
+    return client
+
+
+def test_deadline_covers_rate_limit_retries(client):
+    client.llm = FakeChatModel(throttled_calls=3, latency=0.3)
+    started = time.monotonic()
+    with pytest.raises(LLMTimeout) as excinfo:
+        client.invoke([], "summary", deadline=1.0)
+    # 再試行のたびに期限を延長すると、3回の429（0.9秒）の後にさらに1秒待つ
+    assert time.monotonic() - started < 1.5
+    assert excinfo.value.deadline == 1.0
+    assert client.llm.calls == 4
+
+
+def test_no_retry_after_deadline(client):
+    client.llm = FakeChatModel(throttled_calls=10, latency=0.6)
+    started = time.monotonic()
+    with pytest.raises((LLMTimeout, llm_client_module.UpstreamThrottled)):
+        client.invoke([], "summary", deadline=1.0)
+    assert time.monotonic() - started < 1.5
+    assert client.llm.calls <= 2
@@ -0,0 +1,75 @@
+import time
+import pytest
+from services.rate_limiter import AIMDConcurrencyLimiter, TokenBucket, UpstreamLimiter, UpstreamThrottled
+
+
+class RateLimitError(Exception):
+    '''openaiのRateLimitErrorと同じ形（429とRetry-Afterヘッダー）の例外'''
+
+    def __init__(self, retry_after=None):
+        super().__init__("rate limited")
+        self.status_code = 429
+        self.response = type("Response", (), {"status_code": 429, "headers": {"retry-after": retry_after} if retry_after else {}})()
+
+
+def make_limiter(max_wait=2.0, max_retries=3):
+    return UpstreamLimiter(
+        "test", {"requests": TokenBucket(1000, 1000)}, AIMDConcurrencyLimiter(initial=4), max_wait=max_wait, max_retries=max_retries
+    )
+
+
+def throttled_then(result, retry_after=None, failures=1):
+    calls = []
+
+    def func():
+        calls.append(time.monotonic())
+        if len(calls) <= failures:
+            raise RateLimitError(retry_after)
+        return result
+
+    return func, calls
+
+
+def test_long_retry_after_fails_fast_within_max_wait():
+    limiter = make_limiter(max_wait=2.0)
+    func, calls = throttled_then("ok", retry_after="600")
+    started = time.monotonic()
+    with pytest.raises(UpstreamThrottled) as excinfo:
+        limiter.call(func)
+    assert time.monotonic() - started < 1.0
+    assert excinfo.value.retry_after == 600
+    assert len(calls) == 1
+    assert limiter.snapshot()["stats"]["rejected"] == 1
+
+
+def test_retry_after_within_max_wait_is_retried():
+    limiter = make_limiter(max_wait=2.0)
+    func, calls = throttled_then("ok", retry_after="1")
+    assert limiter.call(func) == "ok"
+    assert len(calls) == 2
+    assert calls[1] - calls[0] >= 0.9
+
+
+def test_max_wait_is_shared_across_retries(monkeypatch):
+    monkeypatch.setattr("services.rate_limiter.RATE_LIMIT_BACKOFF_BASE_SECONDS", 0.4)
+    monkeypatch.setattr("services.rate_limiter.random.uniform", lambda low, high: high)
+    # 待機は0.4秒・0.8秒・1.6秒と増えるため、合計1.5秒の上限では3回目の再試行の前に中断する
+    limiter = make_limiter(max_wait=1.5, max_retries=5)
+    func, calls = throttled_then("ok", failures=5)
+    started = time.monotonic()
+    with pytest.raises(UpstreamThrottled):
+        limiter.call(func)
+    assert time.monotonic() - started < 1.5
+    assert len(calls) == 3
+
+
+def test_sleep_is_capped_at_backoff_max(monkeypatch):
+    monkeypatch.setattr("services.rate_limiter.RATE_LIMIT_BACKOFF_MAX_SECONDS", 0.1)
+    sleeps = []
+    monkeypatch.setattr("services.rate_limiter.time.sleep", sleeps.append)
+    limiter = make_limiter(max_wait=3600)
+    # 再試行前の待機の上限だけを確認する（Retry-Afterの残りを次の枠の取得で待つ処理は止める）
+    limiter.on_throttled = lambda retry_after=None: None
+    func, calls = throttled_then("ok", retry_after="600")
+    assert limiter.call(func) == "ok"
+    assert sleeps == [0.1]
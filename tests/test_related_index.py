@@ -0,0 +1,109 @@
+import os
+import threading
+import time
+from database.db_service import DatabaseService
+from services.related_index import CURRENT_FILE, RelatedVideoIndex, _index_lock, _read_current
+
+VIDEO_INFO = {"title": "", "description": "", "channelTitle": "", "channelId": ""}
+
+
+def save_summary(video_id, keywords):
+    summary = {
+        "sub_title": " ".join(keywords),
+        "overview": "",
+        "main_topics": keywords,
+        "keywords": keywords,
+        "action_items": [],
+        "key_points": [],
+    }
+    return DatabaseService.save_summary_to_db(video_id, summary, VIDEO_INFO)
+
+
+def versions(path):
+    return sorted(name for name in os.listdir(path) if not name.startswith(".") and not name.startswith(CURRENT_FILE))
+
+
+def test_worker_adopts_index_merged_by_another_worker(database, tmp_path):
+    first, second = RelatedVideoIndex(str(tmp_path)), RelatedVideoIndex(str(tmp_path))
+    first.initialize()
+    save_summary("vid1", ["python", "機械学習"])
+    save_summary("vid2", ["python", "データ"])
+    save_summary("vid3", ["料理", "レシピ"])
+
+    second.initialize()
+    assert second.stats()["videos"] == 3
+
+    first.refresh()
+    assert first.stats()["videos"] == 3
+    assert first.stats()["pending"] == 0
+    assert first.stats()["merges"] == 0
+    assert first._snapshot.version == second._snapshot.version == _read_current(str(tmp_path))
+    assert first.related_batch(["vid1"])[0][0][0] == "vid2"
+
+
+def test_save_keeps_the_replaced_version(database, tmp_path):
+    path = str(tmp_path)
+    index = RelatedVideoIndex(path)
+    index.initialize()
+    built = _read_current(path)
+    save_summary("vid1", ["python"])
+    index.refresh()
+    merged = _read_current(path)
+    assert versions(path) == [built, merged]
+
+    save_summary("vid2", ["python"])
+    index.refresh()
+    index.merge()
+    # 直前のバージョンはCURRENTを読んだばかりの他プロセスのために残し、それより古いものだけを削除する
+    assert versions(path) == [merged, _read_current(path)]
+
+
+def test_save_removes_leftovers_and_legacy_versions(database, tmp_path):
+    path = str(tmp_path)
+    index = RelatedVideoIndex(path)
+    index.initialize()
+    os.makedirs(os.path.join(path, ".tmp-00000000000000000001-1"))
+    open(os.path.join(path, f"{CURRENT_FILE}.tmp-1-abcdef12"), "w").close()
+    os.makedirs(os.path.join(path, "20240101T000000-abcdef12"))
+    save_summary("vid1", ["python"])
+    index.refresh()
+    names = os.listdir(path)
+    assert not any(name.startswith(".tmp-") or name.startswith(f"{CURRENT_FILE}.tmp") for name in names)
+    assert "20240101T000000-abcdef12" not in names
+
+
+def test_merge_is_skipped_while_another_worker_holds_the_lock(database, tmp_path):
+    path = str(tmp_path)
+    index = RelatedVideoIndex(path)
+    index.initialize()
+    built = _read_current(path)
+    save_summary("vid1", ["python"])
+    with _index_lock(path):
+        index.refresh()
+    assert _read_current(path) == built
+    assert index.stats()["pending"] == 1
+
+    index.refresh()
+    assert _read_current(path) != built
+    assert index.stats()["pending"] == 0
+
+
+def test_cold_start_builds_the_index_once(database, tmp_path, monkeypatch):
+    save_summary("vid1", ["python"])
+    builds = []
+    build_from_db = RelatedVideoIndex._build_from_db
+
+    def slow_build(self):
+        builds.append(self)
+        time.sleep(0.2)
+        return build_from_db(self)
+
+    monkeypatch.setattr(RelatedVideoIndex, "_build_from_db", slow_build)
+    workers = [RelatedVideoIndex(str(tmp_path)) for _ in range(3)]
+    threads = [threading.Thread(target=worker.initialize) for worker in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(builds) == 1
+    assert all(worker.ready and worker.stats()["videos"] == 1 for worker in workers)
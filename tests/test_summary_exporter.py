@@ -0,0 +1,75 @@
+import json
+from datetime import datetime, timedelta
+from services import summary_exporter
+from services.summary_exporter import ExportStreamSlots, SummaryExport, is_authorized_export
+
+
+def test_authorization_requires_configured_token(monkeypatch):
+    monkeypatch.setattr(summary_exporter, "EXPORT_API_TOKEN", "")
+    assert not is_authorized_export("Bearer ")
+    monkeypatch.setattr(summary_exporter, "EXPORT_API_TOKEN", "secret")
+    assert is_authorized_export("Bearer secret")
+    assert not is_authorized_export("Bearer other")
+    assert not is_authorized_export("secret")
+    assert not is_authorized_export(None)
+
+
+def test_slot_is_released_when_stream_completes():
+    slots = ExportStreamSlots(limit=1)
+    assert slots.try_acquire()
+    assert not slots.try_acquire()
+    assert list(slots.stream(iter([b"a", b"b"]))) == [b"a", b"b"]
+    assert slots.try_acquire()
+
+
+def test_slot_is_released_when_stream_is_closed_before_sending():
+    slots = ExportStreamSlots(limit=1)
+    assert slots.try_acquire()
+    stream = slots.stream(iter([b"a"]))
+    stream.close()
+    assert slots.try_acquire()
+
+
+def test_slot_is_released_when_stream_fails():
+    def failing():
+        yield b"a"
+        raise RuntimeError("cursor lost")
+
+    slots = ExportStreamSlots(limit=1)
+    assert slots.try_acquire()
+    stream = slots.stream(failing())
+    assert next(stream) == b"a"
+    try:
+        next(stream)
+    except RuntimeError:
+        pass
+    assert slots.try_acquire()
+
+
+SUMMARY = {"sub_title": "", "overview": "", "main_topics": [], "keywords": [], "action_items": [], "key_points": []}
+VIDEO_INFO = {"title": "", "description": "", "channelTitle": "", "channelId": ""}
+
+
+def exported_video_ids(export):
+    return [json.loads(line)["video_id"] for line in b"".join(export).splitlines()]
+
+
+def test_recent_summaries_wait_for_the_next_export(database, monkeypatch):
+    from database.db_models import SessionLocal, VideoSummary
+    from database.db_service import DatabaseService
+
+    DatabaseService.save_summary_to_db("old", SUMMARY, VIDEO_INFO)
+    db = SessionLocal()
+    db.query(VideoSummary).update({VideoSummary.created_at: datetime.utcnow() - timedelta(minutes=1)})
+    db.commit()
+    db.close()
+    DatabaseService.save_summary_to_db("new", SUMMARY, VIDEO_INFO)
+
+    # 作成直後の要約は、先に作成されてまだコミットされていない要約を飛ばさないよう次回に回す
+    first = SummaryExport(compress=False)
+    assert exported_video_ids(first) == ["old"]
+    monkeypatch.setattr(summary_exporter, "EXPORT_WATERMARK_LAG_SECONDS", 0)
+    second = SummaryExport(first.watermark, compress=False)
+    assert exported_video_ids(second) == ["new"]
+    # created_atは秒未満まで保持する（切り捨てると同じ秒に作成された行の順序が保存順とずれる）
+    assert second.watermark[0].microsecond != 0
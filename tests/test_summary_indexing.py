@@ -0,0 +1,81 @@
+import pytest
+from sqlalchemy.exc import IntegrityError, OperationalError
+from database.db_models import SessionLocal, VideoSummary, SummaryTerm
+from database.db_service import DatabaseService
+from database.search_service import SearchService
+
+SUMMARY = {
+    "sub_title": "機械学習入門",
+    "overview": "機械学習の基本を説明します",
+    "main_topics": ["機械学習", "データ"],
+    "keywords": ["python", "モデル"],
+    "action_items": [],
+    "key_points": [],
+}
+VIDEO_INFO = {"title": "機械学習の解説", "description": "", "channelTitle": "", "channelId": ""}
+
+
+def indexed_summary_id(video_id):
+    db = SessionLocal()
+    try:
+        return db.query(SummaryTerm.summary_id).filter(SummaryTerm.video_id == video_id).limit(1).scalar()
+    finally:
+        db.close()
+
+
+def summary_count(video_id):
+    db = SessionLocal()
+    try:
+        return db.query(VideoSummary).filter(VideoSummary.video_id == video_id).count()
+    finally:
+        db.close()
+
+
+def test_saved_summary_is_indexed(database):
+    summary_id = DatabaseService.save_summary_to_db("vid1", SUMMARY, VIDEO_INFO)
+    assert summary_id is not None
+    assert indexed_summary_id("vid1") == summary_id
+    assert SearchService.search("機械学習")["total"] == 1
+
+
+@pytest.mark.parametrize("error", [
+    IntegrityError("INSERT INTO summary_terms", {}, Exception("duplicate key")),
+    OperationalError("UPDATE summary_term_stats", {}, Exception("lock wait timeout")),
+])
+def test_index_failure_keeps_summary_and_backfill_repairs(database, monkeypatch, error):
+    def failing_index(db, summary):
+        raise error
+
+    monkeypatch.setattr(SearchService, "index_summary", staticmethod(failing_index))
+    summary_id = DatabaseService.save_summary_to_db("vid1", SUMMARY, VIDEO_INFO)
+    monkeypatch.undo()
+
+    assert summary_id is not None
+    assert summary_count("vid1") == 1
+    assert indexed_summary_id("vid1") is None
+
+    assert SearchService.backfill() == 1
+    assert indexed_summary_id("vid1") == summary_id
+
+
+def test_transient_index_failure_is_retried(database, monkeypatch):
+    original = SearchService.index_summary
+    calls = []
+
+    def flaky_index(db, summary):
+        calls.append(summary.id)
+        if len(calls) == 1:
+            raise IntegrityError("INSERT INTO summary_terms", {}, Exception("duplicate key"))
+        return original(db, summary)
+
+    monkeypatch.setattr(SearchService, "index_summary", staticmethod(flaky_index))
+    summary_id = DatabaseService.save_summary_to_db("vid1", SUMMARY, VIDEO_INFO)
+    assert len(calls) == 2
+    assert indexed_summary_id("vid1") == summary_id
+
+
+def test_older_summary_does_not_replace_newer_index(database):
+    older_id = DatabaseService.save_summary_to_db("vid1", SUMMARY, VIDEO_INFO)
+    newer_id = DatabaseService.save_summary_to_db("vid1", {**SUMMARY, "keywords": ["rust"]}, VIDEO_INFO)
+    assert SearchService.index_saved_summary(older_id, "vid1")
+    assert indexed_summary_id("vid1") == newer_id
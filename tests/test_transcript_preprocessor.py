@@ -0,0 +1,87 @@
+import pytest
+from agents.transcript_preprocessor import preprocess_transcript, PreprocessConfig
+
+
+def texts(segments, **overrides):
+    config = PreprocessConfig(merge_windows=False, **overrides)
+    return [segment["text"] for segment in preprocess_transcript(segments, config).transcript]
+
+
+def segment(text, start, duration=2.0):
+    return {"text": text, "start": start, "duration": duration}
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("[音楽] 今日は", "今日は"),
+    ("［拍手］ありがとう", "ありがとう"),
+    ("【笑】そうですね", "そうですね"),
+    ("(笑) そうですね", "そうですね"),
+    ("[Music] welcome back", "welcome back"),
+    ("[applause] thanks", "thanks"),
+    ("♪♪ 歌詞", "歌詞"),
+])
+def test_known_non_speech_tags_are_removed(text, expected):
+    assert texts([segment(text, 0)]) == [expected]
+
+
+@pytest.mark.parametrize("text", [
+    "f(x) equals two",
+    "結果は（約3割）でした",
+    "see [the docs] for details",
+    "[音楽) が流れる",
+])
+def test_other_bracketed_text_is_kept(text):
+    assert texts([segment(text, 0)]) == [text]
+
+
+def test_repeated_short_answer_is_kept():
+    segments = [segment("はい", 0), segment("はい", 1)]
+    assert texts(segments) == ["はい", "はい"]
+
+
+def test_repeated_segment_is_kept_even_when_rolling():
+    segments = [segment("そうですね", 0), segment("そうですね", 1)]
+    assert texts(segments) == ["そうですね", "そうですね"]
+
+
+def test_segment_contained_in_previous_is_kept():
+    segments = [segment("今日は機械学習の話です", 0), segment("機械学習", 1)]
+    assert texts(segments) == ["今日は機械学習の話です", "機械学習"]
+
+
+def test_rolling_overlap_is_collapsed():
+    segments = [segment("今日は機械学習の", 0, 3.0), segment("機械学習の基本を話します", 1.5, 3.0)]
+    assert texts(segments) == ["今日は機械学習の", "基本を話します"]
+
+
+def test_overlap_between_non_overlapping_segments_is_kept():
+    # 手動字幕のように表示時間が重ならないセグメントは、同じ語句で始まっても畳み込まない
+    segments = [segment("今日は機械学習の", 0, 3.0), segment("機械学習の基本を話します", 3.0, 3.0)]
+    assert texts(segments) == ["今日は機械学習の", "機械学習の基本を話します"]
+
+
+def test_english_overlap_respects_word_boundaries():
+    segments = [segment("I saw the", 0, 3.0), segment("ther cat", 1, 3.0)]
+    assert texts(segments) == ["I saw the", "ther cat"]
+    segments = [segment("today we are going", 0, 3.0), segment("are going to talk", 1, 3.0)]
+    assert texts(segments) == ["today we are going", "to talk"]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("えーと今日は", "今日は"),
+    ("まぁ、いいか", "いいか"),
+    ("まぁまぁですね", "まぁまぁですね"),
+    ("今日は、えー、晴れです", "今日は、晴れです"),
+    ("um so this is it", "so this is it"),
+    ("umbrella stand", "umbrella stand"),
+])
+def test_fillers(text, expected):
+    assert texts([segment(text, 0)]) == [expected]
+
+
+def test_fillers_are_kept_when_disabled():
+    assert texts([segment("えーと今日は", 0)], remove_fillers=False) == ["えーと今日は"]
+
+
+def test_config_fingerprint_changes_with_tags():
+    assert PreprocessConfig().fingerprint() != PreprocessConfig(non_speech_tags=["音楽"]).fingerprint()